@@ -0,0 +1,461 @@
+"""
+MOPTT / PTT 發文數與留言數統計
+將 PTT 索引列（nrec 推文數，含「爆」與 X1~XX）與 MOPTT 文章（likes、boos、responses）
+轉為統一欄位，以 pandas 向量化運算彙總各看板、每日、每小時與各作者的發文數與互動數。
+彙總結果以增量方式維護：新資料只計算本批與被取代舊資料的差值，再加到既有彙總上，
+不需每次重新讀取全部資料；同一篇文章（URL）重複出現時以最新一筆為準，內容未變的文章直接略過。
+彙總與已匯入來源檔的大小、修改時間隨事實表一併保存，下次執行直接載入，未變動的來源檔不再讀取
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from moptt_data_converter import iter_json_array
+from moptt_post_id import POST_BOARD_PATTERN, POST_ID_PATTERN, PTT_BOARD_PATTERN
+from moptt_storage import board_from_json_file
+
+# ====== 設定區域開始 ======
+# 增量統計的狀態檔（每篇文章一列的事實表）；彙總保存在同名的 _rollups 目錄，
+# 與事實表不一致（例如寫入中斷）時才由事實表重建
+ANALYTICS_STATE = 'moptt_analytics.parquet'
+
+# 日期與小時彙總所用的時區（台灣時間）
+ANALYTICS_TIMEZONE = 'Asia/Taipei'
+# ====== 設定區域結束 ======
+
+# PTT 推文數：「爆」為 100 以上，X1~X9 為 -10~-99，XX 為 -100 以下
+NREC_BOOM = 100
+NREC_X_UNIT = -10
+NREC_XX = -100
+
+METRICS = ['posts', 'push', 'likes', 'boos', 'responses']
+DIMENSIONS = ['board', 'author', 'day', 'hour']
+
+# 彙總名稱與分組欄位
+ROLLUPS = {
+    'board': ['board'],
+    'day': ['board', 'day'],
+    'hour': ['board', 'hour'],
+    'author': ['board', 'author'],
+}
+
+# 彙總目錄中記錄事實表版本與已匯入來源檔的檔案
+ROLLUP_MANIFEST = 'manifest.json'
+
+# 讀取來源檔案時保留的欄位（PTT CSV 的 link / nrec / author，MOPTT 的 url / likes / boos / responses）
+SOURCE_COLUMNS = ['url', 'link', 'board', 'author', 'post_time', 'nrec', 'likes', 'boos', 'responses']
+
+
+def parse_nrec(value):
+    """
+    解析 PTT 推文數
+
+    Args:
+        value (str | int | None): 索引頁上的推文數，例如 ''、'12'、'爆'、'X3'、'XX'
+
+    Returns:
+        int: 推文數（空白為 0，無法解析時為 0）
+    """
+    if value is None:
+        return 0
+    text = str(value).strip()
+    if text == '爆':
+        return NREC_BOOM
+    if text == 'XX':
+        return NREC_XX
+    if text.startswith('X'):
+        return NREC_X_UNIT * int(text[1:]) if text[1:].isdigit() else NREC_X_UNIT
+    try:
+        return int(float(text))
+    except ValueError:
+        return 0
+
+
+def parse_nrec_series(values):
+    """
+    向量化解析 PTT 推文數欄位（規則同 parse_nrec）
+
+    Args:
+        values (pandas.Series): 推文數欄位
+
+    Returns:
+        pandas.Series: int64 推文數
+    """
+    text = values.astype('string').str.strip().fillna('')
+    result = pd.to_numeric(text, errors='coerce')
+    result = result.mask(text == '爆', NREC_BOOM)
+    result = result.mask(text == 'XX', NREC_XX)
+    x_digits = pd.to_numeric(text.str.extract(r'^X(\d)$', expand=False), errors='coerce')
+    result = result.mask(x_digits.notna(), x_digits * NREC_X_UNIT)
+    result = result.mask(text == 'X', NREC_X_UNIT)
+    return result.fillna(0).astype('int64')
+
+
+def _numeric_column(frame, name):
+    """取得整數欄位，缺少欄位或無法轉換時為 0"""
+    if name not in frame:
+        return pd.Series(0, index=frame.index, dtype='int64')
+    return pd.to_numeric(frame[name], errors='coerce').fillna(0).astype('int64')
+
+
+def normalize_frame(frame, board=None):
+    """
+    將 PTT 索引列或 MOPTT 文章轉為以 URL 為索引的統一事實表
+
+    Args:
+        frame (pandas.DataFrame): 含 url 或 link 欄位的資料；可選 board、author、post_time、
+                                  nrec、likes、boos、responses
+        board (str, optional): 看板名稱，未指定時使用 board 欄位或由網址推算
+
+    Returns:
+        pandas.DataFrame: 索引為 url，欄位為 DIMENSIONS + METRICS
+    """
+    urls = (frame['url'] if 'url' in frame else frame['link']).astype('string')
+
+    if board is not None:
+        boards = pd.Series(board, index=frame.index, dtype='string')
+    elif 'board' in frame:
+        boards = frame['board'].astype('string')
+    else:
+        boards = urls.str.extract(POST_BOARD_PATTERN.pattern, expand=False)
+        boards = boards.fillna(urls.str.extract(PTT_BOARD_PATTERN.pattern, expand=False))
+
+    # 發文時間：優先使用 post_time 欄位，沒有時由文章 ID 的 epoch 推算
+    id_epochs = pd.to_numeric(urls.str.extract(POST_ID_PATTERN.pattern)[0], errors='coerce')
+    post_time = pd.to_datetime(id_epochs, unit='s', utc=True)
+    if 'post_time' in frame:
+        parsed = pd.to_datetime(frame['post_time'], utc=True, errors='coerce', format='ISO8601')
+        post_time = parsed.fillna(post_time)
+    local_time = post_time.dt.tz_convert(ANALYTICS_TIMEZONE).dt.tz_localize(None).astype('datetime64[ns]')
+
+    facts = pd.DataFrame({
+        'board': boards.fillna('').astype(str).to_numpy(),
+        'author': (frame['author'].astype('string').fillna('').astype(str).to_numpy()
+                   if 'author' in frame else ''),
+        'day': local_time.dt.floor('D').to_numpy(),
+        'hour': local_time.dt.floor('h').to_numpy(),
+        'posts': np.ones(len(frame), dtype='int64'),
+        'push': (parse_nrec_series(frame['nrec']) if 'nrec' in frame else _numeric_column(frame, 'nrec')).to_numpy(),
+        'likes': _numeric_column(frame, 'likes').to_numpy(),
+        'boos': _numeric_column(frame, 'boos').to_numpy(),
+        'responses': _numeric_column(frame, 'responses').to_numpy(),
+    }, index=pd.Index(urls.astype(str).to_numpy(), name='url'))
+    # 同一批中重複的文章以最後一筆為準
+    return facts[~facts.index.duplicated(keep='last')]
+
+
+def _empty_facts():
+    """建立空的事實表"""
+    facts = normalize_frame(pd.DataFrame({'url': pd.Series(dtype='string')}))
+    return facts
+
+
+def _unchanged_rows(batch, current):
+    """
+    逐列比較新資料與既有資料是否完全相同（缺值視為相等）
+
+    Args:
+        batch (pandas.DataFrame): 新資料
+        current (pandas.DataFrame): 同順序、同欄位的既有資料
+
+    Returns:
+        numpy.ndarray: 每列是否未變動的布林陣列
+    """
+    same = np.ones(len(batch), dtype=bool)
+    for column in DIMENSIONS + METRICS:
+        new_values = batch[column].reset_index(drop=True)
+        old_values = current[column].reset_index(drop=True)
+        same &= (new_values.eq(old_values) | (new_values.isna() & old_values.isna())).to_numpy()
+    return same
+
+
+def rollup_dir_for(path):
+    """
+    取得狀態檔對應的彙總目錄
+
+    Args:
+        path (str): 狀態檔路徑，例如 moptt_analytics.parquet
+
+    Returns:
+        str: 彙總目錄，例如 moptt_analytics_rollups
+    """
+    return os.path.splitext(path)[0] + '_rollups'
+
+
+def _file_stamp(path):
+    """取得檔案的大小與修改時間，用於判斷檔案是否變動"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _apply_delta(rollup, changes, name):
+    """
+    將變動量加到彙總上
+
+    Args:
+        rollup (pandas.DataFrame | None): 既有彙總
+        changes (pandas.DataFrame): 帶正負號的事實列（新資料為正，被取代的舊資料為負）
+        name (str): 彙總名稱
+
+    Returns:
+        pandas.DataFrame: 更新後的彙總（發文數為 0 的分組會被移除）
+    """
+    if name == 'author':
+        changes = changes[changes['author'] != '']
+    delta = changes.groupby(ROLLUPS[name], sort=False)[METRICS].sum()
+    if rollup is None:
+        return delta[delta['posts'] != 0]
+
+    # 只更新本批涉及的分組：既有分組就地相加，新分組附加在後，不重新對齊整個彙總
+    positions = rollup.index.get_indexer(delta.index)
+    hit = positions >= 0
+    if hit.any():
+        rollup.iloc[positions[hit]] = rollup.to_numpy()[positions[hit]] + delta.to_numpy()[hit]
+    if not hit.all():
+        rollup = pd.concat([rollup, delta[~hit]])
+    if (rollup['posts'].to_numpy()[positions[hit]] == 0).any():
+        rollup = rollup[rollup['posts'] != 0]
+    return rollup
+
+
+class AnalyticsEngine:
+    """
+    增量統計引擎
+    facts 為每篇文章一列的事實表（以 URL 為索引），rollups 為各維度的彙總；
+    update 只對本批中新增或內容有變動的文章做分組加總，並扣掉被取代的舊資料；
+    sources 記錄已匯入的來源檔 {絕對路徑: [大小, 修改時間]}
+    """
+
+    def __init__(self, facts=None, rollups=None, sources=None):
+        """
+        Args:
+            facts (pandas.DataFrame, optional): 既有的事實表
+            rollups (dict, optional): 與事實表一致的既有彙總，未指定時由事實表重建
+            sources (dict, optional): 已匯入的來源檔
+        """
+        self.facts = _empty_facts() if facts is None else facts
+        self.sources = sources or {}
+        if rollups is None:
+            self.rebuild()
+        else:
+            self.rollups = rollups
+
+    def rebuild(self):
+        """由事實表重新計算所有彙總"""
+        self.rollups = {name: _apply_delta(None, self.facts, name) for name in ROLLUPS}
+
+    def update(self, frame, board=None):
+        """
+        加入或更新一批文章
+
+        Args:
+            frame (pandas.DataFrame): PTT 索引列或 MOPTT 文章
+            board (str, optional): 看板名稱
+
+        Returns:
+            dict: {'added': 新文章數, 'updated': 更新的文章數, 'unchanged': 內容未變而略過的文章數,
+                   'elapsed_ms': 耗時毫秒}
+        """
+        started = time.perf_counter()
+        if frame.empty:
+            return {'added': 0, 'updated': 0, 'unchanged': 0, 'elapsed_ms': (time.perf_counter() - started) * 1000}
+        batch = normalize_frame(frame, board)
+        positions = self.facts.index.get_indexer(batch.index)
+        existing = positions >= 0
+
+        # 內容與既有資料完全相同的文章不影響彙總，直接略過
+        unchanged = np.zeros(len(batch), dtype=bool)
+        if existing.any():
+            unchanged[existing] = _unchanged_rows(batch[existing], self.facts.iloc[positions[existing]])
+        if unchanged.any():
+            batch = batch[~unchanged]
+            positions = positions[~unchanged]
+            existing = existing[~unchanged]
+
+        # 被取代的舊資料以負值抵銷，再加上新資料
+        negated = self.facts.iloc[positions[existing]].copy()
+        negated[METRICS] = -negated[METRICS]
+        changes = pd.concat([batch, negated]) if len(negated) else batch
+        for name in ROLLUPS:
+            self.rollups[name] = _apply_delta(self.rollups[name], changes, name)
+
+        # 既有文章就地更新，新文章附加在後
+        if existing.any():
+            self.facts.iloc[positions[existing]] = batch[existing]
+        if not existing.all():
+            self.facts = pd.concat([self.facts, batch[~existing]]) if len(self.facts) else batch[~existing]
+        return {'added': int((~existing).sum()), 'updated': int(existing.sum()), 'unchanged': int(unchanged.sum()),
+                'elapsed_ms': (time.perf_counter() - started) * 1000}
+
+    def rollup(self, name, board=None, start=None, end=None, top=None):
+        """
+        查詢彙總
+
+        Args:
+            name (str): 'board'、'day'、'hour' 或 'author'
+            board (str, optional): 只取此看板
+            start (str | datetime, optional): day / hour 彙總的起始時間（含，台灣時間）
+            end (str | datetime, optional): day / hour 彙總的結束時間（含，台灣時間）
+            top (int, optional): 依發文數由多到少取前幾名
+
+        Returns:
+            pandas.DataFrame: 彙總結果
+        """
+        result = self.rollups[name].reset_index()
+        if board is not None:
+            result = result[result['board'] == board]
+        if name in ('day', 'hour'):
+            if start is not None:
+                result = result[result[name] >= pd.Timestamp(start)]
+            if end is not None:
+                result = result[result[name] <= pd.Timestamp(end)]
+        if top is not None:
+            return result.sort_values(['posts', 'push'], ascending=False).head(top).reset_index(drop=True)
+        return result.sort_values(ROLLUPS[name]).reset_index(drop=True)
+
+    def verify(self):
+        """
+        檢查增量彙總與由事實表全部重算的結果是否一致
+
+        Returns:
+            bool: 是否一致
+        """
+        for name in ROLLUPS:
+            expected = _apply_delta(None, self.facts, name).sort_index()
+            if not self.rollups[name].sort_index().equals(expected):
+                return False
+        return True
+
+    def is_source_unchanged(self, path):
+        """
+        來源檔自上次匯入後是否未變動
+
+        Args:
+            path (str): 來源檔路徑
+
+        Returns:
+            bool: 大小與修改時間都與上次匯入時相同
+        """
+        return self.sources.get(os.path.abspath(path)) == _file_stamp(path)
+
+    def mark_source(self, path):
+        """記錄來源檔已匯入（save 時一併保存）"""
+        self.sources[os.path.abspath(path)] = _file_stamp(path)
+
+    def save(self, path=ANALYTICS_STATE):
+        """
+        保存事實表、彙總與已匯入來源檔（先寫到暫存檔再取代，避免中斷時損毀）
+        清單最後寫入並記錄事實表的大小與修改時間，中途中斷時載入會發現不一致而改為重建彙總
+
+        Args:
+            path (str): 狀態檔路徑
+        """
+        temp_path = path + '.tmp'
+        self.facts.to_parquet(temp_path)
+        os.replace(temp_path, path)
+
+        rollup_dir = rollup_dir_for(path)
+        os.makedirs(rollup_dir, exist_ok=True)
+        for name, rollup in self.rollups.items():
+            rollup_path = os.path.join(rollup_dir, f'{name}.parquet')
+            rollup.to_parquet(rollup_path + '.tmp')
+            os.replace(rollup_path + '.tmp', rollup_path)
+
+        manifest_path = os.path.join(rollup_dir, ROLLUP_MANIFEST)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'facts': _file_stamp(path), 'sources': self.sources}, f, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    @classmethod
+    def load(cls, path=ANALYTICS_STATE):
+        """
+        載入事實表與保存的彙總；彙總與事實表不一致或不存在時由事實表重建，
+        狀態檔不存在時建立空的引擎
+
+        Args:
+            path (str): 狀態檔路徑
+
+        Returns:
+            AnalyticsEngine: 統計引擎
+        """
+        if not os.path.exists(path):
+            return cls()
+        facts = pd.read_parquet(path)
+
+        rollup_dir = rollup_dir_for(path)
+        try:
+            with open(os.path.join(rollup_dir, ROLLUP_MANIFEST), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(facts)
+        if manifest.get('facts') != _file_stamp(path):
+            print("彙總與事實表不一致，由事實表重建")
+            return cls(facts)
+        rollups = {name: pd.read_parquet(os.path.join(rollup_dir, f'{name}.parquet')) for name in ROLLUPS}
+        return cls(facts, rollups, manifest.get('sources'))
+
+
+def read_source(path):
+    """
+    讀取來源檔案：moptt_<看板>.json（MOPTT 文章）或 PTT 爬蟲輸出的 CSV
+
+    Args:
+        path (str): 檔案路徑
+
+    Returns:
+        tuple: (DataFrame, 看板名稱或 None)
+    """
+    if path.endswith('.json'):
+        records = ({key: record.get(key) for key in SOURCE_COLUMNS if key in record}
+                   for record in iter_json_array(path))
+        frame = pd.DataFrame.from_records(records)
+        if frame.empty:
+            # 尚無文章的看板（空陣列）沒有任何欄位，補上欄位讓後續以空批次處理
+            frame = pd.DataFrame(columns=SOURCE_COLUMNS)
+        return frame, board_from_json_file(path)
+    frame = pd.read_csv(path, dtype={'nrec': str, 'author': str}, keep_default_na=False,
+                        usecols=lambda column: column in SOURCE_COLUMNS)
+    return frame, None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MOPTT / PTT 發文數與留言數統計')
+    parser.add_argument('--state', default=ANALYTICS_STATE, help='狀態檔路徑')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update_parser = subparsers.add_parser('update', help='以 JSON / CSV 檔案增量更新統計')
+    update_parser.add_argument('files', nargs='+', help='moptt_<看板>.json 或 PTT CSV')
+    update_parser.add_argument('--force', action='store_true', help='重新讀取未變動的來源檔')
+
+    show_parser = subparsers.add_parser('show', help='顯示彙總')
+    show_parser.add_argument('rollup', choices=list(ROLLUPS), help='彙總維度')
+    show_parser.add_argument('--board', help='只顯示此看板')
+    show_parser.add_argument('--start', help='起始日期 / 時間（day、hour）')
+    show_parser.add_argument('--end', help='結束日期 / 時間（day、hour）')
+    show_parser.add_argument('--top', type=int, help='依發文數取前幾名')
+
+    subparsers.add_parser('verify', help='檢查增量彙總與全部重算是否一致')
+    args = parser.parse_args()
+
+    engine = AnalyticsEngine.load(args.state)
+    if args.command == 'update':
+        for path in args.files:
+            if not args.force and engine.is_source_unchanged(path):
+                print(f"{path}: 自上次匯入後未變動，略過")
+                continue
+            frame, board = read_source(path)
+            result = engine.update(frame, board)
+            engine.mark_source(path)
+            print(f"{path}: 新增 {result['added']} 篇、更新 {result['updated']} 篇、"
+                  f"未變動 {result['unchanged']} 篇，彙總更新耗時 {result['elapsed_ms']:.1f} 毫秒")
+        engine.save(args.state)
+    elif args.command == 'show':
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(engine.rollup(args.rollup, args.board, args.start, args.end, args.top).to_string(index=False))
+    else:
+        print("一致" if engine.verify() else "不一致，請以 update 重新匯入")
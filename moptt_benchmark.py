@@ -0,0 +1,544 @@
+"""
+MOPTT / PTT 爬蟲離線效能測試工具
+啟動本機 HTTP 伺服器模擬 MOPTT 看板（無限滾動）、文章頁與 PTT 索引頁，
+頁面使用與爬蟲相同的 CSS 掛鉤，資料來源為 moptt_Baseball.json / moptt_C_Chat.json；
+對 scrape_board、process_articles 與 get_ptt_data 進行測量，
+輸出每秒文章數、單篇延遲 p50/p99 與尖峰記憶體用量（JSON 格式，可跨次比較）
+"""
+
+import argparse
+import glob
+import html
+import importlib.util
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from moptt_browser_session import process_tree_rss_kb
+from moptt_post_id import parse_post_board, parse_post_epoch
+
+# ====== 設定區域開始 ======
+# 種子資料檔案
+SEED_FILES = ['moptt_Baseball.json', 'moptt_C_Chat.json']
+
+# 看板頁每次載入的卡片數
+CARDS_PER_PAGE = 20
+
+# PTT 索引頁每頁的文章數
+PTT_POSTS_PER_PAGE = 20
+
+# 每篇文章產生的回應數範圍
+COMMENTS_RANGE = (0, 60)
+
+# 「顯示全部回應」之前先顯示的回應數（僅在強制 Selenium 路徑時使用）
+INITIAL_COMMENTS = 5
+
+# 效能測試結果輸出目錄
+RESULTS_DIR = 'bench_results'
+# ====== 設定區域結束 ======
+
+TAIWAN_TIMEZONE = timezone(timedelta(hours=8))
+
+BOARD_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{board}</title>
+<style>div[class*='eQQBIg'] {{ min-height: 120px; border-bottom: 1px solid #ccc; }}</style>
+</head><body>
+<div id="cards">{cards}</div>
+<script>
+let offset = {page_size};
+let loading = false;
+let exhausted = false;
+async function loadMore() {{
+    if (loading || exhausted) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 50) return;
+    loading = true;
+    const response = await fetch('/api/cards/{board}?offset=' + offset);
+    const fragment = await response.text();
+    if (fragment) {{
+        document.getElementById('cards').insertAdjacentHTML('beforeend', fragment);
+        offset += {page_size};
+    }} else {{
+        exhausted = true;
+    }}
+    loading = false;
+}}
+window.addEventListener('scroll', loadMore);
+</script>
+</body></html>"""
+
+ARTICLE_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head><body>
+<h1>{title}</h1>
+<div class="o_pqSZvuHj7qfwrPg7tI"><time datetime="{post_time}">{post_time}</time></div>
+<div class="T86VdSgcSk_wVSJ87Jd_"><i class="fa fa-thumbs-up"></i>{likes}</div>
+<div class="T86VdSgcSk_wVSJ87Jd_"><i class="fa fa-thumbs-down"></i>{boos}</div>
+<div class="T86VdSgcSk_wVSJ87Jd_"><i class="fa fa-comment-dots"></i>{responses}</div>
+<div id="comments">{comments}</div>
+{show_all}
+</body></html>"""
+
+SHOW_ALL_TEMPLATE = """<div class="FEfFxCwDtx6IcnHAFaMR" onclick="document.getElementById('comments').insertAdjacentHTML('beforeend', document.getElementById('hidden-comments').innerHTML); this.remove();">顯示全部回應</div>
+<template id="hidden-comments">{comments}</template>"""
+
+PTT_INDEX_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>看板 {board}</title></head><body>
+<div class="btn-group btn-group-paging">
+<a class="btn wide" href="/bbs/{board}/index1.html">最舊</a>
+<a class="btn wide{prev_disabled}" href="{prev_href}">&lsaquo; 上頁</a>
+<a class="btn wide" href="{next_href}">下頁 &rsaquo;</a>
+<a class="btn wide" href="/bbs/{board}/index.html">最新</a>
+</div>
+<div class="r-list-container action-bar-margin bbs-screen">{rows}</div>
+</body></html>"""
+
+PTT_ROW_TEMPLATE = """<div class="r-ent">
+<div class="nrec"><span class="hl f3">{nrec}</span></div>
+<div class="title"><a href="/bbs/{board}/{post_id}.html">{title}</a></div>
+<div class="meta"><div class="author">{author}</div><div class="date">{date}</div></div>
+</div>"""
+
+
+class SyntheticSite:
+    """
+    由種子資料產生的模擬網站內容
+    文章的互動數據與回應以固定亂數種子產生，每次執行結果相同
+    """
+
+    def __init__(self, seed_files=SEED_FILES, seed=42, latency=0.0, force_selenium=False):
+        """
+        載入種子資料並產生模擬內容
+
+        Args:
+            seed_files (list): 種子 JSON 檔案
+            seed (int): 亂數種子
+            latency (float): 每個請求額外延遲的秒數
+            force_selenium (bool): 文章頁加上「顯示全部回應」按鈕，使 HTTP 快速路徑失敗
+        """
+        self.latency = latency
+        self.force_selenium = force_selenium
+        self.boards = {}
+        self.articles = {}
+        rng = random.Random(seed)
+
+        for seed_file in seed_files:
+            with open(seed_file, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            for record in records:
+                post_id = record['url'].rstrip('/').split('/')[-1]
+                board = parse_post_board(post_id)
+                epoch = parse_post_epoch(post_id)
+                if board is None or epoch is None:
+                    continue
+                comment_count = rng.randint(*COMMENTS_RANGE)
+                self.articles[post_id] = {
+                    'post_id': post_id,
+                    'board': board,
+                    'epoch': epoch,
+                    'title': record['title'],
+                    'author': f"user{rng.randint(1, 500)}",
+                    'likes': rng.randint(0, 200),
+                    'boos': rng.randint(0, 20),
+                    'comments': [f"{post_id} 的第 {i + 1} 則回應 {rng.random():.6f}" for i in range(comment_count)],
+                }
+                self.boards.setdefault(board, []).append(post_id)
+
+        # PTT 索引頁：依發文時間由舊到新排列，最後一頁為最新
+        self.ptt_pages = {}
+        for board, post_ids in self.boards.items():
+            ordered = sorted(post_ids, key=lambda post_id: self.articles[post_id]['epoch'])
+            self.ptt_pages[board] = [ordered[i:i + PTT_POSTS_PER_PAGE]
+                                     for i in range(0, len(ordered), PTT_POSTS_PER_PAGE)]
+
+    def card_html(self, post_id):
+        """產生一張看板卡片"""
+        article = self.articles[post_id]
+        return (f'<div class="sc-eQQBIg card"><a href="/p/{post_id}">'
+                f'<h3>{html.escape(article["title"])}</h3></a></div>')
+
+    def board_page(self, board):
+        """產生看板頁（含無限滾動腳本）"""
+        post_ids = self.boards.get(board, [])
+        cards = ''.join(self.card_html(post_id) for post_id in post_ids[:CARDS_PER_PAGE])
+        return BOARD_PAGE_TEMPLATE.format(board=board, cards=cards, page_size=CARDS_PER_PAGE)
+
+    def cards_fragment(self, board, offset):
+        """產生無限滾動時追加的卡片"""
+        post_ids = self.boards.get(board, [])[offset:offset + CARDS_PER_PAGE]
+        return ''.join(self.card_html(post_id) for post_id in post_ids)
+
+    def article_page(self, post_id):
+        """產生文章頁，找不到文章時返回None"""
+        article = self.articles.get(post_id)
+        if article is None:
+            return None
+        spans = [f'<span class="qIm88EMEzWPkVVqwCol0">{html.escape(comment)}</span>'
+                 for comment in article['comments']]
+        shown, hidden = spans, []
+        if self.force_selenium and len(spans) > INITIAL_COMMENTS:
+            shown, hidden = spans[:INITIAL_COMMENTS], spans[INITIAL_COMMENTS:]
+        post_time = datetime.fromtimestamp(article['epoch'], tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        return ARTICLE_PAGE_TEMPLATE.format(
+            title=html.escape(article['title']),
+            post_time=post_time,
+            likes=article['likes'],
+            boos=article['boos'],
+            responses=len(article['comments']),
+            comments=''.join(shown),
+            show_all=SHOW_ALL_TEMPLATE.format(comments=''.join(hidden)) if hidden else ''
+        )
+
+    def ptt_index_page(self, board, page):
+        """產生 PTT 索引頁，page 為 None 時為最新一頁，找不到時返回None"""
+        pages = self.ptt_pages.get(board)
+        if not pages:
+            return None
+        page = len(pages) if page is None else page
+        if not 1 <= page <= len(pages):
+            return None
+
+        rows = []
+        for post_id in pages[page - 1]:
+            article = self.articles[post_id]
+            post_date = datetime.fromtimestamp(article['epoch'], tz=TAIWAN_TIMEZONE)
+            rows.append(PTT_ROW_TEMPLATE.format(
+                nrec=article['likes'] if article['likes'] < 100 else '爆',
+                board=board,
+                post_id=post_id,
+                title=html.escape(article['title']),
+                author=article['author'],
+                date=f"{post_date.month:>2}/{post_date.day:02d}"
+            ))
+        return PTT_INDEX_TEMPLATE.format(
+            board=board,
+            rows=''.join(rows),
+            prev_disabled='' if page > 1 else ' disabled',
+            prev_href=f'/bbs/{board}/index{page - 1}.html' if page > 1 else '',
+            next_href=f'/bbs/{board}/index{page + 1}.html' if page < len(pages) else ''
+        )
+
+
+def make_handler(site):
+    """
+    建立對應模擬網站的 HTTP 請求處理類別
+
+    Args:
+        site (SyntheticSite): 模擬網站內容
+
+    Returns:
+        type: BaseHTTPRequestHandler 子類別
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if site.latency:
+                time.sleep(site.latency)
+            parsed = urlparse(self.path)
+            parts = [part for part in parsed.path.split('/') if part]
+            body = None
+
+            if len(parts) == 2 and parts[0] == 'b':
+                body = site.board_page(parts[1])
+            elif len(parts) == 3 and parts[:2] == ['api', 'cards']:
+                offset = int(parse_qs(parsed.query).get('offset', ['0'])[0])
+                body = site.cards_fragment(parts[2], offset)
+            elif len(parts) == 2 and parts[0] == 'p':
+                body = site.article_page(parts[1])
+            elif len(parts) == 3 and parts[0] == 'bbs':
+                if parts[2] == 'index.html':
+                    body = site.ptt_index_page(parts[1], None)
+                elif parts[2].startswith('index') and parts[2].endswith('.html'):
+                    try:
+                        body = site.ptt_index_page(parts[1], int(parts[2][5:-5]))
+                    except ValueError:
+                        body = None
+
+            if body is None:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(site, port=0):
+    """
+    在背景執行緒啟動模擬網站伺服器
+
+    Args:
+        site (SyntheticSite): 模擬網站內容
+        port (int): 監聽埠號，0 表示自動選擇
+
+    Returns:
+        tuple: (伺服器物件, 網站根網址)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(site))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class RssSampler:
+    """
+    背景取樣本行程及其所有子行程（例如 Chrome）的 RSS 總和，記錄尖峰值
+    需要 Linux 的 /proc；無法取樣時改用 getrusage 的 ru_maxrss
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak_kb:
+            self.peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak_kb = max(self.peak_kb, process_tree_rss_kb(os.getpid()))
+            except OSError:
+                return
+            self._stop.wait(self.interval)
+
+
+def _percentile(values, percentile):
+    """計算百分位數（最近排名法）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(percentile * len(ordered) / 100) - 1))
+    return ordered[index]
+
+
+def _timed(latencies, function):
+    """包裝函式，將每次呼叫的耗時加入 latencies"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def _summarize(name, items, elapsed, latencies, peak_kb, extra=None):
+    """整理單一情境的測量結果"""
+    result = {
+        'scenario': name,
+        'items': items,
+        'seconds': round(elapsed, 3),
+        'items_per_sec': round(items / elapsed, 3) if elapsed else None,
+        'latency_p50_ms': round(_percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'latency_p99_ms': round(_percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+    }
+    result.update(extra or {})
+    return result
+
+
+def bench_scrape_board(base_url, board, max_scrolls):
+    """測量 MopttScraper.scrape_board（預載 + 文章內容）"""
+    from moptt_scraper import MopttScraper
+
+    latencies = []
+    scraper = MopttScraper()
+    scraper.get_article_data = _timed(latencies, scraper.get_article_data)
+    try:
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            data = scraper.scrape_board(f"{base_url}/b/{board}", max_scrolls=max_scrolls,
+                                        progress_file=f"moptt_{board}.json")
+            elapsed = time.perf_counter() - start
+        paths = dict(scraper.http_fetcher.stats)
+    finally:
+        scraper.close()
+    print()
+    return _summarize('scrape_board', len(data), elapsed, latencies, sampler.peak_kb, {'paths': paths})
+
+
+def bench_process_articles(base_url, board, site, workers):
+    """測量 MopttContentScraper.process_articles（workers > 1 時為平行模式）"""
+    from moptt_content_scraper import MopttContentScraper, process_articles_parallel
+
+    json_file = f"moptt_{board}_content.json"
+    articles = [{'url': f"{base_url}/p/{post_id}", 'title': site.articles[post_id]['title'], 'article_number': i + 1}
+                for i, post_id in enumerate(site.boards[board])]
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump(articles, f, ensure_ascii=False, indent=2)
+
+    latencies = []
+    original = MopttContentScraper.get_article_content
+    MopttContentScraper.get_article_content = _timed(latencies, original)
+    try:
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            if workers > 1:
+                process_articles_parallel(json_file, workers=workers)
+            else:
+                scraper = MopttContentScraper()
+                try:
+                    scraper.process_articles(json_file)
+                finally:
+                    scraper.close()
+            elapsed = time.perf_counter() - start
+    finally:
+        MopttContentScraper.get_article_content = original
+    print()
+    return _summarize('process_articles', len(latencies), elapsed, latencies, sampler.peak_kb, {'workers': workers})
+
+
+def bench_get_ptt_data(base_url, board):
+    """測量 ptt_發文數和留言數.py 的 get_ptt_data（索引頁延遲以單頁計）"""
+    import ptt_index_crawler
+
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ptt_發文數和留言數.py')
+    spec = importlib.util.spec_from_file_location('ptt_posts_script', script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    latencies = []
+    original_base_url = ptt_index_crawler.PTT_BASE_URL
+    original_fetch = ptt_index_crawler.PttIndexCrawler.fetch
+
+    async def timed_fetch(self, url):
+        start = time.perf_counter()
+        try:
+            return await original_fetch(self, url)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    ptt_index_crawler.PTT_BASE_URL = base_url
+    ptt_index_crawler.PttIndexCrawler.fetch = timed_fetch
+    try:
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            module.get_ptt_data(f"{base_url}/bbs/{board}/index.html", board)
+            elapsed = time.perf_counter() - start
+    finally:
+        ptt_index_crawler.PTT_BASE_URL = original_base_url
+        ptt_index_crawler.PttIndexCrawler.fetch = original_fetch
+
+    csv_files = glob.glob(f'ptt_{board.lower()}_posts_*.csv')
+    rows = 0
+    if csv_files:
+        with open(csv_files[0], 'r', encoding='utf-8') as f:
+            rows = max(sum(1 for _ in f) - 1, 0)
+    return _summarize('get_ptt_data', rows, elapsed, latencies, sampler.peak_kb, {'pages': len(latencies)})
+
+
+def compare_results(previous_file, current):
+    """
+    與先前的結果檔比較並輸出差異
+
+    Args:
+        previous_file (str): 先前的結果 JSON 檔
+        current (dict): 本次結果
+    """
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = {result['scenario']: result for result in json.load(f)['results']}
+
+    print(f"\n與 {previous_file} 比較：")
+    for result in current['results']:
+        before = previous.get(result['scenario'])
+        if before is None:
+            continue
+        for key in ('items_per_sec', 'latency_p50_ms', 'latency_p99_ms', 'peak_rss_mb'):
+            old, new = before.get(key), result.get(key)
+            if old and new is not None:
+                print(f"  {result['scenario']:<18} {key:<16} {old:>10} -> {new:<10} ({(new - old) / old * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MOPTT / PTT 爬蟲離線效能測試')
+    parser.add_argument('--scenarios', default='scrape_board,process_articles,get_ptt_data',
+                        help='要執行的情境（以逗號分隔）')
+    parser.add_argument('--board', default='Baseball', help='使用的種子看板')
+    parser.add_argument('--max-scrolls', type=int, default=50, help='scrape_board 的滾動次數')
+    parser.add_argument('--workers', type=int, default=1, help='process_articles 的瀏覽器數量')
+    parser.add_argument('--latency-ms', type=float, default=0, help='模擬伺服器每個請求的延遲（毫秒）')
+    parser.add_argument('--force-selenium', action='store_true', help='讓文章頁需要點擊「顯示全部回應」，強制走 Selenium 路徑')
+    parser.add_argument('--output', help='結果 JSON 檔路徑，預設為 bench_results/<時間>.json')
+    parser.add_argument('--compare', help='與先前的結果 JSON 檔比較')
+    parser.add_argument('--serve', action='store_true', help='只啟動模擬伺服器（按 Ctrl+C 結束）')
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    site = SyntheticSite([os.path.join(repo_dir, seed_file) for seed_file in SEED_FILES],
+                         latency=args.latency_ms / 1000, force_selenium=args.force_selenium)
+    server, base_url = start_server(site)
+    print(f"模擬伺服器已啟動：{base_url}")
+
+    if args.serve:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+            sys.exit(0)
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='moptt_bench_')
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        for scenario in [name.strip() for name in args.scenarios.split(',') if name.strip()]:
+            print(f"\n=== 情境：{scenario} ===")
+            try:
+                if scenario == 'scrape_board':
+                    results.append(bench_scrape_board(base_url, args.board, args.max_scrolls))
+                elif scenario == 'process_articles':
+                    results.append(bench_process_articles(base_url, args.board, site, args.workers))
+                elif scenario == 'get_ptt_data':
+                    results.append(bench_get_ptt_data(base_url, args.board))
+                else:
+                    print(f"未知的情境：{scenario}")
+            except Exception as e:
+                print(f"情境 {scenario} 執行失敗: {str(e)}")
+                results.append({'scenario': scenario, 'error': str(e)})
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.shutdown()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'board': args.board,
+        'latency_ms': args.latency_ms,
+        'force_selenium': args.force_selenium,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\n" + json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"結果已儲存至 {output}")
+
+    if args.compare:
+        compare_results(args.compare, report)
@@ -0,0 +1,228 @@
+"""
+長時間保持的瀏覽器工作階段管理
+以一個（或一組）暖機完成的 Chrome 跨看板重複使用，取代每個看板重新啟動瀏覽器；
+驅動程式載入超過指定頁數或記憶體超過門檻時，在歸還時回收重建，
+並可使用固定的使用者設定檔與磁碟快取，讓下次執行時仍保有快取
+"""
+
+import glob
+import os
+import queue
+import time
+from contextlib import contextmanager
+
+from moptt_driver import BLOCK_RESOURCES, create_driver
+
+# ====== 設定區域開始 ======
+# 瀏覽器數量（平行處理時每個 worker 各用一個）
+POOL_SIZE = 1
+
+# 每個驅動程式最多載入的頁數，超過後回收重建
+MAX_PAGES_PER_DRIVER = 1000
+
+# 每個驅動程式（含所有 Chrome 子行程）的記憶體上限（MB），超過後回收重建
+MAX_DRIVER_MEMORY_MB = 1500
+
+# 固定的使用者設定檔目錄，設定後跨次執行保留 Cookie 與磁碟快取；None 表示每次使用暫存設定檔
+PROFILE_DIR = None
+
+# 磁碟快取大小（MB）
+DISK_CACHE_MB = 256
+# ====== 設定區域結束 ======
+
+
+def process_tree_rss_kb(root_pid):
+    """
+    計算行程樹的 RSS 總和（KB），需要 Linux 的 /proc
+
+    Args:
+        root_pid (int): 根行程 ID
+
+    Returns:
+        int: 根行程及所有子孫行程的 RSS 總和（KB），無法讀取時為 0
+    """
+    children = {}
+    for stat_file in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(stat_file, 'r') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(stat_file.split('/')[2]))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f'/proc/{pid}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class BrowserSession:
+    """
+    單一瀏覽器工作階段
+    第一次取用 driver 時才啟動 Chrome，並記錄啟動耗時與已載入的頁數
+    """
+
+    def __init__(self, slot=0, profile_dir=PROFILE_DIR, disk_cache_mb=DISK_CACHE_MB, block=BLOCK_RESOURCES):
+        """
+        初始化工作階段設定
+
+        Args:
+            slot (int): 工作階段編號，用於區分各自的設定檔目錄
+            profile_dir (str, optional): 使用者設定檔根目錄
+            disk_cache_mb (int): 磁碟快取大小（MB）
+            block (bool): 是否封鎖不需要的資源
+        """
+        self.slot = slot
+        self.profile_dir = os.path.join(profile_dir, f'slot-{slot}') if profile_dir else None
+        self.disk_cache_mb = disk_cache_mb
+        self.block = block
+        self.pages = 0
+        self.launches = 0
+        self.recycles = 0
+        self.startup_seconds = []
+        self._driver = None
+
+    @property
+    def driver(self):
+        """目前的驅動程式，尚未啟動時立即啟動"""
+        if self._driver is None:
+            self._start()
+        return self._driver
+
+    def _start(self):
+        """啟動 Chrome 並包裝 get 以計算載入頁數"""
+        started = time.perf_counter()
+        driver = create_driver(block=self.block, profile_dir=self.profile_dir, disk_cache_mb=self.disk_cache_mb)
+        self.startup_seconds.append(time.perf_counter() - started)
+        self.launches += 1
+        self.pages = 0
+
+        original_get = driver.get
+
+        def counting_get(url):
+            self.pages += 1
+            return original_get(url)
+
+        driver.get = counting_get
+        self._driver = driver
+
+    def memory_mb(self):
+        """
+        取得驅動程式行程樹（chromedriver 與 Chrome）的記憶體用量
+
+        Returns:
+            float: 記憶體用量（MB），無法測量時為 0
+        """
+        if self._driver is None:
+            return 0.0
+        try:
+            return process_tree_rss_kb(self._driver.service.process.pid) / 1024
+        except AttributeError:
+            return 0.0
+
+    def needs_recycle(self, max_pages=MAX_PAGES_PER_DRIVER, max_memory_mb=MAX_DRIVER_MEMORY_MB):
+        """
+        判斷是否應回收重建驅動程式
+
+        Args:
+            max_pages (int): 頁數上限
+            max_memory_mb (float): 記憶體上限（MB）
+
+        Returns:
+            bool: 是否超過任一上限
+        """
+        if self._driver is None:
+            return False
+        return self.pages >= max_pages or self.memory_mb() >= max_memory_mb
+
+    def recycle(self):
+        """關閉目前的驅動程式，下次取用時重新啟動"""
+        if self._driver is not None:
+            self.quit()
+            self.recycles += 1
+
+    def quit(self):
+        """關閉瀏覽器"""
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            finally:
+                self._driver = None
+
+
+class BrowserPool:
+    """
+    瀏覽器工作階段池
+    以 lease() 借出暖機完成的驅動程式，歸還時檢查頁數與記憶體並視需要回收
+    """
+
+    def __init__(self, size=POOL_SIZE, profile_dir=PROFILE_DIR, disk_cache_mb=DISK_CACHE_MB,
+                 max_pages=MAX_PAGES_PER_DRIVER, max_memory_mb=MAX_DRIVER_MEMORY_MB, block=BLOCK_RESOURCES):
+        """
+        初始化工作階段池
+
+        Args:
+            size (int): 瀏覽器數量
+            profile_dir (str, optional): 使用者設定檔根目錄
+            disk_cache_mb (int): 磁碟快取大小（MB）
+            max_pages (int): 每個驅動程式的頁數上限
+            max_memory_mb (float): 每個驅動程式的記憶體上限（MB）
+            block (bool): 是否封鎖不需要的資源
+        """
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.sessions = [BrowserSession(slot, profile_dir, disk_cache_mb, block) for slot in range(size)]
+        self._idle = queue.LifoQueue()
+        for session in self.sessions:
+            self._idle.put(session)
+
+    @contextmanager
+    def lease(self):
+        """
+        借出一個驅動程式，離開 with 區塊時歸還
+
+        Yields:
+            WebDriver: Chrome 瀏覽器驅動程式
+        """
+        session = self._idle.get()
+        try:
+            yield session.driver
+        finally:
+            try:
+                if session.needs_recycle(self.max_pages, self.max_memory_mb):
+                    session.recycle()
+            finally:
+                self._idle.put(session)
+
+    def summary(self):
+        """
+        取得工作階段池摘要
+
+        Returns:
+            str: 例如「啟動 2 次（平均 1.84 秒）、回收 1 次」
+        """
+        startups = [seconds for session in self.sessions for seconds in session.startup_seconds]
+        average = sum(startups) / len(startups) if startups else 0
+        recycles = sum(session.recycles for session in self.sessions)
+        return f"啟動 {len(startups)} 次（平均 {average:.2f} 秒）、回收 {recycles} 次"
+
+    def close(self):
+        """關閉所有瀏覽器"""
+        for session in self.sessions:
+            session.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,201 @@
+"""
+MOPTT 文章回應儲存
+熱門文章可能有上千則回應，全部放在文章資料的 responses_content 中會讓每次存檔都重寫整份回應。
+本模組將每篇文章的回應以僅附加的 JSONL 檔分開保存（<目錄>/<看板>/<文章 ID>.jsonl），
+每則回應有穩定的鍵（回應文字雜湊 + 同文字的出現序號），重新爬取時只附加尚未保存的回應
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from moptt_post_id import parse_post_board
+
+# ====== 設定區域開始 ======
+# 回應儲存目錄
+COMMENT_STORE_DIR = 'moptt_comments'
+# ====== 設定區域結束 ======
+
+
+def comment_key(text, occurrence):
+    """
+    取得回應的穩定鍵
+    不使用回應在頁面上的位置，因此前面的回應被刪除或插入時，其他回應的鍵不受影響；
+    同一篇文章中文字相同的回應（例如「推」）以出現序號區分
+
+    Args:
+        text (str): 回應文字
+        occurrence (int): 此文字在文章中第幾次出現（從 0 開始）
+
+    Returns:
+        str: 例如 3f2a9c1b7d4e5a60#0
+    """
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+    return f"{digest}#{occurrence}"
+
+
+class CommentWriter:
+    """
+    單篇文章的回應寫入器
+    依頁面順序分批傳入回應，只附加尚未保存的回應；以 with 使用，離開時關閉檔案
+    """
+
+    def __init__(self, path):
+        """
+        載入已保存回應的鍵
+
+        Args:
+            path (str): 文章的回應檔路徑
+        """
+        self.path = path
+        self.keys = set()
+        self.seen = Counter()
+        self.added = 0
+        self.total = 0
+        self._file = None
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        self.keys.add(json.loads(line)['key'])
+                    except (ValueError, KeyError):
+                        break
+        except FileNotFoundError:
+            pass
+        self.stored = len(self.keys)
+
+    def add(self, texts):
+        """
+        附加一批回應中尚未保存的部分
+
+        Args:
+            texts (list): 一批回應文字（依頁面順序，需從第一則開始依序傳入）
+
+        Returns:
+            int: 本批新增的回應數
+        """
+        fetched_at = int(time.time())
+        lines = []
+        for text in texts:
+            key = comment_key(text, self.seen[text])
+            self.seen[text] += 1
+            self.total += 1
+            if key in self.keys:
+                continue
+            self.keys.add(key)
+            lines.append(json.dumps({'key': key, 'seq': self.stored + self.added + len(lines),
+                                     'text': text, 'fetched_at': fetched_at}, ensure_ascii=False) + '\n')
+        if lines:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.writelines(lines)
+            self.added += len(lines)
+        return len(lines)
+
+    def close(self):
+        """關閉回應檔"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CommentStore:
+    """
+    文章回應儲存類別
+    每篇文章一個僅附加的 JSONL 檔，每行為 {key, seq, text, fetched_at}
+    """
+
+    def __init__(self, base_dir=COMMENT_STORE_DIR):
+        """
+        Args:
+            base_dir (str): 回應儲存目錄
+        """
+        self.base_dir = base_dir
+
+    def path_for(self, url):
+        """
+        取得文章的回應檔路徑
+
+        Args:
+            url (str): 文章網址，例如 https://moptt.tw/p/Baseball.M.1734516576.A.F6F
+
+        Returns:
+            str: 例如 moptt_comments/Baseball/Baseball.M.1734516576.A.F6F.jsonl
+        """
+        post_id = url.rstrip('/').rsplit('/', 1)[-1]
+        return os.path.join(self.base_dir, parse_post_board(url) or '_', f"{post_id}.jsonl")
+
+    def writer(self, url):
+        """
+        開啟文章的回應寫入器
+
+        Args:
+            url (str): 文章網址
+
+        Returns:
+            CommentWriter: 回應寫入器
+        """
+        return CommentWriter(self.path_for(url))
+
+    def iter_comments(self, url):
+        """
+        依保存順序逐筆讀取文章的回應
+
+        Args:
+            url (str): 文章網址
+
+        Yields:
+            str: 回應文字
+        """
+        try:
+            with open(self.path_for(url), 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        return
+                    yield json.loads(line)['text']
+        except FileNotFoundError:
+            return
+
+    def load(self, url):
+        """
+        取得文章的所有回應
+
+        Args:
+            url (str): 文章網址
+
+        Returns:
+            list: 回應文字列表
+        """
+        return list(self.iter_comments(url))
+
+
+def collect_comments(comment_store, url, batches):
+    """
+    依設定收集回應：有回應儲存時串流寫入並只回傳統計，否則合併成 responses_content
+
+    Args:
+        comment_store (CommentStore, optional): 回應儲存，None 表示內嵌於文章資料
+        url (str): 文章網址
+        batches (iterable): 依頁面順序的回應文字批次
+
+    Returns:
+        dict: 要合併到文章資料的欄位，
+              {'responses_content': [...]} 或 {'comments_stored': 已保存總數, 'comments_added': 本次新增數}
+    """
+    if comment_store is None:
+        return {'responses_content': [text for batch in batches for text in batch]}
+    with comment_store.writer(url) as writer:
+        for batch in batches:
+            writer.add(batch)
+    return {'comments_stored': writer.stored + writer.added, 'comments_added': writer.added}
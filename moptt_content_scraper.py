@@ -3,23 +3,47 @@ MOPTT 文章內容爬蟲
 專門用於爬取文章的詳細內容（互動數據、回應等）
 """
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+import argparse
 import json
+import os
+import queue
+import threading
 import time
 from datetime import datetime
+from moptt_http_fetcher import MopttHttpFetcher, TIME_SELECTOR, INTERACTION_SELECTOR, SHOW_ALL_SELECTOR, COMMENT_SELECTOR
+from moptt_post_id import post_time_from_id
+from moptt_page_scripts import WaitRecorder, iter_comment_batches
+from moptt_comment_store import CommentStore, collect_comments
+from moptt_driver import TransferMeter, create_driver
+from moptt_browser_session import BrowserPool
+import moptt_metrics
+from moptt_storage import JsonArticleStore, SqliteArticleStore, board_from_json_file
 
 # ====== 設定區域開始 ======
-# Chrome 瀏覽器驅動程式的路徑
-chrome_driver_path = '/Users/aotter/chromedriver-mac-arm64/chromedriver'
+# Chrome 瀏覽器驅動程式的路徑與資源封鎖設定請見 moptt_driver.py
 
-# 等待時間設定（秒）
+# 等待時間設定（秒）：頁面內等待元素出現的最長時間
 WAIT_TIME = 0.5
+
+# 文章之間的間隔（秒），0 表示不額外等待
+ARTICLE_INTERVAL = 0
+
+# 頁面內非同步腳本的逾時秒數（需大於各項等待時間）
+SCRIPT_TIMEOUT = 30
+
+# 平行模式下每完成幾篇文章合併寫回一次檔案
+SAVE_EVERY = 5
+
+# SQLite 資料庫路徑，設定後以資料庫取代 JSON 進度檔
+SQLITE_DB = None
+
+# 回應儲存目錄，設定後回應內容分批串流寫入各文章的回應檔（見 moptt_comment_store.py），
+# 文章資料改為只記錄回應數；None 表示回應內容仍內嵌於文章資料的 responses_content
+COMMENT_STORE_DIR = None
 # ====== 設定區域結束 ======
 
 
@@ -29,78 +53,138 @@ class MopttContentScraper:
     負責爬取文章的詳細內容（互動數據、回應等）
     """
     
-    def __init__(self):
-        """初始化爬蟲設定"""
-        self.options = Options()
-        self.options.add_argument('--headless')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.driver = webdriver.Chrome(service=Service(chrome_driver_path), options=self.options)
+    def __init__(self, driver=None, started_at=None):
+        """
+        初始化爬蟲設定；指定 driver 時使用外部管理的暖機驅動，close 時不會關閉
+        started_at 為「啟動到第一篇文章」的計時起點，使用借出的驅動時應傳入借用前的 time.perf_counter()
+        """
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_article_seconds = None
+        self.owns_driver = driver is None
+        self.driver = driver or create_driver()
+        self.driver.set_script_timeout(SCRIPT_TIMEOUT)
         self.wait = WebDriverWait(self.driver, WAIT_TIME)
+        self.http_fetcher = MopttHttpFetcher()
+        self.wait_recorder = WaitRecorder(scraper='content')
+        self.transfer_meter = TransferMeter()
+        self.comment_store = CommentStore(COMMENT_STORE_DIR) if COMMENT_STORE_DIR else None
 
-    def get_article_content(self, article_info):
+    def get_article_content(self, article_info, revalidate=False):
         """
         擷取單篇文章的詳細內容
+        先以 HTTP 快速擷取，失敗時才改用 Selenium 開啟頁面
         
         Args:
             article_info: 包含文章基本資訊的字典
+            revalidate (bool): 略過未到期的 HTTP 快取（重新爬取互動數據時使用）
             
         Returns:
             dict: 包含文章所有資訊的字典
         """
+        with moptt_metrics.stage('http_fetch', scraper='content'):
+            fetched = self.http_fetcher.fetch_article(article_info, revalidate)
+        if fetched is not None:
+            article_info.update({
+                'post_time': fetched['post_time'],
+                'likes': fetched['likes'],
+                'responses': fetched['responses'],
+                'boos': fetched['boos'],
+                'content_fetched': True,
+                'fetched_at': int(time.time())
+            })
+            self._update_comments(article_info, [fetched['responses_content']])
+            return article_info
+
+        self.http_fetcher.record_fallback()
+        moptt_metrics.count('http_fallback', scraper='content')
+        return self.get_article_content_with_selenium(article_info)
+
+    def _update_comments(self, article_info, batches):
+        """
+        將回應寫入文章資料，或在設定回應儲存時串流寫入回應檔並移除文章資料中的 responses_content
+
+        Args:
+            article_info (dict): 文章資訊
+            batches (iterable): 依頁面順序的回應文字批次
+        """
+        if self.comment_store is not None:
+            article_info.pop('responses_content', None)
+        article_info.update(collect_comments(self.comment_store, article_info['url'], batches))
+
+    def get_article_content_with_selenium(self, article_info):
+        """
+        以 Selenium 擷取單篇文章的詳細內容
+        
+        Args:
+            article_info: 包含文章基本資訊的字典
+            
+        Returns:
+            dict: 包含文章所有資訊的字典；頁面載入逾時或發生錯誤時原樣返回
+                  （不設定 content_fetched 與 fetched_at，避免以 0 覆蓋既有的互動數據）
+        """
         try:
-            self.driver.get(article_info['url'])
-            time.sleep(WAIT_TIME)  # 等待頁面載入
+            with moptt_metrics.stage('driver_get', scraper='content'):
+                self.driver.get(article_info['url'])
+            # 發文時間由文章 ID 取得，只需在頁面內等待互動數據出現；ID 無法解析時才等待並擷取時間元素
+            post_time = post_time_from_id(article_info['url'])
+            wait_selector = INTERACTION_SELECTOR if post_time else TIME_SELECTOR
+            loaded = self.wait_recorder.wait(self.driver, 'page_load', wait_selector, 1, WAIT_TIME, WAIT_TIME)
+            if loaded['timed_out']:
+                print(f"\r等待文章頁面載入逾時: {article_info['url']}", end='')
+                moptt_metrics.count('article_none', scraper='content')
+                return article_info
+            self.transfer_meter.record(self.driver)
 
-            # 擷取發文時間
-            post_time = ""
-            try:
-                time_element = self.driver.find_element(By.CSS_SELECTOR, "div.o_pqSZvuHj7qfwrPg7tI time")
-                if time_element:
-                    post_time = time_element.get_attribute('datetime')
-            except NoSuchElementException:
-                pass
+            if not post_time:
+                try:
+                    time_element = self.driver.find_element(By.CSS_SELECTOR, TIME_SELECTOR)
+                    if time_element:
+                        post_time = time_element.get_attribute('datetime')
+                except NoSuchElementException:
+                    pass
 
             # 擷取互動數據
             likes = comments = boos = 0
             try:
-                interaction_divs = self.driver.find_elements(By.CLASS_NAME, "T86VdSgcSk_wVSJ87Jd_")
-                for div in interaction_divs:
-                    try:
-                        icon = div.find_element(By.TAG_NAME, "i")
-                        count_text = div.text.strip()
-                        count = int(count_text) if count_text.isdigit() else 0
-                        icon_class = icon.get_attribute("class") or ""
+                with moptt_metrics.stage('extract_interactions', scraper='content'):
+                    interaction_divs = self.driver.find_elements(By.CLASS_NAME, "T86VdSgcSk_wVSJ87Jd_")
+                    for div in interaction_divs:
+                        try:
+                            icon = div.find_element(By.TAG_NAME, "i")
+                            count_text = div.text.strip()
+                            count = int(count_text) if count_text.isdigit() else 0
+                            icon_class = icon.get_attribute("class") or ""
                         
-                        if "fa-thumbs-up" in icon_class:
-                            likes = count
-                        elif "fa-thumbs-down" in icon_class:
-                            boos = count
-                        elif "fa-comment-dots" in icon_class:
-                            comments = count
-                    except:
-                        continue
+                            if "fa-thumbs-up" in icon_class:
+                                likes = count
+                            elif "fa-thumbs-down" in icon_class:
+                                boos = count
+                            elif "fa-comment-dots" in icon_class:
+                                comments = count
+                        except:
+                            continue
             except:
                 pass
 
             # 擷取回應內容
-            comments_content = []
+            comment_fields = {} if self.comment_store else {'responses_content': []}
             try:
                 # 嘗試點擊「顯示全部回應」按鈕
                 try:
-                    show_all_button = self.driver.find_element(By.CSS_SELECTOR, "div.FEfFxCwDtx6IcnHAFaMR")
-                    if show_all_button:
-                        show_all_button.click()
-                        time.sleep(WAIT_TIME)
+                    with moptt_metrics.stage('show_all', scraper='content'):
+                        show_all_buttons = self.driver.find_elements(By.CSS_SELECTOR, SHOW_ALL_SELECTOR)
+                        if show_all_buttons:
+                            comment_count = len(self.driver.find_elements(By.CSS_SELECTOR, COMMENT_SELECTOR))
+                            show_all_buttons[0].click()
+                            # 等待新的回應出現
+                            self.wait_recorder.wait(self.driver, 'show_all', COMMENT_SELECTOR, comment_count + 1, WAIT_TIME, WAIT_TIME)
                 except:
                     pass
 
-                # 擷取回應
-                comment_spans = self.driver.find_elements(By.CLASS_NAME, "qIm88EMEzWPkVVqwCol0")
-                for span in comment_spans:
-                    comment_text = span.text.strip()
-                    if comment_text:
-                        comments_content.append(comment_text)
+                # 分批擷取回應（每批一次 WebDriver 往返）
+                with moptt_metrics.stage('extract_comments', scraper='content'):
+                    comment_fields = collect_comments(self.comment_store, article_info['url'],
+                                                      iter_comment_batches(self.driver, COMMENT_SELECTOR))
             except:
                 pass
 
@@ -110,70 +194,245 @@ class MopttContentScraper:
                 'likes': likes,
                 'responses': comments,
                 'boos': boos,
-                'responses_content': comments_content,
-                'content_fetched': True
+                'content_fetched': True,
+                'fetched_at': int(time.time())
             })
+            if self.comment_store is not None:
+                article_info.pop('responses_content', None)
+            article_info.update(comment_fields)
             
             return article_info
             
         except Exception as e:
             print(f"\r擷取文章內容時發生錯誤: {str(e)}", end='')
+            moptt_metrics.count('article_none', scraper='content')
             return article_info
 
-    def process_articles(self, json_file):
+    def process_articles(self, json_file, store=None):
         """
         處理 JSON 檔案中的所有文章
         
         Args:
             json_file: JSON 檔案路徑
+            store (ArticleStore, optional): 文章儲存，指定時取代 JSON 檔案
         """
         try:
-            # 讀取文章列表
-            with open(json_file, 'r', encoding='utf-8') as f:
-                articles = json.load(f)
+            # 讀取尚未爬取內容的文章
+            board = board_from_json_file(json_file)
+            if store is None:
+                store = JsonArticleStore(json_file)
+            articles = store.unfetched_articles(board)
             
             total_articles = len(articles)
             print(f"\r開始處理 {total_articles} 篇文章的內容", end='')
             
             # 處理每篇文章
             for i, article in enumerate(articles):
-                # 檢查是否已經爬取過內容
-                if article.get('content_fetched'):
-                    continue
-                
                 print(f"\r處理進度: {i+1}/{total_articles} | 當前: {article['title'][:30]}{'...' if len(article['title']) > 30 else ''}", end='')
                 
-                # 爬取文章內容
+                # 爬取文章內容並儲存進度
                 updated_article = self.get_article_content(article)
-                articles[i] = updated_article
-                
-                # 定期儲存進度
-                if (i + 1) % 5 == 0 or i == len(articles) - 1:  # 改為每5篇儲存一次
-                    with open(json_file, 'w', encoding='utf-8') as f:
-                        json.dump(articles, f, ensure_ascii=False, indent=2)
-                    print(f"\r已儲存進度，完成 {i+1}/{total_articles} 篇", end='')
+                with moptt_metrics.stage('save', scraper='content'):
+                    store.upsert(updated_article)
+                if self.first_article_seconds is None:
+                    self.first_article_seconds = time.perf_counter() - self.started_at
                 
-                time.sleep(WAIT_TIME)  # 控制爬取間隔
+                if ARTICLE_INTERVAL:
+                    time.sleep(ARTICLE_INTERVAL)  # 控制爬取間隔
             
-            print(f"\r文章內容爬取完成，共處理 {total_articles} 篇文章", end='')
+            with moptt_metrics.stage('finalize', scraper='content'):
+                store.finalize()
+            print(f"\r文章內容爬取完成，共處理 {total_articles} 篇文章 | {self.http_fetcher.summary()}", end='')
+            print(f"\n等待時間：{self.wait_recorder.summary()}")
+            print(f"Selenium 頁面傳輸量：{self.transfer_meter.summary()}")
+            if self.first_article_seconds is not None:
+                print(f"啟動到第一篇文章：{self.first_article_seconds:.2f} 秒")
             
         except Exception as e:
             print(f"\r處理文章時發生錯誤: {str(e)}", end='')
         
     def close(self):
-        """關閉瀏覽器"""
-        self.driver.quit()
+        """關閉瀏覽器（僅限自行建立的）與 HTTP 連線池"""
+        if self.owns_driver:
+            self.driver.quit()
+        self.http_fetcher.close()
+
+
+def merge_articles_into_file(json_file, fetched_articles):
+    """
+    將已爬取內容的文章合併寫回 JSON 檔案
+    以 URL 對應，重新讀取檔案後再覆寫，保留其他程式期間新增的文章，
+    並透過暫存檔 + os.replace 原子性地取代原檔案
+
+    Args:
+        json_file: JSON 檔案路徑
+        fetched_articles (dict): 以 URL 為鍵的已更新文章
+    """
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+    except FileNotFoundError:
+        articles = []
+
+    for i, article in enumerate(articles):
+        updated = fetched_articles.get(article.get('url'))
+        if updated is not None:
+            articles[i] = updated
+
+    temp_file = f"{json_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(articles, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, json_file)
+
+
+def process_articles_parallel(json_file, workers=4, store=None, pool=None):
+    """
+    以多個無頭瀏覽器平行處理 JSON 檔案中的文章
+    每個 worker 各自擁有一個 MopttContentScraper，從共用的工作佇列
+    領取 content_fetched 為 False 的文章
+
+    Args:
+        json_file: JSON 檔案路徑
+        workers (int): 同時執行的瀏覽器數量
+        store (ArticleStore, optional): 文章儲存，指定時結果直接寫入儲存而非合併回 JSON 檔案
+        pool (BrowserPool, optional): 瀏覽器工作階段池，指定時 worker 借用暖機的瀏覽器而非各自啟動
+
+    Returns:
+        list: 每個 worker 的統計資訊（處理篇數、耗時、路徑統計）
+    """
+    if store is not None:
+        articles = store.unfetched_articles(board_from_json_file(json_file))
+    else:
+        # 先將尚未壓縮的進度日誌併入 JSON 檔，避免之後重播時覆蓋本次結果
+        JsonArticleStore(json_file).finalize()
+        with open(json_file, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+
+    work_queue = queue.Queue()
+    for article in articles:
+        if not article.get('content_fetched'):
+            work_queue.put(article)
+
+    total_pending = work_queue.qsize()
+    print(f"\r開始以 {workers} 個瀏覽器處理 {total_pending} 篇文章的內容", end='')
+
+    started_at = time.perf_counter()
+    lock = threading.Lock()
+    pending_updates = {}
+    progress = {'done': 0, 'first_article_seconds': None}
+    worker_stats = []
+
+    def flush_updates():
+        """將累積的結果合併寫回檔案或文章儲存（呼叫端需持有 lock）"""
+        if pending_updates:
+            if store is not None:
+                for updated_article in pending_updates.values():
+                    store.upsert(updated_article)
+            else:
+                merge_articles_into_file(json_file, pending_updates)
+            pending_updates.clear()
+
+    def worker(worker_id):
+        if pool is None:
+            run_worker(worker_id, None)
+        else:
+            with pool.lease() as driver:
+                run_worker(worker_id, driver)
+
+    def run_worker(worker_id, driver):
+        scraper = None
+        processed = 0
+        start_time = time.time()
+        try:
+            scraper = MopttContentScraper(driver=driver)
+            while True:
+                try:
+                    article = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                updated_article = scraper.get_article_content(dict(article))
+                processed += 1
+
+                with lock:
+                    pending_updates[updated_article['url']] = updated_article
+                    progress['done'] += 1
+                    if progress['first_article_seconds'] is None:
+                        progress['first_article_seconds'] = time.perf_counter() - started_at
+                    print(f"\r處理進度: {progress['done']}/{total_pending} | worker {worker_id}: {article['title'][:30]}{'...' if len(article['title']) > 30 else ''}", end='')
+                    if len(pending_updates) >= SAVE_EVERY:
+                        with moptt_metrics.stage('save', scraper='content'):
+                            flush_updates()
+
+                if ARTICLE_INTERVAL:
+                    time.sleep(ARTICLE_INTERVAL)  # 控制爬取間隔
+        except Exception as e:
+            print(f"\rworker {worker_id} 發生錯誤: {str(e)}", end='')
+        finally:
+            elapsed = time.time() - start_time
+            with lock:
+                worker_stats.append({
+                    'worker': worker_id,
+                    'articles': processed,
+                    'seconds': elapsed,
+                    'paths': scraper.http_fetcher.summary() if scraper else ''
+                })
+            if scraper:
+                scraper.close()
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(1, workers + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with lock:
+        flush_updates()
+
+    # 輸出每個 worker 的吞吐量摘要
+    print()
+    print(f"{'worker':>6} | {'篇數':>6} | {'耗時(秒)':>8} | {'篇/秒':>6} | 路徑")
+    total_articles = total_seconds = 0
+    for stats in sorted(worker_stats, key=lambda s: s['worker']):
+        rate = stats['articles'] / stats['seconds'] if stats['seconds'] else 0
+        print(f"{stats['worker']:>6} | {stats['articles']:>6} | {stats['seconds']:>8.1f} | {rate:>6.2f} | {stats['paths']}")
+        total_articles += stats['articles']
+        total_seconds = max(total_seconds, stats['seconds'])
+    overall_rate = total_articles / total_seconds if total_seconds else 0
+    print(f"{'總計':>6} | {total_articles:>6} | {total_seconds:>8.1f} | {overall_rate:>6.2f} |")
+    if progress['first_article_seconds'] is not None:
+        print(f"啟動到第一篇文章：{progress['first_article_seconds']:.2f} 秒")
+
+    return worker_stats
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MOPTT 文章內容爬蟲')
+    parser.add_argument('--workers', type=int, default=1, help='同時執行的無頭瀏覽器數量')
+    args = parser.parse_args()
+
     # 設定要處理的看板
     board_names = ["Beauty", "marvel", "NBA"]
+    moptt_metrics.configure(job='moptt_content_scraper')
+    store = SqliteArticleStore(SQLITE_DB) if SQLITE_DB else None
+    # 整個執行期間共用暖機的瀏覽器，不再每個看板重新啟動
+    pool = BrowserPool(size=args.workers)
     
     for board_name in board_names:
         json_file_path = f'moptt_{board_name}.json'
         
-        # 建立爬蟲實例並執行爬蟲
-        scraper = MopttContentScraper()
-        scraper.process_articles(json_file_path)
-        scraper.close()
+        if args.workers > 1:
+            process_articles_parallel(json_file_path, workers=args.workers, store=store, pool=pool)
+        else:
+            leased_at = time.perf_counter()
+            with pool.lease() as driver:
+                scraper = MopttContentScraper(driver=driver, started_at=leased_at)
+                scraper.process_articles(json_file_path, store=store)
+                scraper.close()
         print(f"\r{board_name} 看板文章內容處理完成")
+
+    print(f"瀏覽器：{pool.summary()}")
+    pool.close()
+    if store:
+        store.close()
+    moptt_metrics.report()
@@ -1,14 +1,161 @@
 """
 MOPTT 資料轉換工具
 用於將 JSON 格式的爬蟲資料轉換為 CSV 格式
+以串流方式逐筆解析 JSON 陣列並分批寫出 CSV，記憶體用量不隨檔案大小成長；
+多個看板檔案以多行程平行轉換
+另提供依看板與發文日期分區的 Parquet 欄式匯出，以及支援欄位與條件下推的讀取工具
 """
 
+import csv
 import json
-import pandas as pd
-from datetime import datetime
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
 import os
 import glob
 
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from moptt_post_id import parse_post_epoch
+from moptt_storage import board_from_json_file
+
+# ====== 設定區域開始 ======
+# 串流解析時每次讀取的字元數
+READ_CHUNK_SIZE = 1 << 20
+
+# 每累積多少筆資料寫出一次 CSV
+WRITE_BATCH_SIZE = 1000
+
+# 平行轉換的行程數（None 表示使用 CPU 核心數）
+MAX_PROCESSES = None
+
+# Parquet 輸出目錄
+PARQUET_DIR = 'moptt_parquet'
+
+# 計算分區日期（post_date）所用的時區（台灣時間）
+PARTITION_TIMEZONE = timezone(timedelta(hours=8))
+# ====== 設定區域結束 ======
+
+SEPARATOR_PATTERN = re.compile(r'[\s,]*')
+WHITESPACE_PATTERN = re.compile(r'\s*')
+
+# Parquet 欄位型別，board 與 post_date 為分區欄位
+PARQUET_SCHEMA = pa.schema([
+    ('url', pa.string()),
+    ('title', pa.string()),
+    ('article_number', pa.int64()),
+    ('post_time', pa.timestamp('s', tz='UTC')),
+    ('likes', pa.int64()),
+    ('responses', pa.int64()),
+    ('boos', pa.int64()),
+    ('responses_content', pa.list_(pa.string())),
+    ('content_fetched', pa.bool_()),
+    ('board', pa.string()),
+    ('post_date', pa.date32()),
+])
+PARTITION_SCHEMA = pa.schema([('board', pa.string()), ('post_date', pa.date32())])
+
+FILTER_OPERATORS = {
+    '==': lambda field, value: field == value,
+    '!=': lambda field, value: field != value,
+    '<': lambda field, value: field < value,
+    '<=': lambda field, value: field <= value,
+    '>': lambda field, value: field > value,
+    '>=': lambda field, value: field >= value,
+    'in': lambda field, value: field.isin(value),
+}
+
+
+def iter_json_array(json_file_path, chunk_size=READ_CHUNK_SIZE):
+    """
+    串流解析 JSON 陣列檔案，逐筆產生陣列元素
+    
+    Args:
+        json_file_path (str): 內容為 JSON 陣列的檔案路徑
+        chunk_size (int): 每次讀取的字元數
+    
+    Yields:
+        dict: 陣列中的每一筆資料
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"檔案內容不是 JSON 陣列：{json_file_path}")
+        pos = 1
+        eof = False
+
+        while True:
+            # 略過元素之間的空白與逗號
+            pos = SEPARATOR_PATTERN.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("需要更多資料", buffer, pos)
+                item, end = decoder.raw_decode(buffer, pos)
+                if not eof:
+                    # 數字可能在區塊邊界被截斷（例如 3. 或 -5e 只解析出 3、-5），
+                    # 元素之後直到緩衝區結尾都是空白，或下一個字元不是逗號或 ] 時，讀入更多資料後重新解析
+                    following = WHITESPACE_PATTERN.match(buffer, end).end()
+                    if following == len(buffer) or buffer[following] not in ',]':
+                        raise json.JSONDecodeError("需要更多資料", buffer, pos)
+            except json.JSONDecodeError:
+                # 元素尚未完整讀入，捨棄已解析的部分並讀取下一段
+                if eof:
+                    raise ValueError(f"JSON 陣列未正確結尾：{json_file_path}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            pos = end
+            yield item
+
+
+def _csv_value(value):
+    """將欄位值轉為與 pandas to_csv 相同的字串表示"""
+    if value is None:
+        return ''
+    return value
+
+
+def stream_json_to_csv(json_file_path, output_csv_path, batch_size=WRITE_BATCH_SIZE):
+    """
+    以串流方式將 JSON 陣列檔案轉換為 CSV
+    第一次掃描收集欄位（依首次出現順序，與 pd.DataFrame 相同），第二次掃描分批寫出
+    
+    Args:
+        json_file_path (str): JSON 檔案的路徑
+        output_csv_path (str): 輸出 CSV 檔案的路徑
+        batch_size (int): 每批寫出的筆數
+    
+    Returns:
+        int: 轉換的資料筆數
+    """
+    fieldnames = {}
+    for record in iter_json_array(json_file_path):
+        for key in record:
+            fieldnames.setdefault(key, None)
+    fieldnames = list(fieldnames)
+
+    count = 0
+    with open(output_csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        batch = []
+        for record in iter_json_array(json_file_path):
+            batch.append([_csv_value(record.get(key)) for key in fieldnames])
+            if len(batch) >= batch_size:
+                writer.writerows(batch)
+                count += len(batch)
+                batch = []
+        writer.writerows(batch)
+        count += len(batch)
+    return count
+
 
 def convert_json_to_csv(json_file_path, output_csv_path=None):
     """
@@ -25,30 +172,25 @@ def convert_json_to_csv(json_file_path, output_csv_path=None):
     if not os.path.exists(json_file_path):
         raise FileNotFoundError(f"找不到檔案：{json_file_path}")
 
-    # 讀取 JSON 檔案
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # 將資料轉換為 DataFrame
-    df = pd.DataFrame(data)
-    
     # 如果沒有指定輸出路徑，則使用預設格式
     if output_csv_path is None:
         output_csv_path = json_file_path.replace('.json', '.csv')
     
-    # 將 DataFrame 儲存為 CSV
-    df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')
-    print(f'CSV 檔案已儲存至: {output_csv_path}')
+    # 串流解析 JSON 並分批寫出 CSV
+    count = stream_json_to_csv(json_file_path, output_csv_path)
+    print(f'CSV 檔案已儲存至: {output_csv_path}（{count} 筆）')
     return output_csv_path
 
 
-def convert_all_json_files(directory='.', pattern='moptt_*.json'):
+def convert_all_json_files(directory='.', pattern='moptt_*.json', max_processes=MAX_PROCESSES):
     """
     轉換指定目錄下所有符合模式的 JSON 檔案
+    各檔案以多行程平行轉換
     
     Args:
         directory (str): 要搜尋的目錄路徑，預設為當前目錄
         pattern (str): 檔案名稱模式，預設為 'moptt_*.json'
+        max_processes (int, optional): 平行轉換的行程數
     
     Returns:
         list: 轉換後的 CSV 檔案路徑列表
@@ -61,17 +203,183 @@ def convert_all_json_files(directory='.', pattern='moptt_*.json'):
         print("找不到任何符合條件的 JSON 檔案")
         return converted_files
     
-    for json_file in json_files:
-        try:
-            csv_file = convert_json_to_csv(json_file)
-            converted_files.append(csv_file)
-            print(f"成功轉換：{json_file}")
-        except Exception as e:
-            print(f"轉換 {json_file} 時發生錯誤: {str(e)}")
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = {executor.submit(convert_json_to_csv, json_file): json_file for json_file in json_files}
+        for future in as_completed(futures):
+            json_file = futures[future]
+            try:
+                csv_file = future.result()
+                converted_files.append(csv_file)
+                print(f"成功轉換：{json_file}")
+            except Exception as e:
+                print(f"轉換 {json_file} 時發生錯誤: {str(e)}")
     
     return converted_files
 
 
+def _parse_post_time(record):
+    """
+    取得文章的發文時間（UTC）
+    優先使用 post_time 欄位，沒有時改由文章 ID 中的 epoch 推算
+
+    Args:
+        record (dict): 文章資料
+
+    Returns:
+        datetime: 帶時區的發文時間，無法取得時返回None
+    """
+    post_time = record.get('post_time')
+    if post_time:
+        try:
+            parsed = datetime.fromisoformat(post_time.replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.astimezone(timezone.utc)
+        except ValueError:
+            pass
+    epoch = parse_post_epoch(record.get('url'))
+    return datetime.fromtimestamp(epoch, tz=timezone.utc) if epoch is not None else None
+
+
+def _to_int(value):
+    """將互動數據轉為整數，無法轉換時返回None"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_record_batches(json_file_path, board=None, batch_size=WRITE_BATCH_SIZE):
+    """
+    串流讀取 JSON 檔案並轉為具型別的 Arrow RecordBatch
+
+    Args:
+        json_file_path (str): JSON 檔案的路徑
+        board (str, optional): 看板名稱，未指定時由檔名推算
+        batch_size (int): 每批的筆數
+
+    Yields:
+        pyarrow.RecordBatch: 符合 PARQUET_SCHEMA 的資料批次
+    """
+    board = board or board_from_json_file(json_file_path)
+    columns = {field.name: [] for field in PARQUET_SCHEMA}
+
+    for record in iter_json_array(json_file_path):
+        post_time = _parse_post_time(record)
+        comments = record.get('responses_content')
+        columns['url'].append(record.get('url'))
+        columns['title'].append(record.get('title'))
+        columns['article_number'].append(_to_int(record.get('article_number')))
+        columns['post_time'].append(post_time)
+        columns['likes'].append(_to_int(record.get('likes')))
+        columns['responses'].append(_to_int(record.get('responses')))
+        columns['boos'].append(_to_int(record.get('boos')))
+        columns['responses_content'].append([str(comment) for comment in comments] if isinstance(comments, list) else None)
+        columns['content_fetched'].append(bool(record.get('content_fetched')))
+        columns['board'].append(board)
+        columns['post_date'].append(post_time.astimezone(PARTITION_TIMEZONE).date() if post_time else None)
+
+        if len(columns['url']) >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=PARQUET_SCHEMA)
+            columns = {name: [] for name in columns}
+
+    if columns['url']:
+        yield pa.RecordBatch.from_pydict(columns, schema=PARQUET_SCHEMA)
+
+
+def export_parquet(json_file_path, output_dir=PARQUET_DIR):
+    """
+    將 JSON 檔案匯出為依看板與發文日期分區（hive 格式）的 Parquet 資料集
+    例如 moptt_parquet/board=Baseball/post_date=2024-12-18/part-0.parquet；
+    同一看板重新匯出時會取代該看板既有的分區檔案
+
+    Args:
+        json_file_path (str): JSON 檔案的路徑
+        output_dir (str): 資料集根目錄
+
+    Returns:
+        str: 資料集根目錄
+    """
+    if not os.path.exists(json_file_path):
+        raise FileNotFoundError(f"找不到檔案：{json_file_path}")
+
+    board = board_from_json_file(json_file_path)
+    ds.write_dataset(
+        iter_record_batches(json_file_path, board),
+        output_dir,
+        schema=PARQUET_SCHEMA,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        basename_template=f'{board}-{{i}}.parquet',
+        existing_data_behavior='delete_matching'
+    )
+    print(f'Parquet 資料集已儲存至: {output_dir}（看板 {board}）')
+    return output_dir
+
+
+def export_all_parquet(directory='.', pattern='moptt_*.json', output_dir=PARQUET_DIR):
+    """
+    將指定目錄下所有符合模式的 JSON 檔案匯出至同一個 Parquet 資料集
+
+    Args:
+        directory (str): 要搜尋的目錄路徑
+        pattern (str): 檔案名稱模式
+        output_dir (str): 資料集根目錄
+
+    Returns:
+        list: 成功匯出的 JSON 檔案路徑列表
+    """
+    exported_files = []
+    for json_file in glob.glob(os.path.join(directory, pattern)):
+        try:
+            export_parquet(json_file, output_dir)
+            exported_files.append(json_file)
+        except Exception as e:
+            print(f"匯出 {json_file} 時發生錯誤: {str(e)}")
+    return exported_files
+
+
+def _build_filter(filters):
+    """
+    將 [(欄位, 運算子, 值), ...] 轉為 pyarrow 條件運算式（各條件以 AND 結合）
+
+    Args:
+        filters (list): 條件列表，例如 [('board', '==', 'Baseball')]
+
+    Returns:
+        pyarrow.compute.Expression: 條件運算式，沒有條件時返回None
+    """
+    expression = None
+    for column, operator, value in filters or []:
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"不支援的運算子：{operator}")
+        condition = FILTER_OPERATORS[operator](ds.field(column), value)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_parquet_dataset(dataset_dir=PARQUET_DIR, columns=None, filters=None):
+    """
+    讀取 Parquet 資料集為 DataFrame，支援欄位與條件下推
+    分區欄位（board、post_date）上的條件只會開啟符合的分區檔案，
+    未列在 columns 中的欄位（例如 responses_content）完全不會被讀取
+
+    Args:
+        dataset_dir (str): 資料集根目錄
+        columns (list, optional): 要讀取的欄位
+        filters (list, optional): 條件列表，例如
+            [('board', '==', 'Baseball'), ('post_date', '==', date(2024, 12, 18))]
+
+    Returns:
+        pandas.DataFrame: 讀取結果
+    """
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+    table = dataset.to_table(columns=columns, filter=_build_filter(filters))
+    return table.to_pandas()
+
+
 if __name__ == "__main__":
     # 轉換當前目錄下所有 MOPTT JSON 檔案
     converted_files = convert_all_json_files()
@@ -0,0 +1,269 @@
+"""
+共用的 Chrome 瀏覽器驅動程式工廠
+統一各爬蟲的 Chrome 選項與 chromedriver 路徑搜尋，
+並透過 CDP 的 Network.setBlockedURLs 封鎖圖片、影音、字型與第三方追蹤腳本；
+每頁實際傳輸的位元組數以 Chrome 效能日誌中 CDP Network.loadingFinished 的 encodedDataLength 統計
+（含跨來源的廣告與追蹤資源），未啟用效能日誌的驅動程式退回 Performance API
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+# ====== 設定區域開始 ======
+# 指定 chromedriver 路徑的環境變數名稱（優先於下方設定）
+CHROMEDRIVER_ENV = 'CHROMEDRIVER_PATH'
+
+# Chrome 瀏覽器驅動程式的路徑（檔案不存在時改由 PATH 或 Selenium Manager 尋找）
+CHROME_DRIVER_PATH = '/Users/aotter/chromedriver-mac-arm64/chromedriver'
+
+# 是否以無頭模式（背景執行）啟動
+HEADLESS = True
+
+# 是否封鎖擷取資料不需要的資源
+BLOCK_RESOURCES = True
+
+# 封鎖的網址樣式（Network.setBlockedURLs 的萬用字元語法）
+BLOCKED_URL_PATTERNS = [
+    # 圖片
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    # 影音
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    # 字型
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    # 第三方廣告與追蹤
+    '*google-analytics.com*', '*googletagmanager.com*', '*googlesyndication.com*',
+    '*doubleclick.net*', '*adservice.google.*', '*facebook.net*', '*facebook.com/tr*',
+    '*scorecardresearch.com*', '*hotjar.com*', '*clarity.ms*', '*criteo.*', '*taboola.com*',
+]
+# 是否啟用 Chrome 效能日誌以 CDP 網路事件統計傳輸量（compare_transfer 一律啟用）；
+# 日誌在讀取前會累積在 chromedriver 中，只在會定期呼叫 TransferMeter.record 時啟用
+NETWORK_LOG = False
+
+# 注意：Network.setBlockedURLs 只支援封鎖清單，新增樣式時須確認不會擋到擷取資料需要的
+# moptt.tw/_next、www.ptt.cc/bbs、trek.aotter.net 網址
+# ====== 設定區域結束 ======
+
+# 未啟用效能日誌時的退回方式：統計目前頁面主文件與所有子資源的傳輸量
+# （跨來源且無 Timing-Allow-Origin 的資源會回報 0，因此低估第三方廣告與追蹤的流量）
+PAGE_TRANSFER_JS = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+let transferred = 0;
+let decoded = 0;
+for (const entry of entries) {
+    transferred += entry.transferSize || 0;
+    decoded += entry.decodedBodySize || 0;
+}
+return {transferred: transferred, decoded: decoded, requests: entries.length};
+"""
+
+
+def find_chromedriver(configured_path=CHROME_DRIVER_PATH):
+    """
+    依序從環境變數、設定路徑、PATH 尋找 chromedriver
+
+    Args:
+        configured_path (str): 設定區域中的 chromedriver 路徑
+
+    Returns:
+        str: chromedriver 路徑，都找不到時為 None（交由 Selenium Manager 自動下載）
+    """
+    env_path = os.environ.get(CHROMEDRIVER_ENV)
+    if env_path:
+        return env_path
+    if configured_path and os.path.exists(configured_path):
+        return configured_path
+    return shutil.which('chromedriver')
+
+
+def build_options(headless=HEADLESS, profile_dir=None, disk_cache_mb=None, network_log=NETWORK_LOG):
+    """
+    建立各爬蟲共用的 Chrome 選項
+
+    Args:
+        headless (bool): 是否以無頭模式啟動
+        profile_dir (str, optional): 固定的使用者設定檔目錄，跨次執行保留 Cookie 與快取
+        disk_cache_mb (int, optional): 磁碟快取大小（MB）
+        network_log (bool): 是否啟用效能日誌（CDP 網路事件）
+
+    Returns:
+        Options: Chrome 選項
+    """
+    options = Options()
+    if headless:
+        options.add_argument('--headless')  # 啟用無頭模式（背景執行）
+    options.add_argument('--no-sandbox')  # 停用沙箱模式以提高穩定性
+    options.add_argument('--disable-dev-shm-usage')  # 避免記憶體問題
+    if profile_dir:
+        profile_dir = os.path.abspath(profile_dir)
+        options.add_argument(f'--user-data-dir={profile_dir}')
+        options.add_argument(f'--disk-cache-dir={os.path.join(profile_dir, "cache")}')
+    if disk_cache_mb:
+        options.add_argument(f'--disk-cache-size={disk_cache_mb * 1024 * 1024}')
+    if network_log:
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return options
+
+
+def block_resources(driver, patterns=None):
+    """
+    透過 CDP 封鎖不需要的資源，設定在整個瀏覽器工作階段內持續有效
+
+    Args:
+        driver: Selenium Chrome WebDriver
+        patterns (list, optional): 封鎖樣式，未指定時使用 BLOCKED_URL_PATTERNS
+
+    Returns:
+        list: 實際送出的封鎖樣式
+    """
+    blocked = BLOCKED_URL_PATTERNS if patterns is None else patterns
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+    return blocked
+
+
+def create_driver(block=BLOCK_RESOURCES, headless=HEADLESS, options=None, profile_dir=None, disk_cache_mb=None,
+                  network_log=NETWORK_LOG):
+    """
+    建立 Chrome 瀏覽器驅動程式
+
+    Args:
+        block (bool): 是否封鎖圖片、影音、字型與第三方追蹤腳本
+        headless (bool): 是否以無頭模式啟動（指定 options 時忽略）
+        options (Options, optional): 自訂的 Chrome 選項
+        profile_dir (str, optional): 固定的使用者設定檔目錄（指定 options 時忽略）
+        disk_cache_mb (int, optional): 磁碟快取大小（MB，指定 options 時忽略）
+        network_log (bool): 是否啟用效能日誌，以 CDP 網路事件統計傳輸量
+
+    Returns:
+        WebDriver: Chrome 瀏覽器驅動程式
+    """
+    driver_path = find_chromedriver()
+    service = Service(driver_path) if driver_path else Service()
+    if options is None:
+        options = build_options(headless, profile_dir, disk_cache_mb, network_log)
+    elif network_log:
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    driver = webdriver.Chrome(service=service, options=options)
+    driver._network_log = network_log
+    if block:
+        block_resources(driver)
+    return driver
+
+
+def network_transfer_from_log(entries):
+    """
+    由效能日誌中的 CDP 網路事件統計傳輸量
+    encodedDataLength 為實際經網路收到的位元組數（含標頭），不受跨來源限制；被封鎖的請求只會產生
+    Network.loadingFailed，不計入
+
+    Args:
+        entries (list): driver.get_log('performance') 的回傳值
+
+    Returns:
+        dict: 包含 transferred（網路傳輸位元組）、decoded（解壓後位元組）、requests（完成的請求數）的字典
+    """
+    transferred = decoded = requests = 0
+    for entry in entries:
+        message = json.loads(entry['message'])['message']
+        method = message.get('method')
+        if method == 'Network.loadingFinished':
+            transferred += message['params'].get('encodedDataLength', 0)
+            requests += 1
+        elif method == 'Network.dataReceived':
+            decoded += message['params'].get('dataLength', 0)
+    return {'transferred': int(transferred), 'decoded': decoded, 'requests': requests}
+
+
+def page_transfer_bytes(driver):
+    """
+    取得上次讀取以來的傳輸量
+    啟用效能日誌的驅動程式讀取並清空日誌中的 CDP 網路事件；否則以 Performance API 統計目前頁面載入以來的傳輸量
+
+    Args:
+        driver: Selenium WebDriver
+
+    Returns:
+        dict: 包含 transferred（網路傳輸位元組）、decoded（解壓後位元組）、requests（請求數）的字典
+    """
+    if getattr(driver, '_network_log', False):
+        return network_transfer_from_log(driver.get_log('performance'))
+    return driver.execute_script(PAGE_TRANSFER_JS)
+
+
+class TransferMeter:
+    """
+    每頁傳輸量紀錄類別
+    在每次頁面載入完成後呼叫 record，結束時以 summary 取得平均值
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.transferred = 0
+        self.requests = 0
+
+    def record(self, driver):
+        """
+        記錄目前頁面的傳輸量，讀取失敗時略過
+
+        Args:
+            driver: Selenium WebDriver
+        """
+        try:
+            stats = page_transfer_bytes(driver)
+        except Exception:
+            return
+        self.pages += 1
+        self.transferred += stats['transferred']
+        self.requests += stats['requests']
+
+    def summary(self):
+        """
+        取得傳輸量摘要
+
+        Returns:
+            str: 例如「12 頁，平均每頁 85.3 KB / 14 個請求」
+        """
+        if not self.pages:
+            return '0 頁'
+        return (f"{self.pages} 頁，平均每頁 {self.transferred / self.pages / 1024:.1f} KB"
+                f" / {self.requests / self.pages:.0f} 個請求")
+
+
+def compare_transfer(urls):
+    """
+    分別在不封鎖與封鎖資源的情況下載入網址，以 CDP 網路事件比較每頁傳輸量
+
+    Args:
+        urls (list): 要載入的網址列表
+
+    Returns:
+        dict: {'before': TransferMeter, 'after': TransferMeter}
+    """
+    meters = {}
+    for label, block in (('before', False), ('after', True)):
+        driver = create_driver(block=block, network_log=True)
+        meter = TransferMeter()
+        try:
+            for url in urls:
+                driver.get(url)
+                meter.record(driver)
+        finally:
+            driver.quit()
+        meters[label] = meter
+    return meters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='比較封鎖資源前後每頁的傳輸量')
+    parser.add_argument('urls', nargs='+', help='要載入的網址')
+    args = parser.parse_args()
+
+    meters = compare_transfer(args.urls)
+    print(f"封鎖前：{meters['before'].summary()}")
+    print(f"封鎖後：{meters['after'].summary()}")
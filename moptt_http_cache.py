@@ -0,0 +1,351 @@
+"""
+HTTP 回應磁碟快取
+文章頁與索引頁的回應內容以內容雜湊（SHA-256）存放於磁碟，相同內容只存一份，
+另以 SQLite 索引記錄每個 URL 對應的內容、ETag / Last-Modified 與到期時間：
+- 未到期：直接回傳快取內容，不發出請求
+- 已到期且有驗證資訊：發出條件式請求，304 時沿用快取內容
+- 其餘情況：重新下載並更新快取
+總大小超過上限時依最後存取時間（LRU）淘汰
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from requests.structures import CaseInsensitiveDict
+
+import moptt_metrics
+
+# ====== 設定區域開始 ======
+# 是否啟用快取
+HTTP_CACHE_ENABLED = True
+
+# 快取目錄
+CACHE_DIR = 'moptt_http_cache'
+
+# 快取總大小上限（位元組）
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# 依內容類型的有效期限（秒），伺服器未提供 Cache-Control max-age 時使用
+TTL_BY_CONTENT_TYPE = {
+    'text/html': 3600,
+    'application/json': 600,
+}
+
+# 其他內容類型的有效期限（秒）
+DEFAULT_TTL = 600
+
+# 依網址覆寫有效期限（正規表示式, 秒），依序比對，優先於上述設定
+# PTT 最新一頁 index.html 隨時會變動，每次都重新驗證
+URL_TTL_RULES = [
+    (r'/index\.html$', 0),
+]
+# ====== 設定區域結束 ======
+
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+class CachedResponse:
+    """
+    快取回應，提供爬蟲用到的 requests.Response 介面子集
+    （status_code、headers、content、text、encoding、raise_for_status）；
+    headers 與 requests 相同不分大小寫（HTTP/2 的標頭名稱一律為小寫）
+    """
+
+    def __init__(self, url, status_code, content, headers, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers)
+        self.from_cache = from_cache
+        match = re.search(r'charset=([\w-]+)', headers.get('Content-Type', ''))
+        self.encoding = match.group(1) if match else None
+
+    @property
+    def text(self):
+        """以 encoding（未指定時為 UTF-8）解碼的內容"""
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        """狀態碼為 4xx / 5xx 時拋出例外"""
+        if self.status_code >= 400:
+            raise IOError(f"HTTP {self.status_code}: {self.url}")
+
+
+class HttpCache:
+    """
+    HTTP 回應磁碟快取類別
+    可在多執行緒間共用；多個行程可共用同一個快取目錄（SQLite WAL）
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        """
+        開啟快取目錄與索引
+
+        Args:
+            cache_dir (str): 快取目錄
+            max_bytes (int): 快取總大小上限（位元組）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = {'hit': 0, 'revalidated': 0, 'miss': 0, 'evicted': 0}
+        self.lock = threading.RLock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'index.db'), check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    url TEXT PRIMARY KEY,
+                    body_hash TEXT NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+                CREATE INDEX IF NOT EXISTS idx_entries_body_hash ON entries (body_hash);
+                CREATE TABLE IF NOT EXISTS bodies (
+                    body_hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL
+                );
+            """)
+
+    def _body_path(self, body_hash):
+        """內容檔案路徑，以雜湊前兩碼分目錄"""
+        return os.path.join(self.cache_dir, body_hash[:2], body_hash)
+
+    def _ttl_for(self, url, headers):
+        """依網址規則、Cache-Control 與內容類型決定有效期限（秒）"""
+        for pattern, ttl in URL_TTL_RULES:
+            if re.search(pattern, url):
+                return ttl
+        cache_control = headers.get('Cache-Control', '')
+        match = MAX_AGE_PATTERN.search(cache_control)
+        if match:
+            return int(match.group(1))
+        if 'no-cache' in cache_control:
+            return 0
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return TTL_BY_CONTENT_TYPE.get(content_type, DEFAULT_TTL)
+
+    def _lookup(self, url):
+        """取得 URL 的索引紀錄與內容，內容檔案遺失時視為沒有快取"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body_hash, content_type, etag, last_modified, expires_at FROM entries WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._body_path(row[0]), 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        return {'body_hash': row[0], 'content_type': row[1], 'etag': row[2],
+                'last_modified': row[3], 'expires_at': row[4], 'content': content}
+
+    def _cached_response(self, url, entry):
+        """以快取內容組成回應"""
+        headers = CaseInsensitiveDict({'Content-Type': entry['content_type'] or ''})
+        if entry['etag']:
+            headers['ETag'] = entry['etag']
+        if entry['last_modified']:
+            headers['Last-Modified'] = entry['last_modified']
+        return CachedResponse(url, 200, entry['content'], headers, from_cache=True)
+
+    def get_fresh(self, url):
+        """
+        只查詢快取：未到期時回傳快取內容，不發出任何請求
+
+        Args:
+            url (str): 網址
+
+        Returns:
+            CachedResponse: 快取回應，沒有快取或已到期時為 None
+        """
+        now = time.time()
+        entry = self._lookup(url)
+        if entry is None or entry['expires_at'] <= now:
+            return None
+        self._record('hit')
+        self._touch(url, now)
+        return self._cached_response(url, entry)
+
+    def get(self, session, url, timeout=None, revalidate=False):
+        """
+        透過快取取得網址內容
+
+        Args:
+            session (requests.Session): 未命中時用來發出請求的 Session
+            url (str): 網址
+            timeout (float, optional): 請求逾時秒數
+            revalidate (bool): 即使快取未到期也向伺服器確認（例如重新爬取互動數據時）
+
+        Returns:
+            CachedResponse: 回應（from_cache 表示內容是否來自快取）
+        """
+        if not revalidate:
+            cached = self.get_fresh(url)
+            if cached is not None:
+                return cached
+
+        now = time.time()
+        entry = self._lookup(url)
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = session.get(url, timeout=timeout, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            self._record('revalidated')
+            revalidated_headers = CaseInsensitiveDict(response.headers)
+            revalidated_headers['Content-Type'] = entry['content_type'] or ''
+            expires_at = now + self._ttl_for(url, revalidated_headers)
+            with self.lock, self.conn:
+                self.conn.execute("UPDATE entries SET expires_at = ?, last_access = ? WHERE url = ?",
+                                  (expires_at, now, url))
+            return self._cached_response(url, entry)
+
+        self._record('miss')
+        result = CachedResponse(url, response.status_code, response.content, response.headers)
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self._store(url, result, now)
+        return result
+
+    def _store(self, url, response, now):
+        """將回應內容寫入磁碟並更新索引，超過大小上限時淘汰"""
+        content = response.content
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(content)
+            os.replace(temp_file, path)
+
+        headers = response.headers
+        with self.lock, self.conn:
+            previous = self.conn.execute("SELECT body_hash FROM entries WHERE url = ?", (url,)).fetchone()
+            self.conn.execute("INSERT OR IGNORE INTO bodies (body_hash, size) VALUES (?, ?)", (body_hash, len(content)))
+            self.conn.execute(
+                """INSERT OR REPLACE INTO entries
+                   (url, body_hash, content_type, etag, last_modified, stored_at, expires_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (url, body_hash, headers.get('Content-Type'), headers.get('ETag'), headers.get('Last-Modified'),
+                 now, now + self._ttl_for(url, headers), now)
+            )
+            if previous and previous[0] != body_hash:
+                self._release_body(previous[0])
+        self._evict()
+
+    def _record(self, outcome):
+        """累計命中、重新驗證或未命中次數"""
+        with self.lock:
+            self.stats[outcome] += 1
+        moptt_metrics.count('http_cache', outcome=outcome)
+
+    def _touch(self, url, now):
+        """更新最後存取時間"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+
+    def _release_body(self, body_hash):
+        """內容不再被任何網址引用時刪除（呼叫端需持有 lock 與交易）"""
+        referenced = self.conn.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone()
+        if referenced:
+            return
+        self.conn.execute("DELETE FROM bodies WHERE body_hash = ?", (body_hash,))
+        try:
+            os.remove(self._body_path(body_hash))
+        except FileNotFoundError:
+            pass
+
+    def total_bytes(self):
+        """
+        取得快取內容總大小
+
+        Returns:
+            int: 位元組數
+        """
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+
+    def _evict(self):
+        """總大小超過上限時，依最後存取時間由舊到新淘汰，直到低於上限的九成"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        with self.lock, self.conn:
+            rows = self.conn.execute("SELECT url, body_hash FROM entries ORDER BY last_access").fetchall()
+            for url, body_hash in rows:
+                if total <= target:
+                    break
+                size_row = self.conn.execute("SELECT size FROM bodies WHERE body_hash = ?", (body_hash,)).fetchone()
+                self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._release_body(body_hash)
+                # 內容仍被其他網址引用時不會刪除，也就不減少總大小
+                released = not self.conn.execute("SELECT 1 FROM bodies WHERE body_hash = ?", (body_hash,)).fetchone()
+                if size_row and released:
+                    total -= size_row[0]
+                self.stats['evicted'] += 1
+                moptt_metrics.count('http_cache', outcome='evicted')
+
+    def hit_rate(self):
+        """
+        取得命中率（含 304 重新驗證）
+
+        Returns:
+            float: 0 ~ 1，尚無請求時為 0
+        """
+        requests_made = self.stats['hit'] + self.stats['revalidated'] + self.stats['miss']
+        if not requests_made:
+            return 0.0
+        return (self.stats['hit'] + self.stats['revalidated']) / requests_made
+
+    def summary(self):
+        """
+        取得快取統計摘要
+
+        Returns:
+            str: 例如「快取命中率 82.0%（命中 100、304 重新驗證 20、未命中 26、淘汰 0）」
+        """
+        return (f"快取命中率 {self.hit_rate() * 100:.1f}%（命中 {self.stats['hit']}、"
+                f"304 重新驗證 {self.stats['revalidated']}、未命中 {self.stats['miss']}、淘汰 {self.stats['evicted']}）")
+
+    def close(self):
+        """關閉索引資料庫"""
+        with self.lock:
+            self.conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    取得行程內共用的快取（第一次呼叫時開啟）
+
+    Returns:
+        HttpCache: 共用的快取，HTTP_CACHE_ENABLED 為 False 時為 None
+    """
+    global _default_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HttpCache()
+        return _default_cache
@@ -0,0 +1,276 @@
+"""
+MOPTT 文章 HTTP 快速擷取工具
+以連線池化的 requests.Session 直接下載文章頁面，從伺服器端渲染的 HTML
+或頁面內嵌資料（__NEXT_DATA__）解析發文時間、互動數據與回應內容
+解析失敗時回傳 None，由呼叫端改走 Selenium 路徑
+"""
+
+import json
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from moptt_http_cache import get_default_cache
+
+# ====== 設定區域開始 ======
+# HTTP 請求逾時（秒）
+HTTP_TIMEOUT = 10
+
+# 連線池大小
+POOL_SIZE = 16
+
+# 請求標頭中的 User-Agent
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+# ====== 設定區域結束 ======
+
+# 與 Selenium 路徑相同的 CSS 掛鉤
+TIME_SELECTOR = "div.o_pqSZvuHj7qfwrPg7tI time"
+INTERACTION_SELECTOR = "div.T86VdSgcSk_wVSJ87Jd_"
+SHOW_ALL_SELECTOR = "div.FEfFxCwDtx6IcnHAFaMR"
+COMMENT_SELECTOR = "span.qIm88EMEzWPkVVqwCol0"
+
+# 內嵌資料中可能使用的欄位名稱
+EMBEDDED_KEYS = {
+    'post_time': ('postTime', 'createdAt', 'publishedAt', 'timestamp'),
+    'likes': ('likes', 'likeCount', 'push', 'pushCount'),
+    'boos': ('boos', 'booCount', 'dislikes', 'boo'),
+    'responses': ('responses', 'commentCount', 'commentsCount', 'replyCount'),
+    'responses_content': ('comments', 'responses', 'replies'),
+}
+
+
+def create_session(pool_size=POOL_SIZE):
+    """
+    建立具連線池的 requests.Session
+
+    Args:
+        pool_size (int): 每個主機保留的連線數
+
+    Returns:
+        requests.Session: 已設定好標頭與連線池的 Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+
+class MopttHttpFetcher:
+    """
+    MOPTT 文章 HTTP 擷取類別
+    負責以 HTTP 取得文章資料，並統計各篇文章實際走的路徑（HTTP 或 Selenium）
+    """
+
+    def __init__(self, session=None, timeout=HTTP_TIMEOUT, cache=None):
+        """
+        初始化擷取器
+
+        Args:
+            session (requests.Session, optional): 共用的 Session，未指定時自動建立
+            timeout (int): 請求逾時秒數
+            cache (HttpCache, optional): HTTP 回應快取，未指定時使用行程內共用的快取
+        """
+        self.session = session or create_session()
+        self.timeout = timeout
+        self.cache = cache or get_default_cache()
+        self.stats = {'http': 0, 'selenium': 0}
+
+    def fetch_article(self, article_info, revalidate=False):
+        """
+        以 HTTP 擷取單篇文章的詳細資訊
+
+        Args:
+            article_info (dict): 包含文章URL和標題的字典
+            revalidate (bool): 即使快取未到期也重新向伺服器確認
+
+        Returns:
+            dict: 與 Selenium 路徑相同格式的文章資訊，若無法完整解析則返回None
+        """
+        try:
+            if self.cache is not None:
+                response = self.cache.get(self.session, article_info['url'], self.timeout, revalidate)
+            else:
+                response = self.session.get(article_info['url'], timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            response.encoding = response.encoding or 'utf-8'
+            parsed = parse_article_html(response.text)
+        except Exception:
+            return None
+
+        if parsed is None:
+            return None
+
+        self.stats['http'] += 1
+        result = {
+            'url': article_info['url'],
+            'title': article_info['title'],
+        }
+        result.update(parsed)
+        return result
+
+    def record_fallback(self):
+        """記錄一篇改走 Selenium 路徑的文章"""
+        self.stats['selenium'] += 1
+
+    def summary(self):
+        """
+        取得路徑統計摘要
+
+        Returns:
+            str: 例如「HTTP: 120 篇 | Selenium: 3 篇 | 快取命中率 82.0%（...）」
+        """
+        text = f"HTTP: {self.stats['http']} 篇 | Selenium: {self.stats['selenium']} 篇"
+        if self.cache is not None:
+            text += f" | {self.cache.summary()}"
+        return text
+
+    def close(self):
+        """關閉連線池"""
+        self.session.close()
+
+
+def parse_article_html(html):
+    """
+    從文章頁面 HTML 解析文章資訊
+    先嘗試內嵌資料，再嘗試伺服器端渲染的 DOM
+
+    Args:
+        html (str): 文章頁面 HTML
+
+    Returns:
+        dict: 包含 post_time、likes、responses、boos、responses_content 的字典，
+              若資訊不完整（例如回應需點擊「顯示全部」才會出現）則返回None
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    embedded = _parse_embedded_data(soup)
+    if embedded is not None:
+        return embedded
+
+    # 擷取發文時間，沒有時間代表頁面並非伺服器端渲染
+    time_element = soup.select_one(TIME_SELECTOR)
+    if time_element is None or not time_element.get('datetime'):
+        return None
+    post_time = time_element['datetime']
+
+    # 尚有「顯示全部回應」按鈕時，HTML 內的回應並不完整
+    if soup.select_one(SHOW_ALL_SELECTOR) is not None:
+        return None
+
+    # 擷取文章互動數據（讚數、噓數、回應數）
+    likes = comments = boos = 0
+    for div in soup.select(INTERACTION_SELECTOR):
+        icon = div.find('i')
+        if icon is None:
+            continue
+        count_text = div.get_text(strip=True)
+        count = int(count_text) if count_text.isdigit() else 0
+        icon_class = ' '.join(icon.get('class') or [])
+
+        if "fa-thumbs-up" in icon_class:
+            likes = count
+        elif "fa-thumbs-down" in icon_class:
+            boos = count
+        elif "fa-comment-dots" in icon_class:
+            comments = count
+
+    # 擷取所有回應內容
+    comments_content = []
+    for span in soup.select(COMMENT_SELECTOR):
+        comment_text = span.get_text(strip=True)
+        if comment_text:
+            comments_content.append(comment_text)
+
+    return {
+        'post_time': post_time,
+        'likes': likes,
+        'responses': comments,
+        'boos': boos,
+        'responses_content': comments_content
+    }
+
+
+def _parse_embedded_data(soup):
+    """
+    從 __NEXT_DATA__ 內嵌 JSON 中尋找文章資料
+
+    Args:
+        soup (BeautifulSoup): 已解析的頁面
+
+    Returns:
+        dict: 文章資訊，找不到完整資料時返回None
+    """
+    script = soup.find('script', id='__NEXT_DATA__')
+    if script is None or not script.string:
+        return None
+    try:
+        data = json.loads(script.string)
+    except ValueError:
+        return None
+
+    post = _find_post_object(data)
+    if post is None:
+        return None
+
+    result = {}
+    for field in ('post_time', 'likes', 'boos', 'responses'):
+        if field == 'post_time':
+            value = _first_present(post, EMBEDDED_KEYS[field])
+            result[field] = str(value) if value is not None else ""
+        else:
+            value = _first_present(post, EMBEDDED_KEYS[field], int)
+            result[field] = value if value is not None else 0
+
+    comments = _first_present(post, EMBEDDED_KEYS['responses_content'], list)
+    if comments is None:
+        return None
+    comments_content = []
+    for comment in comments:
+        if isinstance(comment, dict):
+            comment = comment.get('content') or comment.get('text') or ''
+        comment = str(comment).strip()
+        if comment:
+            comments_content.append(comment)
+    result['responses_content'] = comments_content
+
+    # 內嵌回應數少於互動數據時，代表回應是分批載入的
+    if not result['post_time'] or len(comments_content) < result['responses']:
+        return None
+    return result
+
+
+def _find_post_object(data):
+    """
+    遞迴尋找同時包含發文時間與回應列表的物件
+
+    Args:
+        data: 解析後的 JSON 資料
+
+    Returns:
+        dict: 文章物件，找不到時返回None
+    """
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if (_first_present(node, EMBEDDED_KEYS['post_time']) is not None
+                    and _first_present(node, EMBEDDED_KEYS['responses_content'], list) is not None):
+                return node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return None
+
+
+def _first_present(mapping, keys, value_type=None):
+    """回傳 mapping 中第一個存在（且符合型別）的欄位值"""
+    for key in keys:
+        if key in mapping:
+            value = mapping[key]
+            if value_type is None or (isinstance(value, value_type) and not isinstance(value, bool)):
+                return value
+    return None
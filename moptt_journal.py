@@ -0,0 +1,129 @@
+"""
+MOPTT 爬取進度日誌
+以僅附加（append-only）的 JSONL 檔案記錄每一篇新增或更新的文章，
+取代每篇文章都重寫整個看板 JSON 檔案的做法；
+爬取結束時再壓縮（compact）成最終的 moptt_<看板>.json
+"""
+
+import json
+import os
+
+# ====== 設定區域開始 ======
+# 每筆紀錄寫入後是否呼叫 fsync（較安全但較慢）
+FSYNC_EACH_RECORD = False
+# ====== 設定區域結束 ======
+
+
+def journal_path_for(progress_file):
+    """
+    取得進度檔案對應的日誌檔路徑
+
+    Args:
+        progress_file (str): 進度檔案路徑，例如 moptt_Baseball.json
+
+    Returns:
+        str: 日誌檔路徑，例如 moptt_Baseball.jsonl
+    """
+    return os.path.splitext(progress_file)[0] + '.jsonl'
+
+
+class ArticleJournal:
+    """
+    文章進度日誌類別
+    每筆紀錄為一行完整的文章 JSON，同一 URL 以最後一筆紀錄為準
+    """
+
+    def __init__(self, progress_file, fsync=FSYNC_EACH_RECORD):
+        """
+        初始化日誌
+
+        Args:
+            progress_file (str): 最終輸出的 JSON 進度檔案路徑
+            fsync (bool): 每筆紀錄寫入後是否呼叫 fsync
+        """
+        self.progress_file = progress_file
+        self.path = journal_path_for(progress_file)
+        self.fsync = fsync
+        self._file = None
+
+    def load(self):
+        """
+        載入進度：先讀取上次壓縮的 JSON 檔，再重播日誌中的紀錄
+
+        Returns:
+            list: 依首次出現順序排列的文章列表
+        """
+        articles = []
+        try:
+            with open(self.progress_file, 'r', encoding='utf-8') as f:
+                articles = json.load(f)
+        except FileNotFoundError:
+            pass
+
+        positions = {article.get('url'): i for i, article in enumerate(articles)}
+        valid_length = 0
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    # 寫到一半中斷的最後一行沒有換行符號或無法解析，直接捨棄
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_length += len(line)
+
+                    url = record.get('url')
+                    if url in positions:
+                        articles[positions[url]] = record
+                    else:
+                        positions[url] = len(articles)
+                        articles.append(record)
+        except FileNotFoundError:
+            return articles
+
+        # 截掉損毀的尾端，避免之後附加的紀錄接在半行後面
+        if os.path.getsize(self.path) != valid_length:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_length)
+        return articles
+
+    def append(self, article):
+        """
+        附加一筆新增或更新的文章紀錄
+
+        Args:
+            article (dict): 完整的文章資料
+        """
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(article, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def compact(self, articles):
+        """
+        將完整文章列表寫成最終 JSON 檔，並清空日誌
+        JSON 檔先寫入暫存檔再以 os.replace 取代，確保任何時間點都能完整載入
+
+        Args:
+            articles (list): 完整的文章列表
+        """
+        temp_file = f"{self.progress_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(articles, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.progress_file)
+
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        """關閉日誌檔"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
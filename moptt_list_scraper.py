@@ -3,20 +3,39 @@ MOPTT 文章列表爬蟲
 專門用於爬取文章的基本資訊（編號、標題、URL）
 """
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import NoSuchElementException
 import json
+from moptt_page_scripts import CARD_SELECTOR, ScrollProfiler, WaitRecorder, harvest_new_cards, prune_harvested_cards
+from moptt_watermark import IncrementalCrawl
+from moptt_storage import JsonArticleStore, SqliteArticleStore
+from moptt_driver import create_driver
+from moptt_browser_session import BrowserPool
+import moptt_metrics
 import time
 
 # ====== 設定區域開始 ======
-# Chrome 瀏覽器驅動程式的路徑
-chrome_driver_path = '/Users/aotter/chromedriver-mac-arm64/chromedriver'
+# Chrome 瀏覽器驅動程式的路徑與資源封鎖設定請見 moptt_driver.py
 
 # 要滾動的次數
 MAX_SCROLLS = 500
+
+# 每次滾動後等待新文章卡片出現的最長秒數
+SCROLL_WAIT_TIMEOUT = 3
+
+# 頁面內非同步腳本的逾時秒數（需大於各項等待時間）
+SCRIPT_TIMEOUT = 30
+
+# DOM 修剪模式：None（不修剪）、'blank'（清空已擷取卡片的內容並保留高度）、'detach'（移除已擷取的卡片節點）
+# 長時間滾動時可讓 DOM 大小與每次滾動的成本維持固定
+PRUNE_MODE = None
+
+# 修剪時頁面底部保留的卡片數
+PRUNE_KEEP_CARDS = 20
+
+# 增量模式：依看板水位線只爬取上次之後的新文章
+INCREMENTAL = False
+
+# SQLite 資料庫路徑，設定後以資料庫取代 JSON 進度檔（JSON / CSV 仍會匯出）
+SQLITE_DB = None
 # ====== 設定區域結束 ======
 
 
@@ -26,69 +45,88 @@ class MopttListScraper:
     負責爬取文章的基本資訊（編號、標題、URL）
     """
     
-    def __init__(self):
-        """初始化爬蟲設定"""
+    def __init__(self, driver=None, started_at=None):
+        """
+        初始化爬蟲設定；指定 driver 時使用外部管理的暖機驅動，close 時不會關閉
+        started_at 為「啟動到第一篇文章」的計時起點，使用借出的驅動時應傳入借用前的 time.perf_counter()
+        """
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_article_seconds = None
         self.base_url = "https://moptt.tw"
-        self.options = Options()
-        self.options.add_argument('--headless')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.driver = webdriver.Chrome(service=Service(chrome_driver_path), options=self.options)
+        self.owns_driver = driver is None
+        self.driver = driver or create_driver()
+        self.driver.set_script_timeout(SCRIPT_TIMEOUT)
+        self.wait_recorder = WaitRecorder(scraper='list')
 
     def get_article_links_and_titles(self):
-        """擷取當前頁面的所有文章連結和標題"""
-        articles = self.driver.find_elements(By.CSS_SELECTOR, "div[class*='eQQBIg']")
-        article_data = []
-        for article in articles:
-            try:
-                link = article.find_element(By.CSS_SELECTOR, "a[href*='/p/']")
-                title = article.find_element(By.CSS_SELECTOR, "h3").text
-                article_data.append({
-                    'url': link.get_attribute('href'),
-                    'title': title
-                })
-            except NoSuchElementException:
-                continue
-        return article_data
-
-    def scrape_board(self, board_url, max_scrolls=500, progress_file=None):
-        """爬取指定看板的文章列表"""
+        """擷取當前頁面上次呼叫後新增的文章連結和標題（單次 execute_script）"""
+        return harvest_new_cards(self.driver)
+
+    def scrape_board(self, board_url, max_scrolls=500, progress_file=None, incremental=False, store=None,
+                     prune_mode=PRUNE_MODE):
+        """
+        爬取指定看板的文章列表
+        incremental 為 True 時依看板水位線只滾動到已爬取過的發文時間為止；
+        指定 store 時以該文章儲存取代 progress_file；
+        prune_mode 為 'blank' 或 'detach' 時會修剪已擷取的卡片，讓 DOM 大小維持固定
+        """
         print(f"\r開始爬取看板列表：{board_url}", end='')
+        board = board_url.rstrip('/').split('/')[-1]
         
         # 載入進度檔案
-        all_data = []
-        visited_urls = set()
         last_article_url = None
         found_last_article = False
 
-        if progress_file:
+        if store is None:
             try:
-                with open(progress_file, 'r', encoding='utf-8') as f:
-                    all_data = json.load(f)
-                    visited_urls = {item.get('url') for item in all_data}
-                    if all_data:
-                        last_article_url = all_data[-1].get('url')
-                print(f"\r已載入 {len(all_data)} 篇文章的進度", end='')
-            except FileNotFoundError:
-                print("\r找不到進度檔案，從頭開始爬取", end='')
+                # 載入上次壓縮的 JSON 檔並重播尚未壓縮的日誌
+                store = JsonArticleStore(progress_file)
             except Exception as e:
                 print(f"\r載入進度檔案時發生錯誤: {str(e)}", end='')
+                store = JsonArticleStore()
+        article_count = store.count(board)
+        last_article_url = store.last_url(board)
+        print(f"\r已載入 {article_count} 篇文章的進度", end='')
         
-        self.driver.get(board_url)
+        # 增量模式：已有水位線時不再從頂端尋找上次的最後一篇文章
+        incremental_crawl = None
+        if incremental:
+            incremental_crawl = IncrementalCrawl(board, known_newest_epoch=store.newest_epoch(board))
+            if incremental_crawl.watermark is not None:
+                last_article_url = None
+                print(f"\r增量模式：水位線 {incremental_crawl.watermark}", end='')
+        
+        with moptt_metrics.stage('board_load', scraper='list'):
+            self.driver.get(board_url)
         
         # 滾動載入文章
         print("\r開始滾動載入文章", end='')
+        card_count = self.wait_recorder.wait(self.driver, 'page_load', CARD_SELECTOR, 1, SCROLL_WAIT_TIMEOUT, 0)['count']
         last_height = self.driver.execute_script("return document.body.scrollHeight")
         scroll_count = 0
+        scroll_profiler = ScrollProfiler()
         
+        reached_end = False
         while scroll_count < max_scrolls:
             scroll_count += 1
-            print(f"\r滾動進度: {scroll_count}/{max_scrolls} | 已載入文章數: {len(all_data)}", end='')
+            scroll_started = time.perf_counter()
+            print(f"\r滾動進度: {scroll_count}/{max_scrolls} | 已載入文章數: {article_count}", end='')
+            
+            # 滾動頁面並在頁面內等待新的文章卡片出現（取代固定 0.5 秒的 sleep）
+            card_count = self.wait_recorder.wait(
+                self.driver, 'scroll', CARD_SELECTOR, card_count + 1, SCROLL_WAIT_TIMEOUT, 0.5, scroll_first=True
+            )['count']
             
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.5)
+            with moptt_metrics.stage('harvest', scraper='list'):
+                current_articles = self.get_article_links_and_titles()
             
-            current_articles = self.get_article_links_and_titles()
+            # 修剪已擷取的卡片並記錄此次滾動的耗時與頁面狀態
+            with moptt_metrics.stage('prune', scraper='list'):
+                page_stats = prune_harvested_cards(self.driver, prune_mode, PRUNE_KEEP_CARDS)
+            card_count = page_stats['cards']
+            scroll_seconds = time.perf_counter() - scroll_started
+            scroll_profiler.record(scroll_seconds, page_stats)
+            moptt_metrics.registry.observe('scroll', scroll_seconds, scraper='list')
             
             # 檢查是否找到上次的最後一篇文章
             if last_article_url and not found_last_article:
@@ -102,44 +140,69 @@ class MopttListScraper:
             
             # 處理新文章
             for article in current_articles:
-                if article['url'] not in visited_urls:
-                    visited_urls.add(article['url'])
+                if not store.has_url(article['url']):
+                    article_count += 1
                     article_data = {
                         'url': article['url'],
                         'title': article['title'],
-                        'article_number': len(all_data) + 1
+                        'article_number': article_count
                     }
-                    all_data.append(article_data)
                     
                     # 儲存進度
-                    if progress_file:
-                        try:
-                            with open(progress_file, 'w', encoding='utf-8') as f:
-                                json.dump(all_data, f, ensure_ascii=False, indent=2)
-                            print(f"\r已儲存文章 {len(all_data)}: {article['title'][:30]}{'...' if len(article['title']) > 30 else ''}", end='')
-                        except Exception as e:
-                            print(f"\r儲存進度時發生錯誤: {str(e)}", end='')
+                    try:
+                        with moptt_metrics.stage('save', scraper='list'):
+                            store.upsert(article_data)
+                        if self.first_article_seconds is None:
+                            self.first_article_seconds = time.perf_counter() - self.started_at
+                        print(f"\r已儲存文章 {article_count}: {article['title'][:30]}{'...' if len(article['title']) > 30 else ''}", end='')
+                    except Exception as e:
+                        print(f"\r儲存進度時發生錯誤: {str(e)}", end='')
+            
+            # 增量模式下連續滾動到水位線之前的文章時停止
+            if incremental_crawl and incremental_crawl.should_stop(current_articles):
+                print("\r已滾動到水位線之前的文章，停止滾動", end='')
+                reached_end = True
+                break
             
             # 檢查是否到達頁面底部
             new_height = self.driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
                 print("\r已到達頁面底部", end='')
+                reached_end = True
                 break
             last_height = new_height
         
+        if incremental_crawl:
+            incremental_crawl.finish(reached_end)
+        
+        # 將進度寫成最終狀態（JSON 儲存會把日誌壓縮成最終的 JSON 檔）
+        try:
+            with moptt_metrics.stage('finalize', scraper='list'):
+                store.finalize()
+        except Exception as e:
+            print(f"\r壓縮進度日誌時發生錯誤: {str(e)}", end='')
+        
+        all_data = store.load_articles(board)
         print(f"\r完成爬取，共 {len(all_data)} 篇文章", end='')
+        print(f"\n等待時間：{self.wait_recorder.summary()}")
+        if self.first_article_seconds is not None:
+            print(f"啟動到第一篇文章：{self.first_article_seconds:.2f} 秒")
+        print(f"滾動效能：{scroll_profiler.summary()}")
         return all_data
 
     def close(self):
-        """關閉瀏覽器"""
-        self.driver.quit()
+        """關閉瀏覽器（僅限自行建立的）"""
+        if self.owns_driver:
+            self.driver.quit()
 
 
 if __name__ == "__main__":
     # 設定要爬取的看板
     board_names = ["C_Chat", "Baseball", "NBA"]
     
-    scraper = MopttListScraper()
+    moptt_metrics.configure(job='moptt_list_scraper')
+    pool = BrowserPool()
+    store = SqliteArticleStore(SQLITE_DB) if SQLITE_DB else None
     
     for board_name in board_names:
         board_url = f"https://moptt.tw/b/{board_name}"
@@ -147,7 +210,13 @@ if __name__ == "__main__":
         
         try:
             print(f"\r開始爬取 {board_name} 看板，設定滾動 {MAX_SCROLLS} 次", end='')
-            data = scraper.scrape_board(board_url, max_scrolls=MAX_SCROLLS, progress_file=json_file)
+            leased_at = time.perf_counter()
+            with pool.lease() as driver:
+                scraper = MopttListScraper(driver=driver, started_at=leased_at)
+                try:
+                    data = scraper.scrape_board(board_url, max_scrolls=MAX_SCROLLS, progress_file=json_file, incremental=INCREMENTAL, store=store)
+                finally:
+                    scraper.close()
             
             if data:
                 with open(json_file, 'w', encoding='utf-8') as f:
@@ -159,6 +228,10 @@ if __name__ == "__main__":
         except Exception as e:
             print(f"\r爬取 {board_name} 看板時發生錯誤: {str(e)}", end='')
     
-    scraper.close()
+    print(f"\r瀏覽器：{pool.summary()}")
+    pool.close()
+    if store:
+        store.close()
+    moptt_metrics.report()
     print("\r爬蟲程式執行完成", end='')
     print()  # 最後換行
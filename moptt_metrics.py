@@ -0,0 +1,289 @@
+"""
+爬蟲各階段的計時與計數工具
+以 stage() 包住 driver.get、等待、元素擷取、點擊「顯示全部」、存檔等階段，
+以 count() 記錄逾時、擷取失敗等事件；結束時匯出 Prometheus 文字格式檔案、
+JSONL 事件紀錄，並輸出摘要表
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ====== 設定區域開始 ======
+# 是否啟用計時與計數
+METRICS_ENABLED = True
+
+# 輸出目錄（Prometheus 文字檔與 JSONL 事件紀錄）
+METRICS_DIR = 'moptt_metrics'
+
+# 是否寫入每一筆階段事件到 JSONL 事件紀錄
+EVENT_LOG_ENABLED = True
+
+# 直方圖的區間上限（秒）
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# ====== 設定區域結束 ======
+
+
+def _label_key(labels):
+    """將標籤字典轉成可作為字典鍵的排序後 tuple"""
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    """將標籤轉成 Prometheus 的 {a="1",b="2"} 格式"""
+    items = list(label_key) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """
+    計時與計數紀錄類別
+    直方圖以（階段, 標籤）分組，計數器以（名稱, 標籤）分組；可在多執行緒下共用
+    """
+
+    def __init__(self, job='moptt', metrics_dir=METRICS_DIR, buckets=HISTOGRAM_BUCKETS,
+                 enabled=METRICS_ENABLED, event_log=EVENT_LOG_ENABLED):
+        """
+        初始化紀錄
+
+        Args:
+            job (str): 工作名稱，用於輸出檔名與 job 標籤
+            metrics_dir (str): 輸出目錄
+            buckets (tuple): 直方圖的區間上限（秒）
+            enabled (bool): 是否啟用
+            event_log (bool): 是否寫入 JSONL 事件紀錄
+        """
+        self.job = job
+        self.metrics_dir = metrics_dir
+        self.buckets = buckets
+        self.enabled = enabled
+        self.event_log = event_log
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self._event_file = None
+
+    def configure(self, job=None, metrics_dir=None):
+        """
+        變更工作名稱或輸出目錄（在第一筆事件之前呼叫）
+
+        Args:
+            job (str, optional): 工作名稱
+            metrics_dir (str, optional): 輸出目錄
+        """
+        with self.lock:
+            if self._event_file is not None:
+                self._event_file.close()
+                self._event_file = None
+            self.job = job or self.job
+            self.metrics_dir = metrics_dir or self.metrics_dir
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """
+        計時一個階段，離開 with 區塊時記錄耗時（發生例外時額外記錄 outcome="error"）
+
+        Args:
+            name (str): 階段名稱，例如 driver_get、wait_page_load、save
+            **labels: 其他標籤，例如 scraper='content'
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, outcome=outcome, **labels)
+
+    def observe(self, name, seconds, **labels):
+        """
+        記錄一筆階段耗時
+
+        Args:
+            name (str): 階段名稱
+            seconds (float): 耗時（秒）
+            **labels: 標籤
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0, 'max': 0.0
+                }
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            histogram['max'] = max(histogram['max'], seconds)
+            self._write_event({'type': 'stage', 'stage': name, 'seconds': round(seconds, 6), **labels})
+
+    def count(self, name, amount=1, **labels):
+        """
+        增加計數器
+
+        Args:
+            name (str): 計數器名稱，例如 wait_timeout、article_none
+            amount (int): 增加量
+            **labels: 標籤
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self._write_event({'type': 'counter', 'counter': name, 'amount': amount, **labels})
+
+    def _write_event(self, event):
+        """附加一筆事件到 JSONL 事件紀錄（呼叫端需持有 lock）"""
+        if not self.event_log:
+            return
+        if self._event_file is None:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            self._event_file = open(os.path.join(self.metrics_dir, f'{self.job}.events.jsonl'),
+                                    'a', encoding='utf-8')
+        event['ts'] = round(time.time(), 3)
+        event['job'] = self.job
+        self._event_file.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def _quantile(self, histogram, quantile):
+        """以直方圖區間估計分位數（回傳該分位數所在區間的上限）"""
+        target = histogram['count'] * quantile
+        cumulative = 0
+        for upper, bucket_count in zip(self.buckets, histogram['buckets']):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return min(upper, histogram['max'])
+        return histogram['max']
+
+    def prometheus_text(self):
+        """
+        輸出 Prometheus 文字格式
+
+        Returns:
+            str: 包含 moptt_stage_seconds 直方圖與各計數器的文字
+        """
+        lines = []
+        job_label = (('job', self.job),)
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        if histograms:
+            lines.append('# HELP moptt_stage_seconds 爬蟲各階段耗時')
+            lines.append('# TYPE moptt_stage_seconds histogram')
+        for (name, label_key), histogram in histograms:
+            base = (('stage', name),) + label_key + job_label
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, histogram['buckets']):
+                cumulative += bucket_count
+                lines.append(f"moptt_stage_seconds_bucket{_format_labels(base, (('le', upper),))} {cumulative}")
+            lines.append(f"moptt_stage_seconds_bucket{_format_labels(base, (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"moptt_stage_seconds_sum{_format_labels(base)} {histogram['sum']:.6f}")
+            lines.append(f"moptt_stage_seconds_count{_format_labels(base)} {histogram['count']}")
+
+        declared = set()
+        for (name, label_key), value in counters:
+            metric = f"moptt_{name}_total"
+            if metric not in declared:
+                lines.append(f'# TYPE {metric} counter')
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(label_key + job_label)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """
+        將 Prometheus 文字檔寫入輸出目錄（暫存檔 + os.replace），並刷新事件紀錄
+
+        Returns:
+            str: Prometheus 文字檔路徑，未啟用時為 None
+        """
+        if not self.enabled:
+            return None
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f'{self.job}.prom')
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_file, path)
+        with self.lock:
+            if self._event_file is not None:
+                self._event_file.flush()
+        return path
+
+    def summary_table(self):
+        """
+        產生各階段耗時與計數器的摘要表
+
+        Returns:
+            str: 摘要表文字，依總耗時由大到小排列
+        """
+        with self.lock:
+            histograms = sorted(self.histograms.items(), key=lambda item: -item[1]['sum'])
+            counters = sorted(self.counters.items())
+        if not histograms and not counters:
+            return ''
+
+        lines = [f"{'階段':<32} | {'次數':>7} | {'總耗時(秒)':>10} | {'平均(秒)':>8} | {'p50≤':>6} | {'p95≤':>6} | {'最大':>6}"]
+        for (name, label_key), histogram in histograms:
+            label_text = ','.join(f'{key}={value}' for key, value in label_key if key != 'outcome' or value != 'ok')
+            title = f"{name}[{label_text}]" if label_text else name
+            average = histogram['sum'] / histogram['count']
+            lines.append(f"{title[:32]:<32} | {histogram['count']:>7} | {histogram['sum']:>10.2f} | {average:>8.3f}"
+                         f" | {self._quantile(histogram, 0.5):>6.2f} | {self._quantile(histogram, 0.95):>6.2f}"
+                         f" | {histogram['max']:>6.2f}")
+        for (name, label_key), value in counters:
+            label_text = ','.join(f'{key}={value}' for key, value in label_key)
+            lines.append(f"{(name + (f'[{label_text}]' if label_text else ''))[:32]:<32} | {value:>7}")
+        return '\n'.join(lines)
+
+    def close(self):
+        """關閉事件紀錄"""
+        with self.lock:
+            if self._event_file is not None:
+                self._event_file.close()
+                self._event_file = None
+
+
+# 行程內共用的紀錄
+registry = MetricsRegistry()
+
+
+def stage(name, **labels):
+    """以共用紀錄計時一個階段（見 MetricsRegistry.stage）"""
+    return registry.stage(name, **labels)
+
+
+def count(name, amount=1, **labels):
+    """以共用紀錄增加計數器（見 MetricsRegistry.count）"""
+    registry.count(name, amount, **labels)
+
+
+def configure(job=None, metrics_dir=None):
+    """設定共用紀錄的工作名稱與輸出目錄（見 MetricsRegistry.configure），各程式在開始時呼叫"""
+    registry.configure(job, metrics_dir)
+
+
+def report():
+    """匯出共用紀錄並印出摘要表，供各程式在結束時呼叫"""
+    path = registry.export()
+    table = registry.summary_table()
+    if table:
+        print()
+        print(table)
+    if path:
+        print(f"計時資料已匯出至 {path}")
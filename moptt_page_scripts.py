@@ -0,0 +1,317 @@
+"""
+MOPTT 頁面內執行的 JavaScript 片段
+將需要大量 WebDriver 往返的 DOM 操作合併成單次 execute_script 呼叫
+"""
+
+import moptt_metrics
+
+# 看板頁文章卡片的 CSS 選擇器
+CARD_SELECTOR = "div[class*='eQQBIg']"
+
+# 標記已擷取卡片的屬性名稱（頁面內的 high-water mark）
+HARVESTED_ATTRIBUTE = 'data-moptt-harvested'
+
+# 一次取得所有尚未擷取過的卡片的 {url, title}，並將其標記為已擷取
+HARVEST_CARDS_JS = """
+const cardSelector = arguments[0];
+const harvestedAttribute = arguments[1];
+const results = [];
+for (const card of document.querySelectorAll(`${cardSelector}:not([${harvestedAttribute}])`)) {
+    const link = card.querySelector("a[href*='/p/']");
+    const title = card.querySelector("h3");
+    if (!link || !title) {
+        continue;
+    }
+    card.setAttribute(harvestedAttribute, "1");
+    results.push({url: link.href, title: title.innerText.trim()});
+}
+return results;
+"""
+
+
+def harvest_new_cards(driver):
+    """
+    以單次 WebDriver 往返擷取上次呼叫後新增的文章卡片
+
+    Args:
+        driver: Selenium WebDriver
+
+    Returns:
+        list: 包含文章URL和標題的字典列表（僅含新增的卡片）
+    """
+    return driver.execute_script(HARVEST_CARDS_JS, CARD_SELECTOR, HARVESTED_ATTRIBUTE) or []
+
+
+# 在頁面內以 MutationObserver 等待符合選擇器的元素數量達到門檻（execute_async_script）
+# 可選擇先滾動到頁面底部，讓滾動與等待只需一次 WebDriver 往返
+WAIT_FOR_COUNT_JS = """
+const selector = arguments[0];
+const minCount = arguments[1];
+const timeoutMs = arguments[2];
+const scrollFirst = arguments[3];
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+const count = () => document.querySelectorAll(selector).length;
+if (scrollFirst) {
+    window.scrollTo(0, document.body.scrollHeight);
+}
+if (count() >= minCount) {
+    done({count: count(), waited: 0, timed_out: false});
+    return;
+}
+let timer = null;
+const observer = new MutationObserver(() => {
+    if (count() >= minCount) {
+        finish(false);
+    }
+});
+function finish(timedOut) {
+    observer.disconnect();
+    clearTimeout(timer);
+    done({count: count(), waited: (performance.now() - start) / 1000, timed_out: timedOut});
+}
+observer.observe(document.documentElement, {childList: true, subtree: true});
+timer = setTimeout(() => finish(true), timeoutMs);
+"""
+
+
+def wait_for_element_count(driver, selector, min_count, timeout, scroll_first=False):
+    """
+    在頁面內等待符合選擇器的元素數量達到門檻，達到時立即返回
+    driver 的 script timeout 需大於 timeout
+
+    Args:
+        driver: Selenium WebDriver
+        selector (str): CSS 選擇器
+        min_count (int): 元素數量門檻
+        timeout (float): 最長等待秒數
+        scroll_first (bool): 等待前是否先滾動到頁面底部
+
+    Returns:
+        dict: 包含 count（目前數量）、waited（實際等待秒數）、timed_out（是否逾時）的字典
+    """
+    return driver.execute_async_script(WAIT_FOR_COUNT_JS, selector, min_count, int(timeout * 1000), scroll_first)
+
+
+class WaitRecorder:
+    """
+    等待時間紀錄類別
+    記錄每種等待實際花費的時間，並與原本固定 sleep 的時間比較
+    """
+
+    def __init__(self, scraper=None):
+        """
+        Args:
+            scraper (str, optional): 計時紀錄中的 scraper 標籤
+        """
+        self.records = {}
+        self.labels = {'scraper': scraper} if scraper else {}
+
+    def wait(self, driver, name, selector, min_count, timeout, fixed_sleep, scroll_first=False):
+        """
+        以 wait_for_element_count 等待並記錄實際等待時間
+
+        Args:
+            driver: Selenium WebDriver
+            name (str): 等待種類，例如 scroll、page_load、show_all
+            selector (str): CSS 選擇器
+            min_count (int): 元素數量門檻
+            timeout (float): 最長等待秒數
+            fixed_sleep (float): 原本固定 sleep 的秒數
+            scroll_first (bool): 等待前是否先滾動到頁面底部
+
+        Returns:
+            dict: wait_for_element_count 的回傳值
+        """
+        with moptt_metrics.stage(f'wait_{name}', **self.labels):
+            result = wait_for_element_count(driver, selector, min_count, timeout, scroll_first)
+        stats = self.records.setdefault(name, {'count': 0, 'waited': 0.0, 'fixed': 0.0, 'timeouts': 0})
+        stats['count'] += 1
+        stats['waited'] += result['waited']
+        stats['fixed'] += fixed_sleep
+        if result['timed_out']:
+            stats['timeouts'] += 1
+            moptt_metrics.count('wait_timeout', wait=name, **self.labels)
+        return result
+
+    def summary(self):
+        """
+        取得等待時間摘要
+
+        Returns:
+            str: 例如「scroll: 120 次 等待 8.3 秒（固定 sleep 60.0 秒，省下 51.7 秒，逾時 1 次）」
+        """
+        lines = []
+        for name, stats in self.records.items():
+            lines.append(f"{name}: {stats['count']} 次 等待 {stats['waited']:.1f} 秒"
+                         f"（固定 sleep {stats['fixed']:.1f} 秒，省下 {stats['fixed'] - stats['waited']:.1f} 秒，逾時 {stats['timeouts']} 次）")
+        return ' | '.join(lines)
+
+
+# 標記已修剪卡片的屬性名稱
+PRUNED_ATTRIBUTE = 'data-moptt-pruned'
+
+# 修剪卡片後用來補足高度的佔位元素 id（detach 模式）
+PRUNE_SPACER_ID = 'moptt-prune-spacer'
+
+# 修剪已擷取的卡片，並回傳頁面狀態（卡片數、DOM 節點數、JS heap）
+# blank 模式：清空卡片內容並固定其高度，保留卡片節點本身（不影響 React 的節點管理）
+# detach 模式：移除卡片節點，以第一張保留卡片為錨點，將減少的高度補到佔位元素上
+# mode 為 null 時只回傳頁面狀態
+PRUNE_CARDS_JS = """
+const cardSelector = arguments[0];
+const harvestedAttribute = arguments[1];
+const prunedAttribute = arguments[2];
+const spacerId = arguments[3];
+const mode = arguments[4];
+const keepCards = arguments[5];
+let pruned = 0;
+if (mode) {
+    const cards = Array.from(document.querySelectorAll(`${cardSelector}:not([${prunedAttribute}])`));
+    const candidates = cards.slice(0, Math.max(cards.length - keepCards, 0))
+        .filter(card => card.hasAttribute(harvestedAttribute));
+    if (candidates.length && mode === 'blank') {
+        for (const card of candidates) {
+            card.style.height = `${card.getBoundingClientRect().height}px`;
+            card.style.boxSizing = 'border-box';
+            card.replaceChildren();
+            card.setAttribute(prunedAttribute, '1');
+        }
+        pruned = candidates.length;
+    } else if (candidates.length && mode === 'detach') {
+        const anchor = cards[candidates.length] || null;
+        const anchorTop = anchor ? anchor.getBoundingClientRect().top : 0;
+        let spacer = document.getElementById(spacerId);
+        if (!spacer) {
+            spacer = document.createElement('div');
+            spacer.id = spacerId;
+            spacer.style.height = '0px';
+            candidates[0].parentNode.insertBefore(spacer, candidates[0]);
+        }
+        for (const card of candidates) {
+            card.remove();
+        }
+        if (anchor) {
+            const shift = anchorTop - anchor.getBoundingClientRect().top;
+            spacer.style.height = `${parseFloat(spacer.style.height) + shift}px`;
+        }
+        pruned = candidates.length;
+    }
+}
+return {
+    pruned: pruned,
+    cards: document.querySelectorAll(cardSelector).length,
+    nodes: document.getElementsByTagName('*').length,
+    heap: performance.memory ? performance.memory.usedJSHeapSize : null
+};
+"""
+
+
+def prune_harvested_cards(driver, mode=None, keep_cards=20):
+    """
+    修剪已擷取過的文章卡片，讓長時間滾動時 DOM 大小維持固定
+
+    Args:
+        driver: Selenium WebDriver
+        mode (str, optional): 'blank'（清空內容保留高度）、'detach'（移除節點）或 None（不修剪）
+        keep_cards (int): 頁面底部保留不修剪的卡片數，避免影響無限滾動的觸發
+
+    Returns:
+        dict: 包含 pruned（本次修剪數）、cards（目前卡片數）、nodes（DOM 節點數）、
+              heap（JS heap 使用量，瀏覽器不支援時為 None）的字典
+    """
+    return driver.execute_script(
+        PRUNE_CARDS_JS, CARD_SELECTOR, HARVESTED_ATTRIBUTE, PRUNED_ATTRIBUTE, PRUNE_SPACER_ID, mode, keep_cards
+    )
+
+
+class ScrollProfiler:
+    """
+    滾動效能紀錄類別
+    記錄每次滾動的耗時、DOM 大小與 JS heap，用來比較前段與後段滾動的成本
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, seconds, page_stats):
+        """
+        記錄一次滾動
+
+        Args:
+            seconds (float): 此次滾動（含等待與擷取）的耗時
+            page_stats (dict): prune_harvested_cards 的回傳值
+        """
+        self.records.append({
+            'scroll': len(self.records) + 1,
+            'seconds': seconds,
+            'cards': page_stats['cards'],
+            'nodes': page_stats['nodes'],
+            'heap': page_stats['heap'],
+            'pruned': page_stats['pruned']
+        })
+
+    def summary(self):
+        """
+        取得滾動效能摘要：前 10% 與後 10% 滾動的平均耗時、DOM 節點數與 JS heap 變化
+
+        Returns:
+            str: 摘要文字，沒有紀錄時為空字串
+        """
+        if not self.records:
+            return ''
+        window = max(len(self.records) // 10, 1)
+        head = self.records[:window]
+        tail = self.records[-window:]
+        head_seconds = sum(r['seconds'] for r in head) / len(head)
+        tail_seconds = sum(r['seconds'] for r in tail) / len(tail)
+        first, last = self.records[0], self.records[-1]
+        text = (f"滾動 {len(self.records)} 次：前 {window} 次平均 {head_seconds:.3f} 秒，"
+                f"後 {window} 次平均 {tail_seconds:.3f} 秒 | "
+                f"DOM 節點 {first['nodes']} → {last['nodes']}，卡片 {first['cards']} → {last['cards']}，"
+                f"共修剪 {sum(r['pruned'] for r in self.records)} 張")
+        heaps = [r['heap'] for r in self.records if r['heap'] is not None]
+        if heaps:
+            text += f" | JS heap {heaps[0] / 1048576:.1f} → {heaps[-1] / 1048576:.1f} MB（峰值 {max(heaps) / 1048576:.1f} MB）"
+        return text
+
+
+# 每次 WebDriver 往返取得的回應數
+COMMENT_BATCH_SIZE = 500
+
+# 一次取得第 start 則起最多 limit 則回應的文字（略過空白回應），並回傳回應總數
+EXTRACT_COMMENTS_JS = """
+const spans = document.querySelectorAll(arguments[0]);
+const start = arguments[1];
+const end = Math.min(spans.length, start + arguments[2]);
+const texts = [];
+for (let i = start; i < end; i++) {
+    const text = spans[i].innerText.trim();
+    if (text) {
+        texts.push(text);
+    }
+}
+return {texts: texts, total: spans.length};
+"""
+
+
+def iter_comment_batches(driver, selector, batch_size=COMMENT_BATCH_SIZE):
+    """
+    分批取得頁面上的回應文字，每批只需一次 WebDriver 往返，取代逐一讀取每個元素的 .text
+
+    Args:
+        driver: Selenium WebDriver
+        selector (str): 回應元素的 CSS 選擇器
+        batch_size (int): 每批的回應數
+
+    Yields:
+        list: 一批回應文字（依頁面順序）
+    """
+    start = 0
+    while True:
+        batch = driver.execute_script(EXTRACT_COMMENTS_JS, selector, start, batch_size)
+        if batch['texts']:
+            yield batch['texts']
+        start += batch_size
+        if start >= batch['total']:
+            return
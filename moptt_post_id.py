@@ -0,0 +1,196 @@
+"""
+MOPTT / PTT 文章 ID 解析工具
+文章 ID 格式為 <看板>.M.<epoch>.A.<雜湊>，例如 Baseball.M.1734516576.A.F6F，
+其中 epoch 即為發文時間；PTT 文章網址則為 /bbs/<看板>/M.<epoch>.A.<雜湊>.html。
+發文時間可直接由 ID 取得，不需開啟文章頁面；PostTimeIndex 則是依發文時間排序的文章索引，
+以二分搜尋回答「某段時間內的文章」與截止時間判斷，不需掃描所有文章
+"""
+
+import bisect
+import re
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+POST_ID_PATTERN = re.compile(r'(?:^|[./])M\.(\d+)\.A\.([0-9A-Fa-f]+)')
+POST_BOARD_PATTERN = re.compile(r'([A-Za-z0-9_\-]+)\.M\.\d+\.A\.')
+PTT_BOARD_PATTERN = re.compile(r'/bbs/([A-Za-z0-9_\-]+)/M\.\d+\.A\.')
+
+# 與 MOPTT 頁面 <time datetime> 相同的 ISO8601 格式
+POST_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+# 排序時大於任何網址的字串，用於區間終點的二分搜尋
+_MAX_URL = chr(0x10FFFF)
+
+PostId = namedtuple('PostId', ['board', 'epoch', 'hash'])
+
+
+def parse_post_id(url):
+    """
+    解析 MOPTT 或 PTT 的文章網址 / ID
+
+    Args:
+        url (str): 例如 https://moptt.tw/p/Baseball.M.1734516576.A.F6F、
+                   https://www.ptt.cc/bbs/Baseball/M.1734516576.A.F6F.html 或 Baseball.M.1734516576.A.F6F
+
+    Returns:
+        PostId: (board, epoch, hash)，看板無法判斷時 board 為 None；不是文章 ID 時返回None
+    """
+    match = POST_ID_PATTERN.search(url or '')
+    if match is None:
+        return None
+    board_match = POST_BOARD_PATTERN.search(url) or PTT_BOARD_PATTERN.search(url)
+    return PostId(board_match.group(1) if board_match else None, int(match.group(1)), match.group(2))
+
+
+def parse_post_epoch(url):
+    """
+    從文章網址或 ID 取得發文時間的 epoch
+
+    Args:
+        url (str): 文章網址，例如 https://moptt.tw/p/Baseball.M.1734516576.A.F6F
+
+    Returns:
+        int: 發文時間的 epoch 秒數，無法解析時返回None
+    """
+    post_id = parse_post_id(url)
+    return post_id.epoch if post_id else None
+
+
+def parse_post_board(url):
+    """
+    從文章網址或 ID 取得看板名稱
+
+    Args:
+        url (str): 文章網址，例如 https://moptt.tw/p/Baseball.M.1734516576.A.F6F
+
+    Returns:
+        str: 看板名稱，無法解析時返回None
+    """
+    post_id = parse_post_id(url)
+    return post_id.board if post_id else None
+
+
+def post_time_from_id(url):
+    """
+    由文章 ID 推算發文時間字串（與 MOPTT 頁面 <time datetime> 的格式相同）
+
+    Args:
+        url (str): 文章網址或 ID
+
+    Returns:
+        str: 例如 2024-12-18T10:09:36.000Z，無法解析時為空字串
+    """
+    epoch = parse_post_epoch(url)
+    if epoch is None:
+        return ""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime(POST_TIME_FORMAT)
+
+
+def to_epoch(value):
+    """
+    將 datetime 或 epoch 統一轉為 epoch 秒數
+
+    Args:
+        value (datetime | int | float | None): 時間
+
+    Returns:
+        int: epoch 秒數，None 時返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+class PostTimeIndex:
+    """
+    依發文時間排序的文章索引
+    以 (epoch, url) 的排序列表保存，區間查詢與截止判斷皆為二分搜尋；
+    無法由 ID 取得發文時間的網址不會被加入
+    """
+
+    def __init__(self, urls=()):
+        """
+        Args:
+            urls (iterable): 初始的文章網址
+        """
+        entries = ((parse_post_epoch(url), url) for url in urls)
+        self.entries = sorted((epoch, url) for epoch, url in entries if epoch is not None)
+        self._urls = {url for _, url in self.entries}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url):
+        return url in self._urls
+
+    def add(self, url):
+        """
+        加入一篇文章（已存在或無法取得發文時間時略過）
+
+        Args:
+            url (str): 文章網址
+
+        Returns:
+            bool: 是否加入
+        """
+        if url in self._urls:
+            return False
+        epoch = parse_post_epoch(url)
+        if epoch is None:
+            return False
+        bisect.insort(self.entries, (epoch, url))
+        self._urls.add(url)
+        return True
+
+    def between(self, start=None, end=None):
+        """
+        取得發文時間在區間內的文章網址，依發文時間由舊到新排列
+
+        Args:
+            start (datetime | int, optional): 區間起點（含），未指定時從最舊的文章開始
+            end (datetime | int, optional): 區間終點（含），未指定時到最新的文章
+
+        Returns:
+            list: 文章網址列表
+        """
+        start, end = to_epoch(start), to_epoch(end)
+        low = 0 if start is None else bisect.bisect_left(self.entries, (start,))
+        high = len(self.entries) if end is None else bisect.bisect_right(self.entries, (end, _MAX_URL))
+        return [url for _, url in self.entries[low:high]]
+
+    def recent(self, hours, now=None):
+        """
+        取得最近幾小時內發文的文章網址
+
+        Args:
+            hours (float): 小時數
+            now (datetime | int, optional): 目前時間，未指定時為 time.time()
+
+        Returns:
+            list: 文章網址列表（由舊到新）
+        """
+        now = time.time() if now is None else to_epoch(now)
+        return self.between(int(now - hours * 3600))
+
+    def count_since(self, start):
+        """
+        取得發文時間不早於 start 的文章數
+
+        Args:
+            start (datetime | int): 時間
+
+        Returns:
+            int: 文章數
+        """
+        return len(self.entries) - bisect.bisect_left(self.entries, (to_epoch(start),))
+
+    def newest_epoch(self):
+        """最新一篇文章的發文時間，索引為空時返回None"""
+        return self.entries[-1][0] if self.entries else None
+
+    def oldest_epoch(self):
+        """最舊一篇文章的發文時間，索引為空時返回None"""
+        return self.entries[0][0] if self.entries else None
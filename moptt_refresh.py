@@ -0,0 +1,337 @@
+"""
+MOPTT 文章互動數據重新爬取排程
+內容爬蟲會略過 content_fetched 為 True 的文章，讚數、噓數與回應數因此停在第一次爬取時的數值，
+而全部重新爬取的成本太高。本工具依發文時間（文章 ID 中的 epoch）與歷次爬取之間
+讚數 / 回應數的成長速度，估計每篇文章自上次爬取以來的預期變動量，
+每次執行只以固定的爬取預算重新爬取預期變動量最大的文章，並回報預算使用量與實際有變動的篇數
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import time
+
+import moptt_metrics
+from moptt_browser_session import BrowserPool
+from moptt_content_scraper import MopttContentScraper
+from moptt_post_id import parse_post_epoch
+from moptt_storage import open_store
+
+# ====== 設定區域開始 ======
+# 要重新爬取的看板
+BOARD_NAMES = ["Beauty", "marvel", "NBA"]
+
+# 每個看板每次執行最多重新爬取的篇數
+REFRESH_BUDGET = 200
+
+# 互動速度的半衰期（小時）：文章的讚數 / 回應數成長速度約每經過這段時間減半
+VELOCITY_HALF_LIFE_HOURS = 12
+
+# 發文超過此天數的文章不再重新爬取
+MAX_REFRESH_AGE_DAYS = 14
+
+# 距離上次爬取未滿此秒數的文章不重新爬取
+MIN_REFRESH_INTERVAL = 1800
+
+# 估計速度時，最近兩次爬取之間的速度所佔的權重（其餘為發文以來的平均速度）
+RECENT_VELOCITY_WEIGHT = 0.7
+
+# 每篇文章保留的爬取快照數
+HISTORY_LENGTH = 5
+
+# SQLite 資料庫路徑，設定後以資料庫取代各看板的 JSON 進度檔
+SQLITE_DB = None
+
+# 狀態檔目錄（不放在工作目錄，避免被 moptt_*.json 的轉換 / 索引工具當成文章檔）
+STATE_DIR = 'moptt_state'
+# ====== 設定區域結束 ======
+
+# 快照格式：[爬取時間 epoch, 讚數, 噓數, 回應數]
+SNAPSHOT_FIELDS = ('likes', 'boos', 'responses')
+
+
+def history_path_for(board):
+    """取得看板的爬取快照檔路徑，例如 moptt_state/Beauty.refresh.json"""
+    return os.path.join(STATE_DIR, f'{board}.refresh.json')
+
+
+def _to_int(value):
+    """將互動數據轉為整數，無法轉換時為 0"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def is_content_fetched(article):
+    """
+    判斷文章是否已有互動數據
+    內容爬蟲的文章有 content_fetched，整合爬蟲的文章則是非預載且具有 likes 欄位
+
+    Args:
+        article (dict): 文章
+
+    Returns:
+        bool: 是否已爬取過內容
+    """
+    if article.get('content_fetched'):
+        return True
+    return 'likes' in article and not article.get('preloaded')
+
+
+class RefreshHistory:
+    """
+    爬取快照紀錄類別
+    以 {文章 URL: [[爬取時間, 讚, 噓, 回應], ...]} 的 JSON 檔保存每篇文章最近幾次爬取時的互動數據
+    """
+
+    def __init__(self, path, length=HISTORY_LENGTH):
+        """
+        初始化並載入快照檔
+
+        Args:
+            path (str): 快照檔路徑
+            length (int): 每篇文章保留的快照數
+        """
+        self.path = path
+        self.length = length
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.snapshots = json.load(f)
+        except FileNotFoundError:
+            self.snapshots = {}
+
+    def get(self, url):
+        """取得文章的快照列表（由舊到新），沒有紀錄時為空列表"""
+        return self.snapshots.get(url, [])
+
+    def record(self, article):
+        """
+        若文章的 fetched_at 比最後一筆快照新，新增一筆快照
+
+        Args:
+            article (dict): 具有 fetched_at 與互動數據的文章
+
+        Returns:
+            bool: 是否新增了快照
+        """
+        fetched_at = article.get('fetched_at')
+        if fetched_at is None:
+            return False
+        snapshots = self.snapshots.setdefault(article['url'], [])
+        if snapshots and snapshots[-1][0] >= fetched_at:
+            return False
+        snapshots.append([fetched_at] + [_to_int(article.get(field)) for field in SNAPSHOT_FIELDS])
+        del snapshots[:-self.length]
+        return True
+
+    def save(self):
+        """寫回快照檔（暫存檔 + os.replace）"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshots, f, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+
+
+def _engagement(snapshot):
+    """快照中的讚數加回應數"""
+    return snapshot[1] + snapshot[3]
+
+
+def estimate_velocity(snapshots, post_epoch):
+    """
+    估計文章在最後一次爬取時的互動速度（讚數 + 回應數 / 小時）
+    有兩筆以上快照時，以最近兩次爬取之間的成長速度與發文以來的平均速度加權平均
+
+    Args:
+        snapshots (list): 快照列表（由舊到新，至少一筆）
+        post_epoch (int): 發文時間
+
+    Returns:
+        float: 每小時的互動數成長量
+    """
+    latest = snapshots[-1]
+    lifetime_hours = max((latest[0] - post_epoch) / 3600, 1 / 60)
+    lifetime_velocity = _engagement(latest) / lifetime_hours
+    if len(snapshots) < 2:
+        return lifetime_velocity
+
+    previous = snapshots[-2]
+    interval_hours = max((latest[0] - previous[0]) / 3600, 1 / 60)
+    recent_velocity = max(_engagement(latest) - _engagement(previous), 0) / interval_hours
+    return RECENT_VELOCITY_WEIGHT * recent_velocity + (1 - RECENT_VELOCITY_WEIGHT) * lifetime_velocity
+
+
+def refresh_priority(article, snapshots, now):
+    """
+    計算文章的重新爬取優先度：自上次爬取以來預期增加的互動數
+    假設互動速度自上次爬取起以 VELOCITY_HALF_LIFE_HOURS 為半衰期遞減，
+    預期變動量 = 速度 × 半衰期 / ln2 × (1 - 2^(-距上次爬取時數 / 半衰期))
+
+    Args:
+        article (dict): 文章
+        snapshots (list): 文章的快照列表
+        now (float): 目前時間
+
+    Returns:
+        float: 優先度，0 表示不需重新爬取（太舊、剛爬過或無法取得發文時間）
+    """
+    post_epoch = parse_post_epoch(article['url'])
+    if post_epoch is None or now - post_epoch > MAX_REFRESH_AGE_DAYS * 86400:
+        return 0.0
+
+    if not snapshots:
+        # 沒有爬取時間的舊資料：視為在發文時爬取，以目前的互動數作為發文以來的成長量
+        snapshots = [[post_epoch] + [_to_int(article.get(field)) for field in SNAPSHOT_FIELDS]]
+        velocity = _engagement(snapshots[0]) / max((now - post_epoch) / 3600, 1 / 60)
+    else:
+        velocity = estimate_velocity(snapshots, post_epoch)
+
+    since_last = now - snapshots[-1][0]
+    if since_last < MIN_REFRESH_INTERVAL:
+        return 0.0
+    half_life = VELOCITY_HALF_LIFE_HOURS
+    return velocity * half_life / math.log(2) * (1 - 0.5 ** (since_last / 3600 / half_life))
+
+
+def plan_refresh(articles, history, budget=REFRESH_BUDGET, now=None):
+    """
+    挑選本次要重新爬取的文章
+
+    Args:
+        articles (list): 看板的文章
+        history (RefreshHistory): 爬取快照紀錄
+        budget (int): 本次最多重新爬取的篇數
+        now (float, optional): 目前時間，未指定時為 time.time()
+
+    Returns:
+        tuple: (依優先度由高到低的 [(優先度, 文章)] 列表, 統計字典)
+    """
+    now = time.time() if now is None else now
+    stats = {'candidates': 0, 'skipped': 0}
+    scored = []
+    for article in articles:
+        if not is_content_fetched(article):
+            continue
+        stats['candidates'] += 1
+        priority = refresh_priority(article, history.get(article['url']), now)
+        if priority <= 0:
+            stats['skipped'] += 1
+            continue
+        scored.append((priority, article))
+    plan = heapq.nlargest(budget, scored, key=lambda item: item[0])
+    return plan, stats
+
+
+def refresh_board(board, store, scraper, budget=REFRESH_BUDGET, dry_run=False):
+    """
+    重新爬取一個看板中預期變動最大的文章，並更新文章儲存與快照
+
+    Args:
+        board (str): 看板名稱
+        store (ArticleStore): 文章儲存
+        scraper (MopttContentScraper): 內容爬蟲，dry_run 時可為 None
+        budget (int): 本次最多重新爬取的篇數
+        dry_run (bool): 只列出計畫，不實際爬取
+
+    Returns:
+        dict: 本次的統計（候選、略過、預算、實際爬取、失敗、有變動篇數與各欄位增減）
+    """
+    history = RefreshHistory(history_path_for(board))
+    # 以發文時間索引只取出仍在重新爬取期限內的文章，不必載入整個看板
+    articles = store.articles_between(board, time.time() - MAX_REFRESH_AGE_DAYS * 86400)
+    # 將其他爬蟲在上次執行後爬取的結果補進快照
+    for article in articles:
+        if is_content_fetched(article):
+            history.record(article)
+
+    plan, report = plan_refresh(articles, history, budget)
+    report.update({'board': board, 'budget': budget, 'planned': len(plan), 'fetched': 0, 'failed': 0,
+                   'changed': 0, 'deltas': {field: 0 for field in SNAPSHOT_FIELDS}})
+    if dry_run:
+        for priority, article in plan:
+            print(f"{priority:>8.1f} | {article['url']}")
+        return report
+
+    for i, (priority, article) in enumerate(plan):
+        print(f"\r重新爬取 {board}: {i + 1}/{len(plan)} | 優先度 {priority:.1f}", end='')
+        before = {field: _to_int(article.get(field)) for field in SNAPSHOT_FIELDS}
+        with moptt_metrics.stage('refresh_fetch', scraper='refresh'):
+            updated = scraper.get_article_content(dict(article), revalidate=True)
+        # 擷取失敗（含頁面載入逾時）時不會設定新的 fetched_at，不寫回也不記錄快照
+        if updated.get('fetched_at') == article.get('fetched_at'):
+            report['failed'] += 1
+            moptt_metrics.count('refresh_failed', board=board)
+            continue
+
+        report['fetched'] += 1
+        deltas = {field: _to_int(updated.get(field)) - before[field] for field in SNAPSHOT_FIELDS}
+        if any(deltas.values()):
+            report['changed'] += 1
+            moptt_metrics.count('refresh_changed', board=board)
+        for field, delta in deltas.items():
+            report['deltas'][field] += delta
+        with moptt_metrics.stage('save', scraper='refresh'):
+            store.upsert(updated)
+        history.record(updated)
+
+    store.finalize()
+    history.save()
+    print()
+    return report
+
+
+def format_report(report):
+    """
+    將統計整理成一行報告
+
+    Args:
+        report (dict): refresh_board 的回傳值
+
+    Returns:
+        str: 例如「NBA：候選 1200 篇（略過 800） | 預算 200，使用 200（失敗 2） | 有變動 143 篇（72.2%） | 讚 +510 噓 +12 回應 +933」
+    """
+    used = report['fetched'] + report['failed']
+    changed_rate = report['changed'] / report['fetched'] * 100 if report['fetched'] else 0
+    deltas = report['deltas']
+    return (f"{report['board']}：候選 {report['candidates']} 篇（略過 {report['skipped']}）"
+            f" | 預算 {report['budget']}，使用 {used}（失敗 {report['failed']}）"
+            f" | 有變動 {report['changed']} 篇（{changed_rate:.1f}%）"
+            f" | 讚 {deltas['likes']:+d} 噓 {deltas['boos']:+d} 回應 {deltas['responses']:+d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='依文章新舊與互動速度重新爬取互動數據')
+    parser.add_argument('boards', nargs='*', default=BOARD_NAMES, help='看板名稱')
+    parser.add_argument('--budget', type=int, default=REFRESH_BUDGET, help='每個看板最多重新爬取的篇數')
+    parser.add_argument('--dry-run', action='store_true', help='只列出重新爬取計畫，不實際爬取')
+    args = parser.parse_args()
+
+    moptt_metrics.configure(job='moptt_refresh')
+    pool = None if args.dry_run else BrowserPool()
+    reports = []
+
+    for board_name in args.boards:
+        store = open_store(f'moptt_{board_name}.json', SQLITE_DB)
+        try:
+            if args.dry_run:
+                reports.append(refresh_board(board_name, store, None, args.budget, dry_run=True))
+            else:
+                with pool.lease() as driver:
+                    scraper = MopttContentScraper(driver=driver)
+                    try:
+                        reports.append(refresh_board(board_name, store, scraper, args.budget))
+                    finally:
+                        scraper.close()
+        finally:
+            store.close()
+
+    print()
+    for report in reports:
+        print(format_report(report))
+    if pool:
+        pool.close()
+    moptt_metrics.report()
@@ -0,0 +1,365 @@
+"""
+MOPTT 多看板並行排程器
+以多個行程同時爬取多個看板：每個看板先執行一次預載（滾動看板頁），
+再將文章內容切成固定篇數的分段，依輪替順序分派給各行程，
+避免單一大型看板佔滿所有行程；每個看板各自有檢查點檔案，中斷後可從內容階段繼續。
+子行程的輸出寫入各自的紀錄檔，主控台只顯示一行彙總進度
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing.util import Finalize
+
+import moptt_metrics
+from moptt_browser_session import BrowserPool, PROFILE_DIR
+from moptt_scraper import MAX_SCROLLS, MopttScraper
+from moptt_storage import open_store
+
+# ====== 設定區域開始 ======
+# 要爬取的看板
+BOARD_NAMES = ["Beauty", "marvel", "NBA"]
+
+# 同時執行的行程（瀏覽器）數量上限
+MAX_PROCESSES = 4
+
+# 每個內容分段處理的文章數
+SLICE_SIZE = 50
+
+# 看板的工作連續失敗時重試的次數（成功一次即重新計算）
+MAX_TASK_RETRIES = 2
+
+# 子行程紀錄檔目錄
+WORKER_LOG_DIR = 'moptt_logs'
+
+# 彙總進度更新間隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+# SQLite 資料庫路徑，設定後以資料庫取代各看板的 JSON 進度檔
+SQLITE_DB = None
+
+# 狀態檔目錄（不放在工作目錄，避免被 moptt_*.json 的轉換 / 索引工具當成文章檔）
+STATE_DIR = 'moptt_state'
+# ====== 設定區域結束 ======
+
+# 子行程內共用的瀏覽器工作階段池
+_worker_pool = None
+
+
+def checkpoint_path_for(board):
+    """
+    取得看板的檢查點檔案路徑
+
+    Args:
+        board (str): 看板名稱
+
+    Returns:
+        str: 例如 moptt_state/Beauty.checkpoint.json
+    """
+    return os.path.join(STATE_DIR, f"{board}.checkpoint.json")
+
+
+def load_checkpoint(board):
+    """
+    載入看板的檢查點
+
+    Args:
+        board (str): 看板名稱
+
+    Returns:
+        dict: 包含 phase（preload / content / done）與 failed_urls 的字典
+    """
+    try:
+        with open(checkpoint_path_for(board), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'phase': 'preload', 'failed_urls': []}
+
+
+def save_checkpoint(board, checkpoint):
+    """
+    以暫存檔 + os.replace 原子性地寫入看板的檢查點
+
+    Args:
+        board (str): 看板名稱
+        checkpoint (dict): 檢查點內容
+    """
+    path = checkpoint_path_for(board)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
+
+
+def _init_worker(worker_counter, log_dir, profile_dir):
+    """
+    子行程初始化：將輸出導向紀錄檔，並建立該行程專用的瀏覽器工作階段池
+
+    Args:
+        worker_counter (multiprocessing.Value): 用於分配子行程編號的計數器
+        log_dir (str): 紀錄檔目錄
+        profile_dir (str, optional): 使用者設定檔根目錄，各子行程使用各自的子目錄
+    """
+    global _worker_pool
+    with worker_counter.get_lock():
+        worker_counter.value += 1
+        index = worker_counter.value
+
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = open(os.path.join(log_dir, f'worker-{index}.log'), 'a', encoding='utf-8', buffering=1)
+    sys.stdout = sys.stderr = log_file
+    moptt_metrics.configure(job=f'scheduler-worker-{index}')
+
+    worker_profile_dir = os.path.join(profile_dir, f'worker-{index}') if profile_dir else None
+    _worker_pool = BrowserPool(size=1, profile_dir=worker_profile_dir)
+    Finalize(None, _worker_pool.close, exitpriority=10)
+
+
+def run_preload_task(board, max_scrolls, incremental, db_file):
+    """
+    子行程工作：預載看板的文章列表
+
+    Args:
+        board (str): 看板名稱
+        max_scrolls (int): 最大滾動次數
+        incremental (bool): 增量模式
+        db_file (str, optional): SQLite 資料庫路徑
+
+    Returns:
+        dict: 包含 added（新增預載篇數）與 pending（待處理內容篇數）的字典
+    """
+    store = open_store(f"moptt_{board}.json", db_file)
+    try:
+        with _worker_pool.lease() as driver:
+            scraper = MopttScraper(driver=driver)
+            try:
+                added = scraper.preload_board(f"{scraper.base_url}/b/{board}", store, max_scrolls, incremental)
+            finally:
+                scraper.close()
+        pending = len(store.preloaded_articles(board))
+        store.finalize()
+    finally:
+        store.close()
+        moptt_metrics.registry.export()
+    return {'added': added, 'pending': pending}
+
+
+def run_content_task(board, limit, exclude, db_file):
+    """
+    子行程工作：處理看板中一個分段的預載文章
+
+    Args:
+        board (str): 看板名稱
+        limit (int): 本分段最多處理的篇數
+        exclude (list): 略過的文章 URL（先前已擷取失敗的文章）
+        db_file (str, optional): SQLite 資料庫路徑
+
+    Returns:
+        dict: 包含 processed（處理篇數）、failed_urls（本分段擷取失敗的 URL）、pending（剩餘待處理篇數）的字典
+    """
+    store = open_store(f"moptt_{board}.json", db_file)
+    try:
+        with _worker_pool.lease() as driver:
+            scraper = MopttScraper(driver=driver)
+            try:
+                processed, failed_urls = scraper.process_preloaded(board, store, limit=limit, exclude=exclude)
+            finally:
+                scraper.close()
+        skipped = set(exclude) | set(failed_urls)
+        pending = sum(1 for article in store.preloaded_articles(board) if article['url'] not in skipped)
+        store.finalize()
+    finally:
+        store.close()
+        moptt_metrics.registry.export()
+    return {'processed': processed, 'failed_urls': failed_urls, 'pending': pending}
+
+
+class BoardScheduler:
+    """
+    多看板排程器
+    每個看板同時最多只有一個工作在執行（單一寫入者），可用的行程依看板輪替分派
+    """
+
+    def __init__(self, boards, max_processes=MAX_PROCESSES, slice_size=SLICE_SIZE, max_scrolls=MAX_SCROLLS,
+                 incremental=False, db_file=SQLITE_DB, fresh=False):
+        """
+        初始化排程器
+
+        Args:
+            boards (list): 看板名稱列表
+            max_processes (int): 同時執行的行程數量上限
+            slice_size (int): 每個內容分段處理的文章數
+            max_scrolls (int): 預載時的最大滾動次數
+            incremental (bool): 增量模式
+            db_file (str, optional): SQLite 資料庫路徑
+            fresh (bool): 忽略既有的檢查點，所有看板重新預載
+        """
+        self.max_processes = max_processes
+        self.slice_size = slice_size
+        self.max_scrolls = max_scrolls
+        self.incremental = incremental
+        self.db_file = db_file
+
+        self.states = {}
+        for board in boards:
+            checkpoint = {'phase': 'preload', 'failed_urls': []} if fresh else load_checkpoint(board)
+            # 上次已完成的看板重新預載以取得新文章
+            if checkpoint['phase'] == 'done':
+                checkpoint = {'phase': 'preload', 'failed_urls': []}
+            self.states[board] = {'checkpoint': checkpoint, 'pending': None, 'processed': 0,
+                                  'preloaded': 0, 'errors': 0, 'running': None}
+        self.rotation = deque(boards)
+        self.started_at = None
+
+    def _next_task(self):
+        """
+        依輪替順序取得下一個可執行的工作
+
+        Returns:
+            tuple: (看板名稱, 工作種類)，沒有可執行的工作時為 None
+        """
+        for _ in range(len(self.rotation)):
+            board = self.rotation[0]
+            self.rotation.rotate(-1)
+            state = self.states[board]
+            phase = state['checkpoint']['phase']
+            if state['running'] is None and phase in ('preload', 'content'):
+                return board, phase
+        return None
+
+    def _submit(self, executor, board, phase):
+        """送出看板的下一個工作"""
+        state = self.states[board]
+        if phase == 'preload':
+            future = executor.submit(run_preload_task, board, self.max_scrolls, self.incremental, self.db_file)
+        else:
+            future = executor.submit(run_content_task, board, self.slice_size,
+                                     state['checkpoint']['failed_urls'], self.db_file)
+        state['running'] = phase
+        return future
+
+    def _handle_result(self, board, future):
+        """依工作結果更新看板狀態與檢查點"""
+        state = self.states[board]
+        phase = state['running']
+        state['running'] = None
+        checkpoint = state['checkpoint']
+
+        try:
+            result = future.result()
+        except Exception as e:
+            state['errors'] += 1
+            state['last_error'] = str(e)
+            if state['errors'] > MAX_TASK_RETRIES:
+                checkpoint['phase'] = 'failed'
+            return
+
+        state['errors'] = 0
+        if phase == 'preload':
+            state['preloaded'] += result['added']
+            state['pending'] = result['pending']
+        else:
+            state['processed'] += result['processed']
+            state['pending'] = result['pending']
+            checkpoint['failed_urls'].extend(result['failed_urls'])
+        checkpoint['phase'] = 'content' if state['pending'] else 'done'
+        save_checkpoint(board, checkpoint)
+
+    def progress_line(self):
+        """
+        組合彙總進度文字
+
+        Returns:
+            str: 例如「[03:21] 看板 2/30 完成 | 執行中 4 | 預載 1200 篇 | 內容 350/1800 | 1.74 篇/秒 | 失敗 3」
+        """
+        elapsed = time.perf_counter() - self.started_at
+        states = self.states.values()
+        done = sum(1 for s in states if s['checkpoint']['phase'] == 'done')
+        failed_boards = sum(1 for s in states if s['checkpoint']['phase'] == 'failed')
+        running = [board for board, s in self.states.items() if s['running']]
+        preloaded = sum(s['preloaded'] for s in states)
+        processed = sum(s['processed'] for s in states)
+        total = processed + sum(s['pending'] or 0 for s in states)
+        failed_articles = sum(len(s['checkpoint']['failed_urls']) for s in states)
+        rate = processed / elapsed if elapsed else 0
+
+        line = (f"[{int(elapsed) // 60:02d}:{int(elapsed) % 60:02d}] 看板 {done}/{len(self.states)} 完成"
+                f" | 執行中 {len(running)}{'：' + ', '.join(running[:4]) if running else ''}{'…' if len(running) > 4 else ''}"
+                f" | 預載 {preloaded} 篇 | 內容 {processed}/{total} | {rate:.2f} 篇/秒 | 失敗文章 {failed_articles}")
+        if failed_boards:
+            line += f" | 失敗看板 {failed_boards}"
+        return line
+
+    def run(self):
+        """
+        執行排程直到所有看板完成或失敗
+
+        Returns:
+            dict: 以看板名稱為鍵的狀態字典
+        """
+        self.started_at = time.perf_counter()
+        worker_counter = multiprocessing.Value('i', 0)
+        running = {}
+        last_width = 0
+
+        with ProcessPoolExecutor(max_workers=self.max_processes, initializer=_init_worker,
+                                 initargs=(worker_counter, WORKER_LOG_DIR, PROFILE_DIR)) as executor:
+            while True:
+                # 依輪替順序填滿可用的行程
+                while len(running) < self.max_processes:
+                    task = self._next_task()
+                    if task is None:
+                        break
+                    board, phase = task
+                    running[self._submit(executor, board, phase)] = board
+
+                line = self.progress_line()
+                print(f"\r{line.ljust(last_width)}", end='', flush=True)
+                last_width = len(line)
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._handle_result(running.pop(future), future)
+
+        print()
+        return self.states
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MOPTT 多看板並行排程器')
+    parser.add_argument('boards', nargs='*', default=BOARD_NAMES, help='要爬取的看板名稱')
+    parser.add_argument('--processes', type=int, default=MAX_PROCESSES, help='同時執行的行程數量上限')
+    parser.add_argument('--slice', type=int, default=SLICE_SIZE, help='每個內容分段處理的文章數')
+    parser.add_argument('--max-scrolls', type=int, default=MAX_SCROLLS, help='預載時的最大滾動次數')
+    parser.add_argument('--incremental', action='store_true', help='增量模式')
+    parser.add_argument('--fresh', action='store_true', help='忽略既有的檢查點')
+    args = parser.parse_args()
+
+    scheduler = BoardScheduler(args.boards, max_processes=args.processes, slice_size=args.slice,
+                               max_scrolls=args.max_scrolls, incremental=args.incremental,
+                               db_file=SQLITE_DB, fresh=args.fresh)
+    states = scheduler.run()
+
+    # 匯出完成的看板為 CSV，並列出失敗的看板
+    store = open_store(db_file=SQLITE_DB) if SQLITE_DB else None
+    for board, state in states.items():
+        phase = state['checkpoint']['phase']
+        if phase == 'failed':
+            print(f"{board} 看板失敗：{state.get('last_error', '')}")
+            continue
+        board_store = store or open_store(f"moptt_{board}.json")
+        board_store.export_csv(board, f"moptt_{board}.csv")
+        if store is None:
+            board_store.close()
+        print(f"{board} 看板：新增 {state['preloaded']} 篇、處理內容 {state['processed']} 篇 → moptt_{board}.csv")
+    if store:
+        store.close()
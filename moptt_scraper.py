@@ -4,25 +4,52 @@ Mobile PTT (MOPTT) 網站爬蟲工具
 使用 Selenium 進行網頁操作和資料擷取
 """
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 import pandas as pd
 import time
 from datetime import datetime
 import json
+from moptt_page_scripts import (CARD_SELECTOR, ScrollProfiler, WaitRecorder, harvest_new_cards, iter_comment_batches,
+                                prune_harvested_cards)
+from moptt_comment_store import CommentStore, collect_comments
+from moptt_watermark import IncrementalCrawl
+from moptt_storage import JsonArticleStore, SqliteArticleStore
+from moptt_http_fetcher import MopttHttpFetcher, TIME_SELECTOR, INTERACTION_SELECTOR, SHOW_ALL_SELECTOR, COMMENT_SELECTOR
+from moptt_post_id import post_time_from_id
+from moptt_driver import TransferMeter, create_driver
+from moptt_browser_session import BrowserPool
+import moptt_metrics
 
 # ====== 設定區域開始 ======
-# Chrome 瀏覽器驅動程式的路徑
-chrome_driver_path = '/Users/aotter/chromedriver-mac-arm64/chromedriver'
+# Chrome 瀏覽器驅動程式的路徑與資源封鎖設定請見 moptt_driver.py
 
 # 要滾動的次數
 MAX_SCROLLS = 500
 
+# 每次滾動後等待新文章卡片出現的最長秒數
+SCROLL_WAIT_TIMEOUT = 3
+
+# 頁面內非同步腳本的逾時秒數（需大於各項等待時間）
+SCRIPT_TIMEOUT = 30
+
+# DOM 修剪模式：None（不修剪）、'blank'（清空已擷取卡片的內容並保留高度）、'detach'（移除已擷取的卡片節點）
+# 長時間滾動時可讓 DOM 大小與每次滾動的成本維持固定
+PRUNE_MODE = None
+
+# 修剪時頁面底部保留的卡片數
+PRUNE_KEEP_CARDS = 20
+
+# 增量模式：依看板水位線只爬取上次之後的新文章
+INCREMENTAL = False
+
+# SQLite 資料庫路徑，設定後以資料庫取代 JSON 進度檔（JSON / CSV 仍會匯出）
+SQLITE_DB = None
+
+# 回應儲存目錄，設定後回應內容分批串流寫入各文章的回應檔（見 moptt_comment_store.py），
+# 文章資料改為只記錄回應數；None 表示回應內容仍內嵌於文章資料的 responses_content
+COMMENT_STORE_DIR = None
+
 # ====== 設定區域結束 ======
 
 
@@ -32,44 +59,70 @@ class MopttScraper:
     負責初始化瀏覽器設定、爬取文章列表、擷取文章內容及相關資訊
     """
     
-    def __init__(self):
+    def __init__(self, driver=None, started_at=None):
         """
         初始化爬蟲設定
         - 設定基礎URL
-        - 配置Chrome瀏覽器選項（無頭模式、安全設定）
-        - 初始化瀏覽器驅動
+        - 以共用工廠初始化瀏覽器驅動（無頭模式、封鎖不需要的資源），或使用外部傳入的暖機驅動
+        - 初始化 HTTP 快速擷取器
+        
+        Args:
+            driver (WebDriver, optional): 外部管理的瀏覽器驅動（例如 BrowserPool 借出的），close 時不會關閉
+            started_at (float, optional): 「啟動到第一篇文章」計時起點（time.perf_counter()），
+                                          使用借出的驅動時應傳入借用前的時間，才會包含啟動 Chrome 的時間
         """
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_article_seconds = None
         self.base_url = "https://moptt.tw"
-        self.options = Options()
-        self.options.add_argument('--headless')  # 啟用無頭模式（背景執行）
-        self.options.add_argument('--no-sandbox')  # 停用沙箱模式以提高穩定性
-        self.options.add_argument('--disable-dev-shm-usage')  # 避免記憶體問題
-        self.driver = webdriver.Chrome(service=Service(chrome_driver_path), options=self.options)
+        self.owns_driver = driver is None
+        self.driver = driver or create_driver()
+        self.driver.set_script_timeout(SCRIPT_TIMEOUT)
+        self.http_fetcher = MopttHttpFetcher()
+        self.wait_recorder = WaitRecorder(scraper='moptt')
+        self.transfer_meter = TransferMeter()
+        self.comment_store = CommentStore(COMMENT_STORE_DIR) if COMMENT_STORE_DIR else None
 
     def get_article_links_and_titles(self):
         """
-        從當前頁面擷取所有文章的連結和標題
+        從當前頁面擷取上次呼叫後新增的文章連結和標題
+        以單次 execute_script 取回所有卡片，已擷取的卡片會在頁面內標記，不會重複回傳
         
         Returns:
             list: 包含文章URL和標題的字典列表
         """
-        articles = self.driver.find_elements(By.CSS_SELECTOR, "div[class*='eQQBIg']")
-        article_data = []
-        for article in articles:
-            try:
-                link = article.find_element(By.CSS_SELECTOR, "a[href*='/p/']")
-                title = article.find_element(By.CSS_SELECTOR, "h3").text
-                article_data.append({
-                    'url': link.get_attribute('href'),
-                    'title': title
-                })
-            except NoSuchElementException:
-                continue
-        return article_data
+        return harvest_new_cards(self.driver)
 
     def get_article_data(self, article_info):
         """
         擷取單篇文章的詳細資訊
+        先以 HTTP 快速擷取，失敗時才改用 Selenium 開啟頁面
+        
+        Args:
+            article_info (dict): 包含文章URL和標題的字典
+            
+        Returns:
+            dict: 包含文章所有相關資訊的字典，若擷取失敗則返回None
+        """
+        with moptt_metrics.stage('http_fetch', scraper='moptt'):
+            result = self.http_fetcher.fetch_article(article_info)
+        if result is not None:
+            if self.comment_store is not None:
+                result.update(collect_comments(self.comment_store, result['url'], [result.pop('responses_content')]))
+            result['fetched_at'] = int(time.time())
+            return result
+
+        self.http_fetcher.record_fallback()
+        moptt_metrics.count('http_fallback', scraper='moptt')
+        result = self.get_article_data_with_selenium(article_info)
+        if result is None:
+            moptt_metrics.count('article_none', scraper='moptt')
+        else:
+            result['fetched_at'] = int(time.time())
+        return result
+
+    def get_article_data_with_selenium(self, article_info):
+        """
+        以 Selenium 擷取單篇文章的詳細資訊
         
         Args:
             article_info (dict): 包含文章URL和標題的字典
@@ -78,60 +131,65 @@ class MopttScraper:
             dict: 包含文章所有相關資訊的字典，若擷取失敗則返回None
         """
         try:
-            self.driver.get(article_info['url'])
+            with moptt_metrics.stage('driver_get', scraper='moptt'):
+                self.driver.get(article_info['url'])
 
-            # 擷取發文時間
-            post_time = ""
+            # 發文時間由文章 ID 取得，只需等待互動數據出現；ID 無法解析時才等待頁面上的時間元素
+            post_time = post_time_from_id(article_info['url'])
             try:
-                time_element = WebDriverWait(self.driver, 3).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.o_pqSZvuHj7qfwrPg7tI time"))
-                )
-                post_time = time_element.get_attribute('datetime')  # 取得ISO8601格式的時間
+                wait_selector = INTERACTION_SELECTOR if post_time else TIME_SELECTOR
+                wait_result = self.wait_recorder.wait(self.driver, 'page_load', wait_selector, 1, 3, 0)
+                if wait_result['timed_out']:
+                    return None
+                if not post_time:
+                    time_element = self.driver.find_element(By.CSS_SELECTOR, TIME_SELECTOR)
+                    post_time = time_element.get_attribute('datetime')  # 取得ISO8601格式的時間
+                self.transfer_meter.record(self.driver)
             except (TimeoutException, NoSuchElementException):
                 return None
 
             # 擷取文章互動數據（讚數、噓數、回應數）
             likes = comments = boos = 0
             try:
-                interaction_divs = self.driver.find_elements(By.CLASS_NAME, "T86VdSgcSk_wVSJ87Jd_")
-                for div in interaction_divs:
-                    icon = div.find_element(By.TAG_NAME, "i")
-                    count_text = div.text.strip()
-                    count = int(count_text) if count_text.isdigit() else 0
-                    icon_class = icon.get_attribute("class") or ""
+                with moptt_metrics.stage('extract_interactions', scraper='moptt'):
+                    interaction_divs = self.driver.find_elements(By.CLASS_NAME, "T86VdSgcSk_wVSJ87Jd_")
+                    for div in interaction_divs:
+                        icon = div.find_element(By.TAG_NAME, "i")
+                        count_text = div.text.strip()
+                        count = int(count_text) if count_text.isdigit() else 0
+                        icon_class = icon.get_attribute("class") or ""
                     
-                    # 根據圖示類別判斷互動類型
-                    if "fa-thumbs-up" in icon_class:
-                        likes = count
-                    elif "fa-thumbs-down" in icon_class:
-                        boos = count
-                    elif "fa-comment-dots" in icon_class:
-                        comments = count
+                        # 根據圖示類別判斷互動類型
+                        if "fa-thumbs-up" in icon_class:
+                            likes = count
+                        elif "fa-thumbs-down" in icon_class:
+                            boos = count
+                        elif "fa-comment-dots" in icon_class:
+                            comments = count
             except Exception:
                 pass
 
             # 擷取文章回應內容
-            comments_content = []
+            comment_fields = {} if self.comment_store else {'responses_content': []}
             try:
                 # 嘗試點擊「顯示全部回應」按鈕
                 try:
-                    show_all_button = WebDriverWait(self.driver, 2).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "div.FEfFxCwDtx6IcnHAFaMR"))
-                    )
-                    show_all_button.click()
-                    # 等待回應載入完成
-                    WebDriverWait(self.driver, 2).until(
-                        EC.presence_of_element_located((By.CLASS_NAME, "qIm88EMEzWPkVVqwCol0"))
-                    )
+                    # 等待按鈕或回應其中之一出現即可判斷，不必等滿逾時時間
+                    self.wait_recorder.wait(self.driver, 'comments', f"{SHOW_ALL_SELECTOR}, {COMMENT_SELECTOR}", 1, 2, 2)
+                    with moptt_metrics.stage('show_all', scraper='moptt'):
+                        show_all_buttons = self.driver.find_elements(By.CSS_SELECTOR, SHOW_ALL_SELECTOR)
+                        if show_all_buttons:
+                            comment_count = len(self.driver.find_elements(By.CSS_SELECTOR, COMMENT_SELECTOR))
+                            show_all_buttons[0].click()
+                            # 等待新的回應載入完成
+                            self.wait_recorder.wait(self.driver, 'show_all', COMMENT_SELECTOR, comment_count + 1, 2, 2)
                 except:
                     pass  # 若無「顯示全部」按鈕則略過
                 
-                # 擷取所有回應內容
-                comment_spans = self.driver.find_elements(By.CLASS_NAME, "qIm88EMEzWPkVVqwCol0")
-                for span in comment_spans:
-                    comment_text = span.text.strip()
-                    if comment_text:
-                        comments_content.append(comment_text)
+                # 分批擷取所有回應內容（每批一次 WebDriver 往返）
+                with moptt_metrics.stage('extract_comments', scraper='moptt'):
+                    comment_fields = collect_comments(self.comment_store, article_info['url'],
+                                                      iter_comment_batches(self.driver, COMMENT_SELECTOR))
             except:
                 pass
 
@@ -143,7 +201,7 @@ class MopttScraper:
                 'likes': likes,
                 'responses': comments,
                 'boos': boos,
-                'responses_content': comments_content
+                **comment_fields
             }
             
             return result
@@ -151,58 +209,113 @@ class MopttScraper:
             print(f"擷取文章資料時發生錯誤: {str(e)}")
             return None
 
-    def scrape_board(self, board_url, max_scrolls=500, progress_file=None):
+    def scrape_board(self, board_url, max_scrolls=500, progress_file=None, incremental=False, store=None,
+                     prune_mode=PRUNE_MODE):
         """
-        爬取指定看板的文章
+        爬取指定看板的文章（預載文章列表後處理文章內容）
         
         Args:
             board_url (str): 看板URL
             max_scrolls (int): 最大滾動次數
             progress_file (str): 進度檔案路徑，用於儲存爬取進度
+            incremental (bool): 增量模式，依看板水位線只滾動到已爬取過的發文時間為止
+            store (ArticleStore, optional): 文章儲存，指定時取代 progress_file
+            prune_mode (str, optional): DOM 修剪模式，'blank'、'detach' 或 None
             
         Returns:
             list: 包含所有爬取到的文章資料的列表
         """
+        board = board_url.rstrip('/').split('/')[-1]
+        
+        if store is None:
+            store = open_progress_store(progress_file)
+        
+        self.preload_board(board_url, store, max_scrolls, incremental, prune_mode)
+        
+        print("\r完成預載，開始處理文章內容", end='')
+        self.process_preloaded(board, store)
+        
+        # 將進度寫成最終狀態（JSON 儲存會把日誌壓縮成最終的 JSON 檔）
+        try:
+            with moptt_metrics.stage('finalize', scraper='moptt'):
+                store.finalize()
+        except Exception as e:
+            print(f"\r壓縮進度日誌時發生錯誤: {str(e)}", end='')
+        
+        all_data = store.load_articles(board)
+        print(f"\r爬取完成，共處理 {len(all_data)} 篇文章 | {self.http_fetcher.summary()}", end='')
+        print(f"\n等待時間：{self.wait_recorder.summary()}")
+        print(f"Selenium 頁面傳輸量：{self.transfer_meter.summary()}")
+        if self.first_article_seconds is not None:
+            print(f"啟動到第一篇文章：{self.first_article_seconds:.2f} 秒")
+        return all_data
+
+    def preload_board(self, board_url, store, max_scrolls=500, incremental=False, prune_mode=PRUNE_MODE):
+        """
+        預載階段：滾動看板頁，將新文章以預載狀態寫入文章儲存
+        
+        Args:
+            board_url (str): 看板URL
+            store (ArticleStore): 文章儲存
+            max_scrolls (int): 最大滾動次數
+            incremental (bool): 增量模式，依看板水位線只滾動到已爬取過的發文時間為止
+            prune_mode (str, optional): DOM 修剪模式，'blank'、'detach' 或 None
+            
+        Returns:
+            int: 本次新增的預載文章數
+        """
         print(f"\r開始爬取 {board_url}", end='')
         print(f"\r設定滾動次數: {max_scrolls} 次", end='')
+        board = board_url.rstrip('/').split('/')[-1]
         
         # 載入之前的爬取進度（如果有的話）
-        all_data = []
-        visited_urls = set()
-        last_article_url = None
         found_last_article = False
-
-        if progress_file:
-            try:
-                with open(progress_file, 'r', encoding='utf-8') as f:
-                    all_data = json.load(f)
-                    visited_urls = {item.get('url') for item in all_data}
-                    # 取得上次爬取的最後一篇文章URL
-                    if all_data:
-                        last_article_url = all_data[-1].get('url')
-                print(f"\r已載入 {len(all_data)} 篇文章的進度", end='')
-            except FileNotFoundError:
-                print("\r找不到進度檔案，從頭開始爬取", end='')
-            except Exception as e:
-                print(f"\r載入進度檔案時發生錯誤: {str(e)}", end='')
+        article_count = store.count(board)
+        initial_count = article_count
+        # 取得上次爬取的最後一篇文章URL
+        last_article_url = store.last_url(board)
+        print(f"\r已載入 {article_count} 篇文章的進度", end='')
         
-        self.driver.get(board_url)
+        # 增量模式：已有水位線時不再從頂端尋找上次的最後一篇文章
+        incremental_crawl = None
+        if incremental:
+            incremental_crawl = IncrementalCrawl(board, known_newest_epoch=store.newest_epoch(board))
+            if incremental_crawl.watermark is not None:
+                last_article_url = None
+                print(f"\r增量模式：水位線 {incremental_crawl.watermark}", end='')
+        
+        with moptt_metrics.stage('board_load', scraper='moptt'):
+            self.driver.get(board_url)
         
         # 透過滾動載入更多文章
         print("\r=== 開始預載文章 ===", end='')
+        card_count = self.wait_recorder.wait(self.driver, 'page_load', CARD_SELECTOR, 1, SCROLL_WAIT_TIMEOUT, 0)['count']
         last_height = self.driver.execute_script("return document.body.scrollHeight")
         scroll_count = 0
+        scroll_profiler = ScrollProfiler()
         
+        reached_end = False
         while scroll_count < max_scrolls:
             scroll_count += 1
-            print(f"\r預載進度: {scroll_count}/{max_scrolls} | 已載入文章數: {len(all_data)}", end='')
+            scroll_started = time.perf_counter()
+            print(f"\r預載進度: {scroll_count}/{max_scrolls} | 已載入文章數: {article_count}", end='')
             
-            # 滾動頁面
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.5)  # 等待新內容載入
+            # 滾動頁面並在頁面內等待新的文章卡片出現（取代固定 0.5 秒的 sleep）
+            card_count = self.wait_recorder.wait(
+                self.driver, 'scroll', CARD_SELECTOR, card_count + 1, SCROLL_WAIT_TIMEOUT, 0.5, scroll_first=True
+            )['count']
             
             # 取得目前頁面上的所有文章
-            current_articles = self.get_article_links_and_titles()
+            with moptt_metrics.stage('harvest', scraper='moptt'):
+                current_articles = self.get_article_links_and_titles()
+            
+            # 修剪已擷取的卡片並記錄此次滾動的耗時與頁面狀態
+            with moptt_metrics.stage('prune', scraper='moptt'):
+                page_stats = prune_harvested_cards(self.driver, prune_mode, PRUNE_KEEP_CARDS)
+            card_count = page_stats['cards']
+            scroll_seconds = time.perf_counter() - scroll_started
+            scroll_profiler.record(scroll_seconds, page_stats)
+            moptt_metrics.registry.observe('scroll', scroll_seconds, scraper='moptt')
             
             # 檢查是否找到上次的最後一篇文章
             if last_article_url and not found_last_article:
@@ -215,73 +328,121 @@ class MopttScraper:
                     continue  # 如果還沒找到上次的文章，就繼續滾動
             
             # 處理新的文章
-            for i, article in enumerate(current_articles):
-                if article['url'] not in visited_urls:
-                    visited_urls.add(article['url'])
-                    # 將基本資訊加入all_data
+            for article in current_articles:
+                if not store.has_url(article['url']):
+                    article_count += 1
+                    # 將基本資訊存入進度
                     article_basic = {
                         'url': article['url'],
                         'title': article['title'],
-                        'article_number': len(all_data) + 1,
+                        'article_number': article_count,
                         'preloaded': True  # 標記為預載狀態
                     }
-                    all_data.append(article_basic)
                     
                     # 儲存進度
-                    if progress_file:
-                        try:
-                            with open(progress_file, 'w', encoding='utf-8') as f:
-                                json.dump(all_data, f, ensure_ascii=False, indent=2)
-                            print(f"\r預載文章 {len(all_data)}: {article['title'][:30]}{'...' if len(article['title']) > 30 else ''}", end='')
-                        except Exception as e:
-                            print(f"\r儲存進度時發生錯誤: {str(e)}", end='')
+                    try:
+                        with moptt_metrics.stage('save', scraper='moptt'):
+                            store.upsert(article_basic)
+                        print(f"\r預載文章 {article_count}: {article['title'][:30]}{'...' if len(article['title']) > 30 else ''}", end='')
+                    except Exception as e:
+                        print(f"\r儲存進度時發生錯誤: {str(e)}", end='')
+            
+            # 增量模式下連續滾動到水位線之前的文章時停止
+            if incremental_crawl and incremental_crawl.should_stop(current_articles):
+                print("\r已滾動到水位線之前的文章，停止滾動", end='')
+                reached_end = True
+                break
             
             # 檢查頁面高度是否有變化
             new_height = self.driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
                 print("\r頁面已到底部，停止滾動", end='')
+                reached_end = True
                 break
             last_height = new_height
         
-        print("\r完成預載，開始處理文章內容", end='')
+        if incremental_crawl:
+            incremental_crawl.finish(reached_end)
         
-        # 開始處理已載入的文章
-        total_articles = len(all_data)
+        print(f"\n滾動效能：{scroll_profiler.summary()}")
+        return article_count - initial_count
+
+    def process_preloaded(self, board, store, limit=None, exclude=()):
+        """
+        內容階段：處理標記為預載的文章，擷取詳細資訊並寫回文章儲存
+        
+        Args:
+            board (str): 看板名稱
+            store (ArticleStore): 文章儲存
+            limit (int, optional): 本次最多處理的篇數，None 表示全部處理（供排程器分段處理）
+            exclude (iterable): 本次略過的文章 URL（例如先前已擷取失敗的文章）
+            
+        Returns:
+            tuple: (處理篇數, 擷取失敗的文章 URL 列表)
+        """
+        excluded = set(exclude)
+        preloaded_articles = [article for article in store.preloaded_articles(board) if article['url'] not in excluded]
+        if limit is not None:
+            preloaded_articles = preloaded_articles[:limit]
+        total_articles = len(preloaded_articles)
+        failed_urls = []
         
         # 逐一處理文章
-        for i, article_info in enumerate(all_data):
-            if article_info.get('preloaded', False):  # 只處理標記為預載的文章
-                print(f"\r處理進度: {i+1}/{total_articles} | 當前: {article_info['title'][:30]}{'...' if len(article_info['title']) > 30 else ''}", end='')
-                
-                article_data = self.get_article_data(article_info)
+        for i, article_info in enumerate(preloaded_articles):
+            print(f"\r處理進度: {i+1}/{total_articles} | 當前: {article_info['title'][:30]}{'...' if len(article_info['title']) > 30 else ''}", end='')
+            
+            article_data = self.get_article_data(article_info)
+            
+            if article_data:
+                # 更新文章資料
+                article_data['article_number'] = article_info['article_number']
                 
-                if article_data:
-                    # 更新文章資料
-                    article_data['article_number'] = article_info['article_number']
-                    all_data[i] = article_data
-                    
-                    # 儲存進度
-                    if progress_file:
-                        try:
-                            with open(progress_file, 'w', encoding='utf-8') as f:
-                                json.dump(all_data, f, ensure_ascii=False, indent=2)
-                        except Exception as e:
-                            print(f"\r儲存進度時發生錯誤: {str(e)}", end='')
+                # 儲存進度
+                try:
+                    with moptt_metrics.stage('save', scraper='moptt'):
+                        store.upsert(article_data)
+                    if self.first_article_seconds is None:
+                        self.first_article_seconds = time.perf_counter() - self.started_at
+                except Exception as e:
+                    print(f"\r儲存進度時發生錯誤: {str(e)}", end='')
+            else:
+                failed_urls.append(article_info['url'])
         
-        print(f"\r爬取完成，共處理 {len(all_data)} 篇文章", end='')
-        return all_data
+        return total_articles, failed_urls
 
     def close(self):
-        """關閉瀏覽器驅動程式"""
-        self.driver.quit()
+        """關閉瀏覽器驅動程式（僅限自行建立的）與 HTTP 連線池"""
+        if self.owns_driver:
+            self.driver.quit()
+        self.http_fetcher.close()
+
+
+def open_progress_store(progress_file):
+    """
+    開啟看板的 JSON 進度儲存，載入上次壓縮的 JSON 檔並重播尚未壓縮的日誌
+    
+    Args:
+        progress_file (str): 進度檔案路徑
+        
+    Returns:
+        JsonArticleStore: 文章儲存，載入失敗時為只存在記憶體中的儲存
+    """
+    try:
+        return JsonArticleStore(progress_file)
+    except Exception as e:
+        print(f"\r載入進度檔案時發生錯誤: {str(e)}", end='')
+        return JsonArticleStore()
 
 
 if __name__ == "__main__":
     # 您可以在此設定要爬取的看板名稱清單
     board_names = ["Beauty", "marvel", "NBA"]
     
-    # 初始化爬蟲物件
-    scraper = MopttScraper()
+    moptt_metrics.configure(job='moptt_scraper')
+    
+    # 以暖機的瀏覽器跨看板重複使用，超過頁數或記憶體上限時於看板之間回收重建
+    pool = BrowserPool()
+    store = SqliteArticleStore(SQLITE_DB) if SQLITE_DB else None
     
     # 迴圈爬取多個看板
     for board_name in board_names:
@@ -291,7 +452,13 @@ if __name__ == "__main__":
         
         try:
             print(f"\r開始爬取看板：{board_name} 並滾動 {MAX_SCROLLS} 次", end='')
-            data = scraper.scrape_board(board_url, max_scrolls=MAX_SCROLLS, progress_file=json_file)
+            leased_at = time.perf_counter()
+            with pool.lease() as driver:
+                scraper = MopttScraper(driver=driver, started_at=leased_at)
+                try:
+                    data = scraper.scrape_board(board_url, max_scrolls=MAX_SCROLLS, progress_file=json_file, incremental=INCREMENTAL, store=store)
+                finally:
+                    scraper.close()
             
             if data:
                 # 將資料儲存為JSON格式
@@ -319,6 +486,10 @@ if __name__ == "__main__":
             print(f"\r執行過程中發生錯誤: {str(e)}", end='')
     
     # 爬取結束後關閉瀏覽器
-    scraper.close()
+    print(f"\r瀏覽器：{pool.summary()}")
+    pool.close()
+    if store:
+        store.close()
+    moptt_metrics.report()
     print("\r瀏覽器已關閉，程式結束", end='')
     print()  # 最後加入一個換行
@@ -0,0 +1,628 @@
+"""
+MOPTT 文章全文檢索索引
+對爬取的標題與回應建立磁碟上的反向索引：中日韓文字以單字與相鄰兩字（bigram）為詞，
+英數字以整個單字為詞（不分大小寫，並經 NFKC 正規化）。索引由多個不可變的分段（segment）組成，
+每次 commit 將新增或變更的文章寫成一個新分段，被取代的舊文章以墓碑（tombstone）標記，
+分段過多時合併成一個；分段的詞彙表與倒排列表以 mmap 開啟，查詢時只讀取用到的部分。
+查詢結果為包含查詢中所有詞的文章網址，中日韓文字查詢以 bigram 交集判斷，
+可能包含各 bigram 都出現但不相連的文章
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+
+from moptt_comment_store import COMMENT_STORE_DIR, CommentStore
+from moptt_data_converter import iter_json_array
+from moptt_post_id import parse_post_board, parse_post_epoch
+from moptt_storage import SqliteArticleStore
+
+# ====== 設定區域開始 ======
+# 索引目錄
+SEARCH_INDEX_DIR = 'moptt_search_index'
+
+# 建立索引的來源檔案（不是文章陣列的檔案會被略過）
+SOURCE_PATTERN = 'moptt_*.json'
+
+# SQLite 資料庫路徑，設定後改由資料庫中的所有看板建立索引
+SQLITE_DB = None
+
+# 累積多少篇新增或變更的文章寫成一個分段
+COMMIT_EVERY = 5000
+
+# 分段數超過此值時合併
+MAX_SEGMENTS = 8
+
+# 效能測試的預設查詢
+BENCH_QUERIES = ['陳子豪', '味全', '台鋼', '滷肉飯', '岸田', 'MLB', '12強', '大聯盟 合約']
+# ====== 設定區域結束 ======
+
+MANIFEST_FILE = 'manifest.json'
+
+# 平假名、片假名、注音、中日韓統一表意文字（含擴充 A 與相容字）、韓文音節
+CJK_RANGES = '\u3040-\u30ff\u3100-\u312f\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+TOKEN_PATTERN = re.compile(f'[{CJK_RANGES}]+|[0-9a-z]+')
+CJK_PATTERN = re.compile(f'[{CJK_RANGES}]')
+
+# 分段詞彙資訊每列：(詞在 .terms 中的起始位元組, 倒排列表起始位置, 倒排列表長度)
+TERM_INFO_DTYPE = np.int64
+POSTING_DTYPE = np.uint32
+
+
+def normalize_text(text):
+    """NFKC 正規化並轉為小寫（全形英數字轉為半形）"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text):
+    """
+    取得文字中的所有索引詞
+
+    Args:
+        text (str): 標題或回應
+
+    Returns:
+        set: 中日韓文字的單字與 bigram，以及英數字單字
+    """
+    terms = set()
+    for run in TOKEN_PATTERN.findall(normalize_text(text)):
+        if CJK_PATTERN.match(run):
+            terms.update(run)
+            terms.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.add(run)
+    return terms
+
+
+def query_terms(query):
+    """
+    取得查詢需要比對的詞：兩字以上的中日韓文字只用 bigram，單一字用單字
+
+    Args:
+        query (str): 查詢字串，以空白分隔的多個關鍵字皆需出現
+
+    Returns:
+        list: 詞列表（去除重複）
+    """
+    terms = []
+    for run in TOKEN_PATTERN.findall(normalize_text(query)):
+        if CJK_PATTERN.match(run) and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return list(dict.fromkeys(terms))
+
+
+def article_fingerprint(title, comments):
+    """
+    取得文章內容指紋，用於判斷文章是否需要重新索引
+
+    Returns:
+        str: 16 位十六進位字串
+    """
+    digest = hashlib.sha1((title or '').encode('utf-8'))
+    for comment in comments:
+        digest.update(b'\x1f')
+        digest.update(str(comment).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _mmap_array(path, dtype):
+    """以 mmap 開啟陣列檔案（空檔案返回空陣列）"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class _Segment:
+    """
+    單一索引分段（唯讀）
+    檔案：<名稱>.terms（依位元組排序的詞，UTF-8 串接）、<名稱>.tinfo（詞彙資訊）、
+    <名稱>.post（uint32 分段內文件編號）、<名稱>.docs（每行 網址<TAB>指紋）
+    """
+
+    def __init__(self, index_dir, meta):
+        """
+        Args:
+            index_dir (str): 索引目錄
+            meta (dict): 清單中的分段資訊 {name, base, count}
+        """
+        self.name = meta['name']
+        self.base = meta['base']
+        prefix = os.path.join(index_dir, self.name)
+        self._terms_file = open(prefix + '.terms', 'rb')
+        size = os.path.getsize(prefix + '.terms')
+        self.terms = mmap.mmap(self._terms_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.info = _mmap_array(prefix + '.tinfo', TERM_INFO_DTYPE).reshape(-1, 3)
+        self.postings_data = _mmap_array(prefix + '.post', POSTING_DTYPE)
+        with open(prefix + '.docs', 'r', encoding='utf-8') as f:
+            self.docs = [line.rstrip('\n').split('\t') for line in f]
+
+    @property
+    def term_count(self):
+        """詞數（詞彙資訊最後一列為結尾標記）"""
+        return max(len(self.info) - 1, 0)
+
+    def term_at(self, index):
+        """取得第 index 個詞的位元組"""
+        return bytes(self.terms[int(self.info[index, 0]):int(self.info[index + 1, 0])])
+
+    def postings(self, term):
+        """
+        以二分搜尋取得詞的倒排列表
+
+        Args:
+            term (str): 詞
+
+        Returns:
+            numpy.ndarray: 已排序的分段內文件編號（直接引用 mmap，不複製），找不到時為空陣列
+        """
+        key = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.term_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.term_count and self.term_at(low) == key:
+            start, count = int(self.info[low, 1]), int(self.info[low, 2])
+            return self.postings_data[start:start + count]
+        return self.postings_data[:0]
+
+    def iter_postings(self):
+        """依詞的順序逐一產生 (詞, 倒排列表)"""
+        for index in range(self.term_count):
+            start, count = int(self.info[index, 1]), int(self.info[index, 2])
+            yield self.term_at(index).decode('utf-8'), self.postings_data[start:start + count]
+
+    def close(self):
+        """關閉 mmap"""
+        if isinstance(self.terms, mmap.mmap):
+            self.terms.close()
+        self._terms_file.close()
+        self.info = self.postings_data = None
+
+
+def _write_segment(index_dir, name, postings, docs):
+    """
+    寫出一個分段（先寫暫存檔再改名，清單更新前不會被讀取）
+
+    Args:
+        index_dir (str): 索引目錄
+        name (str): 分段名稱
+        postings (dict): {詞: 已排序的分段內文件編號列表}
+        docs (list): [(網址, 指紋), ...]，索引即分段內文件編號
+    """
+    prefix = os.path.join(index_dir, name)
+    # UTF-8 位元組順序與字元碼位順序相同，排序後可直接以位元組二分搜尋
+    terms = sorted(postings)
+    info = np.zeros((len(terms) + 1, 3), dtype=TERM_INFO_DTYPE)
+    term_offset = posting_offset = 0
+    with open(prefix + '.terms.tmp', 'wb') as terms_file, open(prefix + '.post.tmp', 'wb') as post_file:
+        for index, term in enumerate(terms):
+            encoded = term.encode('utf-8')
+            ids = np.asarray(postings[term], dtype=POSTING_DTYPE)
+            info[index] = (term_offset, posting_offset, len(ids))
+            terms_file.write(encoded)
+            post_file.write(ids.tobytes())
+            term_offset += len(encoded)
+            posting_offset += len(ids)
+    info[len(terms)] = (term_offset, posting_offset, 0)
+    info.tofile(prefix + '.tinfo.tmp')
+    with open(prefix + '.docs.tmp', 'w', encoding='utf-8') as f:
+        f.writelines(f"{url}\t{fingerprint}\n" for url, fingerprint in docs)
+    for extension in ('.terms', '.post', '.tinfo', '.docs'):
+        os.replace(prefix + extension + '.tmp', prefix + extension)
+
+
+class SearchIndex:
+    """
+    全文檢索索引類別
+    add 將新增或內容有變更的文章暫存在記憶體，commit 時寫成新的分段並更新清單；
+    文件編號在所有分段間連續（分段 base + 分段內編號），被取代的文章記錄在清單的 deleted 中
+    """
+
+    def __init__(self, index_dir=SEARCH_INDEX_DIR, max_segments=MAX_SEGMENTS):
+        """
+        開啟（或建立）索引
+
+        Args:
+            index_dir (str): 索引目錄
+            max_segments (int): 分段數超過此值時於 commit 後合併
+        """
+        self.index_dir = index_dir
+        self.max_segments = max_segments
+        os.makedirs(index_dir, exist_ok=True)
+        try:
+            with open(os.path.join(index_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {'next_doc': 0, 'next_segment': 0, 'segments': [], 'deleted': []}
+        self.segments = [_Segment(index_dir, meta) for meta in self.manifest['segments']]
+        self._pending = {}
+        self._load_docs()
+
+    def _load_docs(self):
+        """
+        由各分段建立 文件編號 → 網址 / 發文時間 / 看板代碼 的陣列，
+        以及 網址 → (文件編號, 指紋) 的對照（查詢結果的排序與看板篩選皆以陣列運算完成）
+        """
+        self.deleted = np.array(sorted(self.manifest['deleted']), dtype=np.int64)
+        deleted = set(self.manifest['deleted'])
+        size = self.manifest['next_doc']
+        self.urls = [''] * size
+        self.epochs = np.zeros(size, dtype=np.int64)
+        self.boards = np.full(size, -1, dtype=np.int32)
+        self.board_codes = {}
+        self.docs = {}
+        for segment in self.segments:
+            for local_id, (url, fingerprint) in enumerate(segment.docs):
+                doc_id = segment.base + local_id
+                self.urls[doc_id] = url
+                self.epochs[doc_id] = parse_post_epoch(url) or 0
+                self.boards[doc_id] = self.board_codes.setdefault(parse_post_board(url), len(self.board_codes))
+                if doc_id not in deleted:
+                    self.docs[url] = (doc_id, fingerprint)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, url, title, comments=(), fingerprint=None):
+        """
+        加入或更新一篇文章（內容未變更時略過）
+
+        Args:
+            url (str): 文章網址
+            title (str): 標題
+            comments (iterable): 回應文字
+            fingerprint (str, optional): 內容指紋，未指定時由標題與回應計算
+
+        Returns:
+            bool: 是否需要寫入（新文章或內容有變更）
+        """
+        comments = list(comments or [])
+        fingerprint = fingerprint or article_fingerprint(title, comments)
+        indexed = self.docs.get(url)
+        if (indexed and indexed[1] == fingerprint) or self._pending.get(url, (None,))[0] == fingerprint:
+            return False
+        terms = tokenize(title)
+        for comment in comments:
+            terms |= tokenize(str(comment))
+        self._pending[url] = (fingerprint, terms)
+        return True
+
+    @property
+    def pending_count(self):
+        """尚未 commit 的文章數"""
+        return len(self._pending)
+
+    def commit(self):
+        """
+        將暫存的文章寫成新分段，分段過多時合併
+
+        Returns:
+            int: 寫入的文章數
+        """
+        if not self._pending:
+            return 0
+        base = self.manifest['next_doc']
+        name = f"seg_{self.manifest['next_segment']:06d}"
+        postings = {}
+        docs = []
+        for local_id, (url, (fingerprint, terms)) in enumerate(self._pending.items()):
+            docs.append((url, fingerprint))
+            for term in terms:
+                postings.setdefault(term, []).append(local_id)
+        _write_segment(self.index_dir, name, postings, docs)
+
+        replaced = [self.docs[url][0] for url in self._pending if url in self.docs]
+        self.manifest['segments'].append({'name': name, 'base': base, 'count': len(docs)})
+        self.manifest['deleted'].extend(replaced)
+        self.manifest['next_doc'] = base + len(docs)
+        self.manifest['next_segment'] += 1
+        self._save_manifest()
+
+        self.segments.append(_Segment(self.index_dir, self.manifest['segments'][-1]))
+        written = len(self._pending)
+        self._pending = {}
+        self._load_docs()
+        if len(self.segments) > self.max_segments:
+            self.merge()
+        return written
+
+    def merge(self):
+        """
+        將所有分段合併為一個，並移除被取代的文章（文件編號重新從 0 開始）
+        """
+        if len(self.segments) <= 1 and not self.manifest['deleted']:
+            return
+        deleted = set(self.manifest['deleted'])
+        docs = []
+        postings = {}
+        for segment in self.segments:
+            # 分段內編號 → 合併後編號，被取代的文章為 -1
+            remap = np.full(len(segment.docs), -1, dtype=np.int64)
+            for local_id, (url, fingerprint) in enumerate(segment.docs):
+                if segment.base + local_id not in deleted:
+                    remap[local_id] = len(docs)
+                    docs.append((url, fingerprint))
+            for term, ids in segment.iter_postings():
+                mapped = remap[ids]
+                mapped = mapped[mapped >= 0]
+                if len(mapped):
+                    postings.setdefault(term, []).append(mapped)
+        postings = {term: np.concatenate(parts) for term, parts in postings.items()}
+
+        name = f"seg_{self.manifest['next_segment']:06d}"
+        _write_segment(self.index_dir, name, postings, docs)
+        old_names = [segment.name for segment in self.segments]
+        for segment in self.segments:
+            segment.close()
+        self.manifest.update({'next_doc': len(docs), 'next_segment': self.manifest['next_segment'] + 1,
+                              'segments': [{'name': name, 'base': 0, 'count': len(docs)}], 'deleted': []})
+        self._save_manifest()
+        for old_name in old_names:
+            for extension in ('.terms', '.post', '.tinfo', '.docs'):
+                os.remove(os.path.join(self.index_dir, old_name + extension))
+        self.segments = [_Segment(self.index_dir, self.manifest['segments'][0])]
+        self._load_docs()
+
+    def _save_manifest(self):
+        """寫入清單（先寫到暫存檔再取代，清單即為 commit 點）"""
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(path + '.tmp', path)
+
+    def search_ids(self, query):
+        """
+        取得包含查詢中所有詞的文件編號
+
+        Args:
+            query (str): 查詢字串
+
+        Returns:
+            numpy.ndarray: 已排序的文件編號（不含被取代的文章）
+        """
+        terms = query_terms(query)
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        results = []
+        for segment in self.segments:
+            lists = sorted((segment.postings(term) for term in terms), key=len)
+            if not len(lists[0]):
+                continue
+            matched = lists[0]
+            for ids in lists[1:]:
+                matched = np.intersect1d(matched, ids, assume_unique=True)
+                if not len(matched):
+                    break
+            if len(matched):
+                results.append(matched.astype(np.int64) + segment.base)
+        if not results:
+            return np.zeros(0, dtype=np.int64)
+        doc_ids = np.concatenate(results)
+        if len(self.deleted):
+            doc_ids = doc_ids[~np.isin(doc_ids, self.deleted, assume_unique=True)]
+        return doc_ids
+
+    def search(self, query, board=None, limit=None):
+        """
+        查詢包含所有關鍵字的文章
+
+        Args:
+            query (str): 查詢字串，例如 '陳子豪' 或 '大聯盟 合約'
+            board (str, optional): 只取此看板的文章
+            limit (int, optional): 最多返回幾篇
+
+        Returns:
+            list: 文章網址，依發文時間由新到舊排列
+        """
+        doc_ids = self.search_ids(query)
+        if board is not None:
+            doc_ids = doc_ids[self.boards[doc_ids] == self.board_codes.get(board, -2)]
+        doc_ids = doc_ids[np.argsort(-self.epochs[doc_ids], kind='stable')][:limit]
+        return [self.urls[doc_id] for doc_id in doc_ids.tolist()]
+
+    def close(self):
+        """關閉所有分段"""
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _iter_articles(pattern, db_file):
+    """
+    逐篇讀取來源文章：設定資料庫時讀取資料庫中的所有看板，
+    否則讀取符合 pattern 的 JSON 檔，不是文章陣列的檔案（例如其他工具的狀態檔）印出警告後略過
+    """
+    if db_file:
+        store = SqliteArticleStore(db_file)
+        try:
+            for board in store.boards():
+                yield from store.load_articles(board)
+        finally:
+            store.close()
+        return
+    for path in sorted(glob.glob(pattern)):
+        try:
+            yield from iter_json_array(path)
+        except ValueError as e:
+            print(f"略過 {path}：{e}")
+
+
+def iter_corpus(pattern=SOURCE_PATTERN, comment_store_dir=COMMENT_STORE_DIR, db_file=SQLITE_DB):
+    """
+    逐篇讀取爬取結果中的標題與回應
+
+    Args:
+        pattern (str): 來源 JSON 檔案的 glob 樣式
+        comment_store_dir (str, optional): 回應儲存目錄，文章資料中沒有 responses_content 時由此讀取
+        db_file (str, optional): SQLite 資料庫路徑，指定時忽略 pattern
+
+    Yields:
+        tuple: (網址, 標題, 回應列表)
+    """
+    comment_store = CommentStore(comment_store_dir) if comment_store_dir and os.path.isdir(comment_store_dir) else None
+    for record in _iter_articles(pattern, db_file):
+        url = record.get('url') if isinstance(record, dict) else None
+        if not url:
+            continue
+        comments = record.get('responses_content')
+        if comments is None and comment_store is not None:
+            comments = comment_store.load(url)
+        yield url, record.get('title') or '', comments or []
+
+
+def update_index(index, corpus, commit_every=COMMIT_EVERY):
+    """
+    以爬取結果增量更新索引：只重新索引新增或內容有變更的文章
+
+    Args:
+        index (SearchIndex): 索引
+        corpus (iterable): (網址, 標題, 回應列表)
+        commit_every (int): 累積多少篇寫成一個分段
+
+    Returns:
+        dict: {'indexed': 寫入的文章數, 'unchanged': 略過的文章數}
+    """
+    indexed = unchanged = 0
+    for url, title, comments in corpus:
+        if not index.add(url, title, comments):
+            unchanged += 1
+            continue
+        if index.pending_count >= commit_every:
+            indexed += index.commit()
+    indexed += index.commit()
+    return {'indexed': indexed, 'unchanged': unchanged}
+
+
+def naive_search(documents, query):
+    """
+    逐篇子字串比對（效能測試的對照組）
+
+    Args:
+        documents (list): [(網址, 正規化後的標題與回應文字), ...]
+        query (str): 查詢字串，以空白分隔的多個關鍵字皆需出現
+
+    Returns:
+        list: 符合的文章網址
+    """
+    keywords = normalize_text(query).split()
+    return [url for url, text in documents if all(keyword in text for keyword in keywords)]
+
+
+def _best_ms(function, repeat):
+    """執行 repeat 次並返回最短耗時（毫秒）與結果"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark(index, corpus, queries=BENCH_QUERIES, repeat=5):
+    """
+    比較索引查詢與逐篇子字串掃描的耗時與結果
+
+    Args:
+        index (SearchIndex): 已建立的索引
+        corpus (iterable): (網址, 標題, 回應列表)
+        queries (list): 查詢字串
+        repeat (int): 每個查詢重複次數（取最短耗時）
+
+    Returns:
+        list: 每個查詢的 {query, scan_ms, index_ms, scan_hits, index_hits, recall}
+    """
+    started = time.perf_counter()
+    documents = [(url, normalize_text('\n'.join([title, *map(str, comments)]))) for url, title, comments in corpus]
+    print(f"對照組載入 {len(documents)} 篇文章耗時 {(time.perf_counter() - started) * 1000:.0f} 毫秒")
+
+    results = []
+    for query in queries:
+        scan_ms, scan_hits = _best_ms(lambda: naive_search(documents, query), repeat)
+        index_ms, index_hits = _best_ms(lambda: index.search(query), repeat)
+        expected = set(scan_hits)
+        results.append({
+            'query': query,
+            'scan_ms': scan_ms,
+            'index_ms': index_ms,
+            'scan_hits': len(scan_hits),
+            'index_hits': len(index_hits),
+            'recall': len(expected & set(index_hits)) / len(expected) if expected else 1.0,
+        })
+    return results
+
+
+def format_benchmark(results):
+    """
+    格式化效能測試結果
+
+    Returns:
+        str: 每個查詢一行的比較表
+    """
+    lines = [f"{'查詢':<12} | {'掃描(毫秒)':>10} | {'索引(毫秒)':>10} | {'加速':>7} | {'掃描筆數':>8} | {'索引筆數':>8} | {'召回率':>6}"]
+    for result in results:
+        speedup = result['scan_ms'] / result['index_ms'] if result['index_ms'] else float('inf')
+        lines.append(f"{result['query']:<12} | {result['scan_ms']:>10.2f} | {result['index_ms']:>10.3f} | "
+                     f"{speedup:>6.0f}x | {result['scan_hits']:>8} | {result['index_hits']:>8} | {result['recall']:>6.0%}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MOPTT 文章全文檢索索引')
+    parser.add_argument('--index-dir', default=SEARCH_INDEX_DIR, help='索引目錄')
+    parser.add_argument('--source', default=SOURCE_PATTERN, help='來源 JSON 檔案的 glob 樣式')
+    parser.add_argument('--db', default=SQLITE_DB, help='SQLite 資料庫路徑，指定時由資料庫中的所有看板建立索引')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('update', help='增量更新索引（只索引新增或有變更的文章）')
+    subparsers.add_parser('merge', help='將所有分段合併為一個')
+
+    search_parser = subparsers.add_parser('search', help='查詢包含所有關鍵字的文章')
+    search_parser.add_argument('query', help='查詢字串，以空白分隔多個關鍵字')
+    search_parser.add_argument('--board', help='只顯示此看板')
+    search_parser.add_argument('--limit', type=int, default=20, help='最多顯示幾篇')
+
+    bench_parser = subparsers.add_parser('bench', help='與逐篇子字串掃描比較查詢耗時')
+    bench_parser.add_argument('queries', nargs='*', help=f'查詢字串，預設為 {BENCH_QUERIES}')
+    bench_parser.add_argument('--repeat', type=int, default=5, help='每個查詢重複次數')
+    args = parser.parse_args()
+
+    with SearchIndex(args.index_dir) as index:
+        if args.command == 'update':
+            started = time.perf_counter()
+            result = update_index(index, iter_corpus(args.source, db_file=args.db))
+            print(f"索引 {result['indexed']} 篇、略過未變更 {result['unchanged']} 篇，"
+                  f"共 {len(index)} 篇 / {len(index.segments)} 個分段，耗時 {time.perf_counter() - started:.1f} 秒")
+        elif args.command == 'merge':
+            index.merge()
+            print(f"已合併為 {len(index.segments)} 個分段，共 {len(index)} 篇")
+        elif args.command == 'search':
+            started = time.perf_counter()
+            urls = index.search(args.query, board=args.board)
+            print(f"找到 {len(urls)} 篇（{(time.perf_counter() - started) * 1000:.2f} 毫秒）")
+            for url in urls[:args.limit]:
+                print(url)
+        else:
+            update_index(index, iter_corpus(args.source, db_file=args.db))
+            results = benchmark(index, iter_corpus(args.source, db_file=args.db), args.queries or BENCH_QUERIES,
+                                args.repeat)
+            print(format_benchmark(results))
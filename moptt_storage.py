@@ -0,0 +1,462 @@
+"""
+MOPTT 文章儲存層
+提供可替換的文章儲存介面，爬蟲透過同一組方法讀寫進度：
+- JsonArticleStore：原本的 moptt_<看板>.json 檔案（搭配僅附加的進度日誌）
+- SqliteArticleStore：以 URL 為主鍵、具索引的 SQLite 資料庫，另有回應資料表
+JSON / CSV 仍可作為匯出格式
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import pandas as pd
+
+from moptt_journal import ArticleJournal
+from moptt_post_id import PostTimeIndex, parse_post_board, parse_post_epoch, to_epoch
+
+# ====== 設定區域開始 ======
+# 預設的 SQLite 資料庫路徑
+SQLITE_DB = 'moptt.db'
+# ====== 設定區域結束 ======
+
+# 對應到資料表欄位的文章欄位，其他欄位存放於 extra（JSON）
+ARTICLE_COLUMNS = (
+    'title', 'article_number', 'post_time', 'likes', 'responses', 'boos',
+    'content_fetched', 'preloaded'
+)
+BOOLEAN_COLUMNS = ('content_fetched', 'preloaded')
+
+
+class ArticleStore(ABC):
+    """
+    文章儲存介面
+    upsert 以 URL 為鍵，傳入的文章字典會完整取代既有紀錄
+    """
+
+    @abstractmethod
+    def count(self, board):
+        """取得看板的文章數"""
+
+    @abstractmethod
+    def has_url(self, url):
+        """檢查文章網址是否已存在"""
+
+    @abstractmethod
+    def last_url(self, board):
+        """取得看板最後一篇（文章序號最大）文章的網址，沒有文章時返回None"""
+
+    @abstractmethod
+    def iter_urls(self, board):
+        """依序取得看板所有文章網址"""
+
+    @abstractmethod
+    def upsert(self, article):
+        """新增或取代一篇文章"""
+
+    @abstractmethod
+    def load_articles(self, board):
+        """依文章序號取得看板的所有文章"""
+
+    @abstractmethod
+    def unfetched_articles(self, board):
+        """取得看板中尚未爬取內容（content_fetched 不為 True）的文章"""
+
+    @abstractmethod
+    def preloaded_articles(self, board):
+        """取得看板中仍為預載狀態（preloaded 為 True）的文章"""
+
+    @abstractmethod
+    def newest_epoch(self, board):
+        """取得看板最新一篇文章的發文時間（由文章 ID 取得），沒有文章時返回None"""
+
+    @abstractmethod
+    def articles_between(self, board, start=None, end=None):
+        """依發文時間由舊到新取得區間內（含兩端，datetime 或 epoch）的文章，發文時間由文章 ID 取得"""
+
+    def finalize(self):
+        """爬取結束時呼叫，將進度寫成最終狀態"""
+
+    def close(self):
+        """關閉儲存"""
+
+    def export_json(self, board, json_file):
+        """
+        將看板文章匯出為 JSON 檔
+
+        Args:
+            board (str): 看板名稱
+            json_file (str): 輸出檔案路徑
+        """
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(self.load_articles(board), f, ensure_ascii=False, indent=2)
+
+    def export_csv(self, board, csv_file):
+        """
+        將看板文章匯出為 CSV 檔
+
+        Args:
+            board (str): 看板名稱
+            csv_file (str): 輸出檔案路徑
+        """
+        df = pd.DataFrame(self.load_articles(board))
+        df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+
+
+class JsonArticleStore(ArticleStore):
+    """
+    JSON 檔案儲存類別
+    一個檔案對應一個看板，文章保存在記憶體中，變更以進度日誌附加寫入，
+    finalize 時壓縮成 JSON 檔；未指定檔案路徑時只存在記憶體中
+    """
+
+    def __init__(self, json_file=None):
+        """
+        初始化並載入進度
+
+        Args:
+            json_file (str, optional): 看板 JSON 檔案路徑
+        """
+        self.journal = ArticleJournal(json_file) if json_file else None
+        self.articles = self.journal.load() if self.journal else []
+        self.positions = {article.get('url'): i for i, article in enumerate(self.articles)}
+        self._time_index = None
+
+    def count(self, board):
+        return len(self.articles)
+
+    def has_url(self, url):
+        return url in self.positions
+
+    def last_url(self, board):
+        return self.articles[-1].get('url') if self.articles else None
+
+    def iter_urls(self, board):
+        return [article.get('url') for article in self.articles]
+
+    def upsert(self, article):
+        url = article.get('url')
+        if url in self.positions:
+            self.articles[self.positions[url]] = article
+        else:
+            self.positions[url] = len(self.articles)
+            self.articles.append(article)
+            if self._time_index is not None:
+                self._time_index.add(url)
+        if self.journal:
+            self.journal.append(article)
+
+    def load_articles(self, board):
+        return list(self.articles)
+
+    def unfetched_articles(self, board):
+        return [article for article in self.articles if not article.get('content_fetched')]
+
+    def preloaded_articles(self, board):
+        return [article for article in self.articles if article.get('preloaded', False)]
+
+    def time_index(self):
+        """依發文時間排序的索引，第一次使用時建立，之後隨 upsert 更新"""
+        if self._time_index is None:
+            self._time_index = PostTimeIndex(self.positions)
+        return self._time_index
+
+    def newest_epoch(self, board):
+        return self.time_index().newest_epoch()
+
+    def articles_between(self, board, start=None, end=None):
+        return [self.articles[self.positions[url]] for url in self.time_index().between(start, end)]
+
+    def finalize(self):
+        if self.journal:
+            self.journal.compact(self.articles)
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+
+
+class SqliteArticleStore(ArticleStore):
+    """
+    SQLite 儲存類別
+    articles 以 URL 為主鍵，並建立（看板, 內容是否已爬取）、（看板, 文章序號）與（看板, 發文時間）索引；
+    回應內容存放於 comments 資料表
+    """
+
+    def __init__(self, db_file=SQLITE_DB):
+        """
+        開啟資料庫並建立資料表
+
+        Args:
+            db_file (str): SQLite 資料庫路徑
+        """
+        self.db_file = db_file
+        # 平行模式下多個執行緒共用同一個連線，以 lock 保護
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    board TEXT NOT NULL,
+                    post_epoch INTEGER,
+                    title TEXT,
+                    article_number INTEGER,
+                    post_time TEXT,
+                    likes INTEGER,
+                    responses INTEGER,
+                    boos INTEGER,
+                    content_fetched INTEGER NOT NULL DEFAULT 0,
+                    preloaded INTEGER NOT NULL DEFAULT 0,
+                    has_comments INTEGER NOT NULL DEFAULT 0,
+                    extra TEXT,
+                    updated_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_articles_board_fetched
+                    ON articles (board, content_fetched);
+                CREATE INDEX IF NOT EXISTS idx_articles_board_number
+                    ON articles (board, article_number);
+                CREATE INDEX IF NOT EXISTS idx_articles_board_epoch
+                    ON articles (board, post_epoch);
+                CREATE TABLE IF NOT EXISTS comments (
+                    url TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (url, seq)
+                );
+            """)
+
+    def count(self, board):
+        with self.lock:
+            row = self.conn.execute("SELECT COUNT(*) FROM articles WHERE board = ?", (board,)).fetchone()
+        return row[0]
+
+    def has_url(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM articles WHERE url = ?", (url,)).fetchone()
+        return row is not None
+
+    def last_url(self, board):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url FROM articles WHERE board = ? ORDER BY article_number DESC LIMIT 1", (board,)
+            ).fetchone()
+        return row['url'] if row else None
+
+    def boards(self):
+        """取得資料庫中所有看板名稱"""
+        with self.lock:
+            rows = self.conn.execute("SELECT DISTINCT board FROM articles ORDER BY board").fetchall()
+        return [row['board'] for row in rows]
+
+    def iter_urls(self, board):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url FROM articles WHERE board = ? ORDER BY article_number", (board,)
+            ).fetchall()
+        return [row['url'] for row in rows]
+
+    def upsert(self, article):
+        with self.lock, self.conn:
+            self._upsert(article)
+
+    def upsert_many(self, articles):
+        """
+        在單一交易中新增或取代多篇文章
+
+        Args:
+            articles (iterable): 文章字典
+        """
+        with self.lock, self.conn:
+            for article in articles:
+                self._upsert(article)
+
+    def _upsert(self, article):
+        """新增或取代一篇文章（呼叫端需持有 lock 並處於交易中）"""
+        url = article['url']
+        extra = {key: value for key, value in article.items()
+                 if key not in ARTICLE_COLUMNS and key not in ('url', 'responses_content')}
+        values = [article.get(column) for column in ARTICLE_COLUMNS]
+        for i, column in enumerate(ARTICLE_COLUMNS):
+            if column in BOOLEAN_COLUMNS:
+                values[i] = 1 if values[i] else 0
+        comments = article.get('responses_content')
+
+        self.conn.execute(f"""
+            INSERT INTO articles (url, board, post_epoch, {', '.join(ARTICLE_COLUMNS)}, has_comments, extra, updated_at)
+            VALUES ({', '.join('?' * (len(ARTICLE_COLUMNS) + 6))})
+            ON CONFLICT(url) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in ARTICLE_COLUMNS)},
+                has_comments = excluded.has_comments,
+                extra = excluded.extra,
+                updated_at = excluded.updated_at
+        """, [url, parse_post_board(url) or '', parse_post_epoch(url), *values,
+              1 if comments is not None else 0,
+              json.dumps(extra, ensure_ascii=False) if extra else None,
+              time.time()])
+
+        self.conn.execute("DELETE FROM comments WHERE url = ?", (url,))
+        if comments:
+            self.conn.executemany(
+                "INSERT INTO comments (url, seq, content) VALUES (?, ?, ?)",
+                [(url, seq, content) for seq, content in enumerate(comments)]
+            )
+
+    def load_articles(self, board):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM articles WHERE board = ? ORDER BY article_number", (board,)
+            ).fetchall()
+            return [self._row_to_article(row) for row in rows]
+
+    def unfetched_articles(self, board):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM articles WHERE board = ? AND content_fetched = 0 ORDER BY article_number", (board,)
+            ).fetchall()
+            return [self._row_to_article(row) for row in rows]
+
+    def preloaded_articles(self, board):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM articles WHERE board = ? AND preloaded = 1 ORDER BY article_number", (board,)
+            ).fetchall()
+            return [self._row_to_article(row) for row in rows]
+
+    def newest_epoch(self, board):
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(post_epoch) FROM articles WHERE board = ?", (board,)).fetchone()
+        return row[0]
+
+    def articles_between(self, board, start=None, end=None):
+        query = "SELECT * FROM articles WHERE board = ? AND post_epoch IS NOT NULL"
+        params = [board]
+        if start is not None:
+            query += " AND post_epoch >= ?"
+            params.append(to_epoch(start))
+        if end is not None:
+            query += " AND post_epoch <= ?"
+            params.append(to_epoch(end))
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY post_epoch", params).fetchall()
+            return [self._row_to_article(row) for row in rows]
+
+    def _row_to_article(self, row):
+        """將資料列還原為與 JSON 檔相同格式的文章字典（呼叫端需持有 lock）"""
+        article = {'url': row['url']}
+        for column in ARTICLE_COLUMNS:
+            value = row[column]
+            if column in BOOLEAN_COLUMNS:
+                if value:
+                    article[column] = True
+            elif value is not None:
+                article[column] = value
+        if row['extra']:
+            article.update(json.loads(row['extra']))
+        if row['has_comments']:
+            comment_rows = self.conn.execute(
+                "SELECT content FROM comments WHERE url = ? ORDER BY seq", (row['url'],)
+            ).fetchall()
+            article['responses_content'] = [comment['content'] for comment in comment_rows]
+        return article
+
+    def import_json(self, json_file):
+        """
+        匯入既有的 moptt_<看板>.json 檔案
+
+        Args:
+            json_file (str): JSON 檔案路徑
+
+        Returns:
+            int: 匯入的文章數
+        """
+        with open(json_file, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        self.upsert_many(articles)
+        return len(articles)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def board_from_json_file(json_file):
+    """
+    從 moptt_<看板>.json 檔名取得看板名稱
+
+    Args:
+        json_file (str): JSON 檔案路徑
+
+    Returns:
+        str: 看板名稱
+    """
+    name = os.path.splitext(os.path.basename(json_file))[0]
+    return name[len('moptt_'):] if name.startswith('moptt_') else name
+
+
+def open_store(json_file=None, db_file=None):
+    """
+    依設定建立文章儲存
+
+    Args:
+        json_file (str, optional): 看板 JSON 檔案路徑
+        db_file (str, optional): SQLite 資料庫路徑，指定時優先使用
+
+    Returns:
+        ArticleStore: 文章儲存
+    """
+    if db_file:
+        return SqliteArticleStore(db_file)
+    return JsonArticleStore(json_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MOPTT 文章儲存工具')
+    parser.add_argument('--db', default=SQLITE_DB, help='SQLite 資料庫路徑')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='匯入 moptt_*.json 檔案')
+    import_parser.add_argument('pattern', nargs='?', default='moptt_*.json', help='JSON 檔案名稱模式')
+
+    export_parser = subparsers.add_parser('export', help='將看板文章匯出為 JSON 或 CSV')
+    export_parser.add_argument('board', help='看板名稱')
+    export_parser.add_argument('--format', choices=['json', 'csv'], default='json', help='匯出格式')
+    export_parser.add_argument('--output', help='輸出檔案路徑，預設為 moptt_<看板>.<格式>')
+
+    recent_parser = subparsers.add_parser('recent', help='列出看板最近幾小時內發文的文章（依文章 ID 的發文時間）')
+    recent_parser.add_argument('board', help='看板名稱')
+    recent_parser.add_argument('--hours', type=float, default=24, help='小時數')
+
+    args = parser.parse_args()
+    store = SqliteArticleStore(args.db)
+
+    if args.command == 'import':
+        for json_file in sorted(glob.glob(args.pattern)):
+            try:
+                count = store.import_json(json_file)
+                print(f"已匯入 {json_file}：{count} 篇文章")
+            except Exception as e:
+                print(f"匯入 {json_file} 時發生錯誤: {str(e)}")
+    elif args.command == 'recent':
+        articles = store.articles_between(args.board, time.time() - args.hours * 3600)
+        for article in articles:
+            print(f"{datetime.fromtimestamp(parse_post_epoch(article['url'])):%Y-%m-%d %H:%M} | {article.get('title', '')}")
+        print(f"{args.board} 看板最近 {args.hours:g} 小時內共 {len(articles)} 篇文章")
+    else:
+        output = args.output or f"moptt_{args.board}.{args.format}"
+        if args.format == 'json':
+            store.export_json(args.board, output)
+        else:
+            store.export_csv(args.board, output)
+        print(f"已匯出 {args.board} 看板至 {output}")
+
+    store.close()
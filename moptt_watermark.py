@@ -0,0 +1,133 @@
+"""
+MOPTT 看板時間水位線（watermark）
+記錄每個看板已爬取到的最新發文時間，增量爬取時只需滾動到比水位線更舊的文章即可停止
+"""
+
+import json
+import os
+
+from moptt_post_id import parse_post_epoch
+
+# ====== 設定區域開始 ======
+# 狀態檔目錄（不放在工作目錄，避免被 moptt_*.json 的轉換 / 索引工具當成文章檔）
+STATE_DIR = 'moptt_state'
+
+# 水位線檔案路徑
+WATERMARK_FILE = os.path.join(STATE_DIR, 'watermarks.json')
+
+# 連續幾次滾動新增的卡片都比水位線舊時停止滾動
+# （看板排序並非嚴格依發文時間，因此不在第一張舊卡片就停止）
+STOP_AFTER_OLDER_SCROLLS = 2
+# ====== 設定區域結束 ======
+
+
+class WatermarkStore:
+    """
+    看板水位線儲存類別
+    以 {看板名稱: epoch} 的 JSON 檔保存各看板的水位線
+    """
+
+    def __init__(self, path=WATERMARK_FILE):
+        """
+        初始化並載入水位線檔案
+
+        Args:
+            path (str): 水位線檔案路徑
+        """
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.watermarks = json.load(f)
+        except FileNotFoundError:
+            self.watermarks = {}
+
+    def get(self, board):
+        """取得看板的水位線，沒有紀錄時返回None"""
+        return self.watermarks.get(board)
+
+    def update(self, board, epoch):
+        """
+        將看板水位線推進到 epoch（不會倒退），並寫回檔案
+
+        Args:
+            board (str): 看板名稱
+            epoch (int): 新的水位線
+        """
+        if epoch is None or epoch <= (self.watermarks.get(board) or 0):
+            return
+        self.watermarks[board] = epoch
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.watermarks, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.path)
+
+
+class IncrementalCrawl:
+    """
+    單一看板的增量爬取狀態
+    判斷何時可以停止滾動，並在完成後推進水位線
+    """
+
+    def __init__(self, board, known_urls=(), store=None, known_newest_epoch=None):
+        """
+        初始化增量爬取狀態
+
+        Args:
+            board (str): 看板名稱
+            known_urls (iterable): 已載入進度中的文章網址，用於推算水位線
+            store (WatermarkStore, optional): 水位線儲存，未指定時使用預設檔案
+            known_newest_epoch (int, optional): 已載入進度中最新的發文時間（例如 ArticleStore.newest_epoch），
+                                                指定時不必掃描 known_urls
+        """
+        self.board = board
+        self.store = store or WatermarkStore()
+        self.watermark = self.store.get(board)
+        known_epochs = [epoch for epoch in map(parse_post_epoch, known_urls) if epoch is not None]
+        if known_newest_epoch is not None:
+            known_epochs.append(known_newest_epoch)
+        self.newest_epoch = max(known_epochs + [self.watermark or 0]) or None
+        self.older_streak = 0
+
+    def should_stop(self, new_cards):
+        """
+        記錄一次滾動新增的卡片，並判斷是否已滾動到水位線之前
+
+        Args:
+            new_cards (list): 本次滾動新增的文章卡片（含 url）
+
+        Returns:
+            bool: 是否應停止滾動
+        """
+        epochs = [epoch for epoch in (parse_post_epoch(card['url']) for card in new_cards) if epoch is not None]
+        if epochs:
+            self.newest_epoch = max(epochs + [self.newest_epoch or 0])
+
+        if self.watermark is None or not epochs:
+            return False
+
+        if all(epoch <= self.watermark for epoch in epochs):
+            self.older_streak += 1
+        else:
+            self.older_streak = 0
+        return self.older_streak >= STOP_AFTER_OLDER_SCROLLS
+
+    def finish(self, reached_end):
+        """
+        爬取完成後推進水位線
+
+        只有在滾動到水位線之前或看板底部時才推進；若因達到最大滾動次數而中斷，
+        中間仍有未爬到的文章，保留原水位線讓下次繼續往下補爬
+
+        Args:
+            reached_end (bool): 是否因 should_stop 或到達頁面底部而停止滾動
+
+        Returns:
+            bool: 是否已推進水位線
+        """
+        if not reached_end:
+            print(f"\n看板 {self.board} 未滾動到水位線或底部，保留原水位線 {self.watermark}")
+            return False
+        self.store.update(self.board, self.newest_epoch)
+        return True
@@ -0,0 +1,520 @@
+"""
+PTT 看板索引頁非同步爬蟲
+ptt.cc 的索引頁是靜態 HTML，因此不需開啟瀏覽器：
+以 asyncio 控制同時下載的頁數，直接帶上 over18 cookie 略過年齡確認頁，
+並以 BeautifulSoup 解析 div.r-ent 文章列；
+指定日期區間時，以文章 ID 中的發文時間二分搜尋區間涵蓋的頁碼範圍，再併發下載該範圍
+"""
+
+import asyncio
+import re
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+import moptt_metrics
+from moptt_http_cache import get_default_cache
+from moptt_post_id import parse_post_epoch, post_time_from_id
+
+# ====== 設定區域開始 ======
+# PTT 網站位址
+PTT_BASE_URL = 'https://www.ptt.cc'
+
+# 同時下載的索引頁數量上限
+CONCURRENCY = 8
+
+# 每個主機同時進行的請求數上限
+PER_HOST_LIMIT = 4
+
+# 同一主機兩次請求開始之間的最短間隔（秒）
+PER_HOST_INTERVAL = 0.2
+
+# HTTP 請求逾時（秒）
+HTTP_TIMEOUT = 15
+
+# 單頁下載失敗時的重試次數與第一次重試前的等待秒數（之後每次加倍）
+FETCH_RETRIES = 2
+RETRY_BACKOFF = 1.0
+
+# 二分搜尋探測的頁面重試後仍失敗時，最多改探測幾個相鄰的較舊頁面
+PROBE_ADJACENT_PAGES = 3
+
+# 往回爬取時連續幾批索引頁全部下載失敗就停止
+MAX_FAILED_BATCHES = 3
+
+# 請求標頭中的 User-Agent
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# ====== 設定區域結束 ======
+
+INDEX_PAGE_PATTERN = re.compile(r'/index(\d+)\.html')
+
+
+def parse_index_html(html, base_url=PTT_BASE_URL):
+    """
+    解析索引頁 HTML
+
+    Args:
+        html (str): 索引頁 HTML
+        base_url (str): 用於組合完整文章網址的網站位址
+
+    Returns:
+        tuple: (文章列列表, 上一頁頁碼)；文章列為包含 title、link、author、date、nrec、
+               post_time（由文章 ID 推算的完整發文時間，含年份）的字典，
+               找不到「上頁」連結時頁碼為 None
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    rows = []
+    for r_ent in soup.select('div.r-ent'):
+        # 已刪除的文章沒有連結，略過
+        title_element = r_ent.select_one('div.title a')
+        if title_element is None or not title_element.get('href'):
+            continue
+
+        nrec_element = r_ent.select_one('div.nrec span')
+        author_element = r_ent.select_one('div.meta div.author')
+        date_element = r_ent.select_one('div.meta div.date')
+
+        link = urljoin(base_url, title_element['href'])
+        rows.append({
+            'title': title_element.get_text(strip=True),
+            'link': link,
+            'author': author_element.get_text(strip=True) if author_element else '',
+            'date': date_element.get_text(strip=True) if date_element else '',
+            'nrec': nrec_element.get_text(strip=True) if nrec_element else '0',
+            'post_time': post_time_from_id(link)
+        })
+
+    previous_page = None
+    paging_links = soup.select('div.btn-group-paging a')
+    if len(paging_links) >= 2:
+        match = INDEX_PAGE_PATTERN.search(paging_links[1].get('href') or '')
+        if match:
+            previous_page = int(match.group(1))
+
+    return rows, previous_page
+
+
+class _HostLimiter:
+    """單一主機的禮貌性限制：同時請求數上限與請求間隔"""
+
+    def __init__(self, limit, interval):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.interval = interval
+        self.lock = asyncio.Lock()
+        self.last_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            delay = self.last_start + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.last_start = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
+class PttIndexCrawler:
+    """
+    PTT 看板索引頁爬蟲類別
+    負責以有限的併發數下載索引頁並解析文章列
+    """
+
+    def __init__(self, base_url=None, concurrency=CONCURRENCY,
+                 per_host_limit=PER_HOST_LIMIT, per_host_interval=PER_HOST_INTERVAL, cache=None):
+        """
+        初始化爬蟲設定
+
+        Args:
+            base_url (str, optional): PTT 網站位址，未指定時使用 PTT_BASE_URL
+            concurrency (int): 同時下載的索引頁數量上限
+            per_host_limit (int): 每個主機同時進行的請求數上限
+            per_host_interval (float): 同一主機兩次請求之間的最短間隔（秒）
+            cache (HttpCache, optional): HTTP 回應快取，未指定時使用行程內共用的快取
+        """
+        self.base_url = (base_url or PTT_BASE_URL).rstrip('/')
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit
+        self.per_host_interval = per_host_interval
+        self.cache = cache or get_default_cache()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        # 直接帶上已滿 18 歲的 cookie，取代點擊「我同意」按鈕
+        self.session.cookies.set('over18', '1', domain=urlparse(self.base_url).hostname)
+
+        self._semaphore = None
+        self._host_limiters = {}
+
+    def index_url(self, board, page=None):
+        """
+        組合索引頁網址
+
+        Args:
+            board (str): 看板名稱
+            page (int, optional): 頁碼，未指定時為最新一頁 index.html
+
+        Returns:
+            str: 索引頁網址
+        """
+        page_name = 'index.html' if page is None else f'index{page}.html'
+        return f'{self.base_url}/bbs/{board}/{page_name}'
+
+    async def fetch(self, url):
+        """
+        非同步下載單一頁面，受全域併發數與主機禮貌性限制
+        快取未到期時直接回傳，不占用併發數與主機間隔
+
+        Args:
+            url (str): 頁面網址
+
+        Returns:
+            str: 頁面 HTML
+        """
+        if self.cache is not None:
+            cached = self.cache.get_fresh(url)
+            if cached is not None:
+                cached.encoding = 'utf-8'
+                return cached.text
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        host = urlparse(url).hostname
+        limiter = self._host_limiters.get(host)
+        if limiter is None:
+            limiter = self._host_limiters[host] = _HostLimiter(self.per_host_limit, self.per_host_interval)
+
+        async with self._semaphore, limiter:
+            with moptt_metrics.stage('ptt_fetch', scraper='ptt'):
+                if self.cache is not None:
+                    response = await asyncio.to_thread(self.cache.get, self.session, url, HTTP_TIMEOUT)
+                else:
+                    response = await asyncio.to_thread(self.session.get, url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        return response.text
+
+    async def fetch_index_page(self, board, page=None):
+        """
+        下載並解析一頁索引頁
+
+        Args:
+            board (str): 看板名稱
+            page (int, optional): 頁碼，未指定時為最新一頁
+
+        Returns:
+            dict: 包含 page（頁碼）、previous_page（上一頁頁碼）、rows（文章列）的字典
+        """
+        html = await self.fetch(self.index_url(board, page))
+        with moptt_metrics.stage('ptt_parse', scraper='ptt'):
+            rows, previous_page = parse_index_html(html, self.base_url)
+        if page is None and previous_page is not None:
+            page = previous_page + 1
+        return {'page': page, 'previous_page': previous_page, 'rows': rows}
+
+    async def fetch_index_page_with_retry(self, board, page=None, retries=FETCH_RETRIES):
+        """
+        下載並解析一頁索引頁，失敗時等待後重試
+
+        Args:
+            board (str): 看板名稱
+            page (int, optional): 頁碼，未指定時為最新一頁
+            retries (int): 重試次數
+
+        Returns:
+            dict: fetch_index_page 的回傳值
+
+        Raises:
+            Exception: 重試後仍失敗時拋出最後一次的錯誤
+        """
+        for attempt in range(retries + 1):
+            try:
+                return await self.fetch_index_page(board, page)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                moptt_metrics.count('ptt_fetch_retry', scraper='ptt')
+                print(f"下載 {self.index_url(board, page)} 失敗，稍後重試: {e}")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    async def crawl_board(self, board, cutoff_date):
+        """
+        從最新一頁往回爬取，直到整頁文章都早於截止日期
+        每次併發下載 concurrency 頁（失敗的頁面會重試），再依頁碼由新到舊處理；
+        連續 MAX_FAILED_BATCHES 批全部失敗時停止，避免在網站無法連線時一路排程到第一頁
+
+        Args:
+            board (str): 看板名稱
+            cutoff_date (datetime): 截止日期（含年份，以文章 ID 中的發文時間比較）
+
+        Returns:
+            list: 截止日期之後的文章列，依頁碼由新到舊排列
+        """
+        first_page = await self.fetch_index_page_with_retry(board)
+        print(f"最新一頁為 index{first_page['page']}.html")
+
+        post_data = []
+        pages = [first_page]
+        next_page = first_page['previous_page']
+        failed_batches = 0
+
+        while True:
+            for page in pages:
+                if not self._collect_rows(page, cutoff_date, post_data):
+                    print("所有文章發文時間都早於截止日期，停止爬取。")
+                    return post_data
+
+            if not next_page or next_page < 1:
+                print("已到達第一頁，停止爬取。")
+                return post_data
+
+            # 併發下載接下來的一批索引頁
+            page_numbers = list(range(next_page, max(next_page - self.concurrency, 0), -1))
+            print(f"下載索引頁 index{page_numbers[-1]}.html ~ index{page_numbers[0]}.html")
+            results = await asyncio.gather(
+                *(self.fetch_index_page_with_retry(board, number) for number in page_numbers),
+                return_exceptions=True
+            )
+            pages = []
+            for number, result in zip(page_numbers, results):
+                if isinstance(result, Exception):
+                    print(f"下載 index{number}.html 時發生錯誤: {result}")
+                    moptt_metrics.count('ptt_fetch_error', scraper='ptt')
+                    continue
+                pages.append(result)
+            next_page = page_numbers[-1] - 1
+
+            if pages:
+                failed_batches = 0
+            else:
+                failed_batches += 1
+                if failed_batches >= MAX_FAILED_BATCHES:
+                    print(f"連續 {failed_batches} 批索引頁都下載失敗，停止爬取"
+                          f"（index{page_numbers[-1]}.html 之前尚未爬取）。")
+                    return post_data
+
+    async def _probe_page(self, board, page, probed):
+        """
+        取得頁面第一篇文章的發文時間，作為二分搜尋的鍵
+        整頁文章都已刪除時改看前一頁；重試後仍下載失敗時同樣改看前一頁，
+        以相鄰頁面的發文時間代替（二分搜尋結果最多偏移幾頁，之後的區間下載仍會涵蓋）
+
+        Args:
+            board (str): 看板名稱
+            page (int): 頁碼
+            probed (dict): 已下載的頁面 {頁碼: fetch_index_page 的回傳值}，會被更新
+
+        Returns:
+            int: 發文時間 epoch，往前都找不到時為 None
+
+        Raises:
+            Exception: 連續 PROBE_ADJACENT_PAGES + 1 頁都下載失敗時拋出最後一次的錯誤
+        """
+        failed_pages = 0
+        while page >= 1:
+            if page not in probed:
+                try:
+                    probed[page] = await self.fetch_index_page_with_retry(board, page)
+                except Exception as e:
+                    moptt_metrics.count('ptt_fetch_error', scraper='ptt')
+                    failed_pages += 1
+                    if failed_pages > PROBE_ADJACENT_PAGES:
+                        raise
+                    print(f"探測 index{page}.html 失敗，改探測前一頁: {e}")
+                    page -= 1
+                    continue
+            failed_pages = 0
+            for row in probed[page]['rows']:
+                epoch = parse_post_epoch(row['link'])
+                if epoch is not None:
+                    return epoch
+            page -= 1
+        return None
+
+    async def _last_page_at_or_before(self, board, epoch, latest_page, probed, low=1):
+        """
+        二分搜尋第一篇文章發文時間不晚於 epoch 的最後一頁
+        索引頁依發文順序排列，因此每頁第一篇文章的發文時間隨頁碼遞增
+
+        Args:
+            board (str): 看板名稱
+            epoch (int): 目標時間
+            latest_page (int): 最新一頁頁碼
+            probed (dict): 已下載的頁面
+            low (int): 搜尋範圍的第一頁
+
+        Returns:
+            int: 頁碼，所有頁面都晚於 epoch 時為 low
+        """
+        high = latest_page
+        while low < high:
+            middle = (low + high + 1) // 2
+            key = await self._probe_page(board, middle, probed)
+            if key is not None and key <= epoch:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    async def locate_pages(self, board, start_epoch, end_epoch=None, probed=None):
+        """
+        找出發文時間區間涵蓋的索引頁範圍，只需 O(log 頁數) 次探測
+
+        Args:
+            board (str): 看板名稱
+            start_epoch (int): 區間起點（含）
+            end_epoch (int, optional): 區間終點（含），未指定時到最新一頁
+            probed (dict, optional): 已下載的頁面，會被更新以供之後重複使用
+
+        Returns:
+            tuple: (第一頁, 最後一頁, 最新一頁)
+        """
+        probed = {} if probed is None else probed
+        latest = await self.fetch_index_page_with_retry(board)
+        latest_page = latest['page'] or 1
+        probed[latest_page] = latest
+
+        first_page = await self._last_page_at_or_before(board, start_epoch, latest_page, probed)
+        last_page = latest_page
+        if end_epoch is not None:
+            last_page = await self._last_page_at_or_before(board, end_epoch, latest_page, probed, first_page)
+        return first_page, last_page, latest_page
+
+    async def crawl_window(self, board, start_date, end_date=None):
+        """
+        爬取發文時間在指定區間內的文章：先二分搜尋頁碼範圍，再併發下載範圍內尚未下載的頁面
+
+        Args:
+            board (str): 看板名稱
+            start_date (datetime): 區間起點（含）
+            end_date (datetime, optional): 區間終點（含），未指定時到最新文章
+
+        Returns:
+            list: 區間內的文章列，依頁碼由新到舊排列
+        """
+        start_epoch = int(start_date.timestamp())
+        end_epoch = int(end_date.timestamp()) if end_date is not None else None
+
+        probed = {}
+        first_page, last_page, latest_page = await self.locate_pages(board, start_epoch, end_epoch, probed)
+        probes = len(probed)
+        print(f"最新一頁為 index{latest_page}.html，區間位於 index{first_page}.html ~ index{last_page}.html"
+              f"（探測 {probes} 頁）")
+
+        missing = [number for number in range(last_page, first_page - 1, -1) if number not in probed]
+        results = await asyncio.gather(
+            *(self.fetch_index_page(board, number) for number in missing),
+            return_exceptions=True
+        )
+        for number, result in zip(missing, results):
+            if isinstance(result, Exception):
+                print(f"下載 index{number}.html 時發生錯誤: {result}")
+                moptt_metrics.count('ptt_fetch_error', scraper='ptt')
+                continue
+            probed[number] = result
+
+        post_data = []
+        for number in range(last_page, first_page - 1, -1):
+            page = probed.get(number)
+            if page is None:
+                continue
+            for row in page['rows']:
+                epoch = parse_post_epoch(row['link'])
+                if epoch is None:
+                    moptt_metrics.count('ptt_bad_date', scraper='ptt')
+                    continue
+                if epoch >= start_epoch and (end_epoch is None or epoch <= end_epoch):
+                    post_data.append(dict(row))
+        print(f"共下載 {len(probed)} 頁（探測 {probes} 頁 + 區間 {len(missing)} 頁）")
+        return post_data
+
+    def _collect_rows(self, page, cutoff_date, post_data):
+        """
+        將一頁中截止日期之後的文章加入 post_data
+
+        Args:
+            page (dict): fetch_index_page 的回傳值
+            cutoff_date (datetime): 截止日期
+            post_data (list): 收集結果的列表
+
+        Returns:
+            bool: 該頁是否仍有截止日期之後的文章
+        """
+        cutoff_epoch = int(cutoff_date.timestamp())
+        has_post_after_cutoff = False
+        for row in page['rows']:
+            epoch = parse_post_epoch(row['link'])
+            if epoch is not None:
+                if epoch < cutoff_epoch:
+                    continue
+            else:
+                # 沒有文章 ID 時退回比較索引頁上不含年份的月/日
+                try:
+                    post_date = datetime.strptime(row['date'], "%m/%d")
+                except ValueError as e:
+                    print(f"無法提取發文日期，跳過此文章：{e}")
+                    moptt_metrics.count('ptt_bad_date', scraper='ptt')
+                    continue
+                if post_date < cutoff_date.replace(year=post_date.year):
+                    continue
+
+            has_post_after_cutoff = True
+            post_data.append(dict(row))
+        return has_post_after_cutoff
+
+    def close(self):
+        """關閉連線池"""
+        self.session.close()
+
+
+def crawl_board(board, cutoff_date, **crawler_options):
+    """
+    以同步介面爬取單一看板的索引頁
+
+    Args:
+        board (str): 看板名稱
+        cutoff_date (datetime): 截止日期
+        **crawler_options: 傳給 PttIndexCrawler 的設定
+
+    Returns:
+        list: 截止日期之後的文章列
+    """
+    crawler = PttIndexCrawler(**crawler_options)
+    try:
+        return asyncio.run(crawler.crawl_board(board, cutoff_date))
+    finally:
+        if crawler.cache is not None:
+            print(f"索引頁{crawler.cache.summary()}")
+        crawler.close()
+
+
+def crawl_board_window(board, start_date, end_date=None, **crawler_options):
+    """
+    以同步介面爬取單一看板在發文時間區間內的文章（二分搜尋頁碼範圍）
+
+    Args:
+        board (str): 看板名稱
+        start_date (datetime): 區間起點（含）
+        end_date (datetime, optional): 區間終點（含），未指定時到最新文章
+        **crawler_options: 傳給 PttIndexCrawler 的設定
+
+    Returns:
+        list: 區間內的文章列
+    """
+    crawler = PttIndexCrawler(**crawler_options)
+    try:
+        return asyncio.run(crawler.crawl_window(board, start_date, end_date))
+    finally:
+        if crawler.cache is not None:
+            print(f"索引頁{crawler.cache.summary()}")
+        crawler.close()
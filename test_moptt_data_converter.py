@@ -0,0 +1,52 @@
+"""
+iter_json_array 串流解析測試
+以含浮點數、負數與科學記號的範例 JSON 陣列，逐一檢查每種區塊大小的解析結果
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from moptt_data_converter import iter_json_array
+
+SAMPLE_ARTICLES = [
+    {'url': 'https://moptt.tw/p/Baseball.M.1725000000.A.1B2', 'title': '[討論] 打擊率 .314', 'likes': 12,
+     'boos': 0, 'responses': 3, 'score': 3.14159, 'ratio': -0.25, 'weight': 1.5e-3},
+    3.14159,
+    [1.5, 2],
+    -50000000000.0,
+    {'nested': {'values': [-5e3, 0.0, 10, 2.5E+2]}, 'flag': True, 'empty': None},
+    '逗號, 與 ] 在字串中',
+]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+
+    def _write(self, text):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_every_chunk_size(self):
+        for text in (json.dumps(SAMPLE_ARTICLES, ensure_ascii=False),
+                     json.dumps(SAMPLE_ARTICLES, ensure_ascii=False, indent=2),
+                     '[3.14159]', '[1.5, 2]', '[-50000000000.0]'):
+            path = self._write(text)
+            expected = json.loads(text)
+            for chunk_size in range(1, len(text) + 2):
+                with self.subTest(text=text[:30], chunk_size=chunk_size):
+                    self.assertEqual(list(iter_json_array(path, chunk_size)), expected)
+
+    def test_unterminated_array(self):
+        path = self._write('[1.5, 2')
+        for chunk_size in (1, 3, 100):
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array(path, chunk_size))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,893 @@
+"""
+Trek 廣告 campaign → adset → adunit 樹狀並行爬蟲
+只登入一次，將登入後的 Cookie 分享給一組 HTTP（requests）或瀏覽器（BrowserPool）worker；
+以廣度優先走訪各層，父節點解析完成後立即排入其子節點，以有限的併發數同時下載，
+並統計各層的吞吐量。兩種 worker 取得 HTML 後都以相同的 BeautifulSoup 解析函式處理。
+每個 adunit 完成時立即附加一列到 CSV，完成的 campaign 記錄在檢查點中，中斷後重新執行會從上次進度繼續；
+頁碼範圍可切成多個分片，由不同程序各自爬取後再合併
+"""
+
+import argparse
+import csv
+import getpass
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+import moptt_metrics
+from moptt_browser_session import BrowserPool
+from moptt_driver import create_driver
+
+# ====== 設定區域開始 ======
+# Trek 網站位址
+TREK_BASE_URL = 'https://trek.aotter.net'
+
+# worker 種類：'http'（requests，共用登入 Cookie）或 'browser'（BrowserPool 中注入登入 Cookie 的瀏覽器）
+BACKEND = 'http'
+
+# 同時下載的頁面數（browser 模式下即瀏覽器數量）
+MAX_WORKERS = 8
+
+# 單一頁面的逾時秒數
+PAGE_TIMEOUT = 20
+
+# 未以參數指定密碼時讀取的環境變數
+PASSWORD_ENV = 'TREK_PASSWORD'
+
+# CSV 每寫入一列後是否呼叫 fsync（較安全但較慢）
+FSYNC_EACH_ROW = False
+
+# 請求標頭中的 User-Agent
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+# ====== 設定區域結束 ======
+
+LOGIN_URL = f'{TREK_BASE_URL}/advertiser/list/campaign'
+CAMPAIGN_LIST_URL = f'{TREK_BASE_URL}/advertiser/list/campaign?page='
+CAMPAIGN_URL_PREFIX = f'{TREK_BASE_URL}/advertiser/show/campaign?campId='
+
+CAMPAIGN_ROW_SELECTOR = 'tr.active.js-clickable'
+ADSET_LINK_SELECTOR = "a[href*='/advertiser/show/adset?setId=']"
+ADUNIT_LINK_SELECTOR = "a[href*='/advertiser/show/adunit?uuid=']"
+CLICK_RATE_LABEL = '期間點擊率'
+CLICK_RATE_XPATH = f"//h4[text()='{CLICK_RATE_LABEL}']/following-sibling::div//h2"
+
+# 瀏覽器 worker 判斷各層頁面載入完成的元素
+READY_LOCATORS = {
+    'campaign_list': (By.CSS_SELECTOR, CAMPAIGN_ROW_SELECTOR),
+    'campaign': (By.XPATH, CLICK_RATE_XPATH),
+    'adset': (By.XPATH, CLICK_RATE_XPATH),
+    'adunit': (By.XPATH, CLICK_RATE_XPATH),
+}
+
+LEVELS = ('campaign_list', 'campaign', 'adset', 'adunit')
+
+CSV_FIELDNAMES = ['campaign_url', 'campaign_name', 'campaign_click_rate', 'adset_url', 'adset_click_rate',
+                  'adunit_url', 'adunit_click_rate']
+
+
+def login(email, password, team_label=None, company_name=None, driver=None):
+    """
+    以瀏覽器登入 Trek，並切換到指定的團隊與公司
+
+    Args:
+        email (str): 登入帳號
+        password (str): 登入密碼
+        team_label (str, optional): 登入後要點選的團隊名稱，未指定時略過
+        company_name (str, optional): 要切換的公司名稱，未指定時略過
+        driver (WebDriver, optional): 用於登入的瀏覽器，未指定時建立後於登入完成時關閉
+
+    Returns:
+        list: 登入後的 Cookie（Selenium get_cookies 格式）
+    """
+    owns_driver = driver is None
+    driver = driver or create_driver()
+    try:
+        driver.get(LOGIN_URL)
+        email_input = WebDriverWait(driver, PAGE_TIMEOUT).until(
+            EC.presence_of_element_located((By.XPATH, "//input[@placeholder='Email 帳號']"))
+        )
+        email_input.send_keys(email)
+        driver.find_element(By.XPATH, "//input[@placeholder='密碼']").send_keys(password)
+        driver.find_element(By.XPATH, "//button[@type='submit']").click()
+
+        if team_label:
+            user_span = WebDriverWait(driver, PAGE_TIMEOUT).until(EC.presence_of_element_located(
+                (By.XPATH, f"//span[@class='team-label-name' and text()='{team_label}']")
+            ))
+            user_span.find_element(By.XPATH, "..").click()
+        if company_name:
+            WebDriverWait(driver, PAGE_TIMEOUT).until(
+                EC.presence_of_element_located((By.LINK_TEXT, company_name))
+            ).click()
+            # 等待切換公司後的頁面載入，讓 Cookie 帶有公司設定
+            WebDriverWait(driver, PAGE_TIMEOUT).until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
+        print("成功登入")
+        return driver.get_cookies()
+    finally:
+        if owns_driver:
+            driver.quit()
+
+
+def _click_rate(soup, level):
+    """
+    取得「期間點擊率」標題之後第一個 h2 的文字
+
+    找不到時代表頁面未正確載入（例如被導向其他頁或版面改變），拋出例外讓該頁計為錯誤，
+    避免以空白點擊率寫入 CSV 並記錄到檢查點
+    """
+    for label in soup.find_all('h4'):
+        if label.get_text(strip=True) != CLICK_RATE_LABEL:
+            continue
+        for sibling in label.find_next_siblings('div'):
+            value = sibling.find('h2')
+            if value is not None:
+                return value.get_text(strip=True)
+    raise ValueError(f"{level} 頁找不到「{CLICK_RATE_LABEL}」")
+
+
+def _links(soup, selector, base_url):
+    """取得符合選擇器的連結完整網址（依頁面順序，去除重複）"""
+    urls = []
+    for element in soup.select(selector):
+        url = urljoin(base_url, element.get('href'))
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+def parse_campaign_list(html, base_url=TREK_BASE_URL):
+    """
+    解析 campaign 列表頁
+
+    Args:
+        html (str): 頁面 HTML
+        base_url (str): 網站位址
+
+    Returns:
+        list: campaign 網址列表
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    urls = []
+    for row in soup.select(CAMPAIGN_ROW_SELECTOR):
+        url = urljoin(base_url, row.get('data-url') or '')
+        if url.startswith(CAMPAIGN_URL_PREFIX):
+            urls.append(url)
+    return urls
+
+
+def parse_campaign(html, base_url=TREK_BASE_URL):
+    """
+    解析 campaign 頁
+
+    Returns:
+        dict: 包含 campaign_name、click_rate、adset_urls 的字典
+
+    Raises:
+        ValueError: 找不到 campaign 名稱（h3）或期間點擊率
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    name_element = soup.find('h3')
+    if name_element is None:
+        raise ValueError("campaign 頁找不到名稱（h3）")
+    return {
+        'campaign_name': name_element.get_text(strip=True),
+        'click_rate': _click_rate(soup, 'campaign'),
+        'adset_urls': _links(soup, ADSET_LINK_SELECTOR, base_url),
+    }
+
+
+def parse_adset(html, base_url=TREK_BASE_URL):
+    """
+    解析 adset 頁
+
+    Returns:
+        dict: 包含 click_rate、adunit_urls 的字典
+
+    Raises:
+        ValueError: 找不到期間點擊率
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    return {'click_rate': _click_rate(soup, 'adset'), 'adunit_urls': _links(soup, ADUNIT_LINK_SELECTOR, base_url)}
+
+
+def parse_adunit(html, base_url=TREK_BASE_URL):
+    """
+    解析 adunit 頁
+
+    Returns:
+        dict: 包含 click_rate 的字典
+
+    Raises:
+        ValueError: 找不到期間點擊率
+    """
+    return {'click_rate': _click_rate(BeautifulSoup(html, 'html.parser'), 'adunit')}
+
+
+PARSERS = {
+    'campaign_list': parse_campaign_list,
+    'campaign': parse_campaign,
+    'adset': parse_adset,
+    'adunit': parse_adunit,
+}
+
+
+class HttpPageFetcher:
+    """
+    HTTP worker：以帶有登入 Cookie 的 requests.Session 直接下載頁面
+    """
+
+    def __init__(self, cookies, pool_size=MAX_WORKERS, timeout=PAGE_TIMEOUT):
+        """
+        Args:
+            cookies (list): 登入後的 Cookie（Selenium get_cookies 格式）
+            pool_size (int): 連線池大小
+            timeout (float): 請求逾時秒數
+        """
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        for cookie in cookies:
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain'), path=cookie.get('path', '/'))
+
+    def fetch(self, url, level):
+        """
+        下載頁面
+
+        Args:
+            url (str): 網址
+            level (str): 層級，例如 campaign、adset
+
+        Returns:
+            str: 頁面 HTML
+        """
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        # 登入失效時會被導回登入頁
+        if 'login' in response.url and 'login' not in url:
+            raise RuntimeError(f"登入狀態失效，被導向 {response.url}")
+        response.encoding = response.encoding or 'utf-8'
+        return response.text
+
+    def close(self):
+        """關閉連線池"""
+        self.session.close()
+
+
+class BrowserPageFetcher:
+    """
+    瀏覽器 worker：從 BrowserPool 借用瀏覽器，第一次使用時注入登入 Cookie，
+    等待各層的載入完成元素出現後取得 page_source
+    """
+
+    def __init__(self, cookies, pool, timeout=PAGE_TIMEOUT):
+        """
+        Args:
+            cookies (list): 登入後的 Cookie（Selenium get_cookies 格式）
+            pool (BrowserPool): 瀏覽器工作階段池
+            timeout (float): 等待元素的逾時秒數
+        """
+        self.cookies = cookies
+        self.pool = pool
+        self.timeout = timeout
+
+    def _authenticate(self, driver):
+        """
+        在瀏覽器中注入登入 Cookie（每個驅動程式一次）
+        標記直接設在驅動程式物件上，回收重建後的新物件沒有標記，會重新注入；
+        不以 id(driver) 記錄，避免舊物件被回收後 id 重複使用而略過注入；
+        驅動程式同一時間只借給一個 worker，因此不需加鎖
+        """
+        if getattr(driver, '_trek_authenticated', False):
+            return
+        driver.get(TREK_BASE_URL)
+        for cookie in self.cookies:
+            driver.add_cookie({key: value for key, value in cookie.items() if key != 'sameSite'})
+        driver._trek_authenticated = True
+
+    def fetch(self, url, level):
+        """
+        以瀏覽器載入頁面並等待載入完成
+
+        Args:
+            url (str): 網址
+            level (str): 層級
+
+        Returns:
+            str: 頁面 HTML
+        """
+        with self.pool.lease() as driver:
+            self._authenticate(driver)
+            driver.get(url)
+            try:
+                WebDriverWait(driver, self.timeout).until(EC.presence_of_element_located(READY_LOCATORS[level]))
+            except Exception:
+                moptt_metrics.count('wait_timeout', scraper='trek', level=level)
+                raise
+            return driver.page_source
+
+    def close(self):
+        """瀏覽器由 BrowserPool 管理，這裡不需關閉"""
+
+
+class LevelStats:
+    """
+    各層吞吐量紀錄類別
+    記錄每層的頁數、失敗數、累計下載耗時與第一頁開始到最後一頁完成的時間
+    """
+
+    def __init__(self):
+        self.levels = {level: {'pages': 0, 'errors': 0, 'busy': 0.0, 'first': None, 'last': None}
+                       for level in LEVELS}
+        self.lock = threading.Lock()
+
+    def record(self, level, started, finished, ok):
+        """
+        記錄一頁
+
+        Args:
+            level (str): 層級
+            started (float): 開始時間（perf_counter）
+            finished (float): 完成時間（perf_counter）
+            ok (bool): 是否成功
+        """
+        with self.lock:
+            stats = self.levels[level]
+            stats['pages' if ok else 'errors'] += 1
+            stats['busy'] += finished - started
+            stats['first'] = started if stats['first'] is None else min(stats['first'], started)
+            stats['last'] = finished if stats['last'] is None else max(stats['last'], finished)
+
+    def summary_table(self):
+        """
+        取得各層吞吐量摘要表
+
+        Returns:
+            str: 每層的頁數、失敗數、平均每頁耗時與每秒頁數
+        """
+        lines = [f"{'層級':<14} | {'頁數':>6} | {'失敗':>4} | {'平均(秒)':>8} | {'頁/秒':>6}"]
+        for level, stats in self.levels.items():
+            total = stats['pages'] + stats['errors']
+            if not total:
+                continue
+            wall = (stats['last'] - stats['first']) or 1e-9
+            lines.append(f"{level:<14} | {stats['pages']:>6} | {stats['errors']:>4} | "
+                         f"{stats['busy'] / total:>8.2f} | {stats['pages'] / wall:>6.2f}")
+        return '\n'.join(lines)
+
+
+class TrekTreeCrawler:
+    """
+    Trek campaign 樹狀爬蟲
+    以 ThreadPoolExecutor 限制同時下載的頁數，列表頁、campaign、adset、adunit
+    在父節點解析完成時立即排入，不必等同一層全部完成；
+    指定 sink 時，已完成的 campaign 與 adunit 不再下載，adunit 完成即寫入 sink 且不保留在記憶體中
+    """
+
+    def __init__(self, fetcher, max_workers=MAX_WORKERS, on_adunit=None, base_url=TREK_BASE_URL, sink=None):
+        """
+        Args:
+            fetcher (HttpPageFetcher | BrowserPageFetcher): 頁面下載器
+            max_workers (int): 同時下載的頁面數
+            on_adunit (callable, optional): 每個 adunit 完成時呼叫 on_adunit(campaign, adset, adunit)
+            base_url (str): 網站位址
+            sink (TrekCsvSink, optional): 串流輸出與檢查點
+        """
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.on_adunit = on_adunit
+        self.base_url = base_url
+        self.sink = sink
+        self.stats = LevelStats()
+        self.skipped = {'campaign': 0, 'adunit': 0}
+
+    def _fetch_and_parse(self, level, url):
+        """下載並解析一頁（在 worker 執行緒中執行）"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            with moptt_metrics.stage('trek_fetch', scraper='trek', level=level):
+                html = self.fetcher.fetch(url, level)
+            parsed = PARSERS[level](html, self.base_url)
+            ok = True
+            return parsed
+        finally:
+            self.stats.record(level, started, time.perf_counter(), ok)
+
+    def crawl(self, page_numbers, campaign_urls=None):
+        """
+        爬取指定 campaign 列表頁（或直接指定的 campaign）的完整樹狀資料
+
+        Args:
+            page_numbers (iterable): campaign 列表頁頁碼
+            campaign_urls (list, optional): 直接指定的 campaign 網址，指定時不下載列表頁
+
+        Returns:
+            list: 與 爬蟲（Trek_廣告）.py 相同結構的 campaign 資料
+                  （campaign_url、campaign_name、click_rate、adset_urls、adsets[adset_url、click_rate、adunit_urls、adunits]），
+                  指定 sink 時不含已完成而略過的 campaign，adunits 也不保留
+        """
+        campaigns_by_page = {}
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit(level, url, context):
+                if level != 'campaign_list':
+                    _campaign_of(level, context)['_pending'] += 1
+                pending[executor.submit(self._fetch_and_parse, level, url)] = (level, url, context)
+
+            def submit_campaigns(page, urls):
+                campaigns_by_page[page] = []
+                for url in urls:
+                    if self.sink is not None and self.sink.is_campaign_done(url):
+                        self.skipped['campaign'] += 1
+                        continue
+                    campaign = {'campaign_url': url, '_pending': 0}
+                    campaigns_by_page[page].append(campaign)
+                    submit('campaign', url, campaign)
+
+            if campaign_urls is not None:
+                submit_campaigns(0, campaign_urls)
+            else:
+                for page in page_numbers:
+                    submit('campaign_list', CAMPAIGN_LIST_URL + str(page), page)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    level, url, context = pending.pop(future)
+                    try:
+                        parsed = future.result()
+                    except Exception as e:
+                        print(f"處理 {level} {url} 時發生錯誤: {e}")
+                        moptt_metrics.count('page_error', scraper='trek', level=level)
+                        if level == 'campaign':
+                            context['failed'] = True
+                        elif level != 'campaign_list':
+                            context[1][context[2]] = None
+                    else:
+                        self._handle_parsed(level, url, context, parsed, submit, submit_campaigns)
+                    if level != 'campaign_list':
+                        self._child_finished(_campaign_of(level, context))
+
+        campaign_data = []
+        for page in sorted(campaigns_by_page):
+            for campaign in campaigns_by_page[page]:
+                del campaign['_pending']
+                if campaign.get('failed'):
+                    continue
+                for adset in campaign['adsets']:
+                    if adset is not None:
+                        adset['adunits'] = [adunit for adunit in adset['adunits'] if adunit is not None]
+                campaign['adsets'] = [adset for adset in campaign['adsets'] if adset is not None]
+                campaign_data.append(campaign)
+        return campaign_data
+
+    def _handle_parsed(self, level, url, context, parsed, submit, submit_campaigns):
+        """依層級保存解析結果，並立即排入子節點"""
+        if level == 'campaign_list':
+            print(f"第 {context} 頁找到 {len(parsed)} 個 campaign URLs")
+            submit_campaigns(context, parsed)
+        elif level == 'campaign':
+            campaign = context
+            campaign.update(parsed)
+            campaign['adsets'] = [{'adset_url': adset_url} for adset_url in parsed['adset_urls']]
+            print(f"處理 campaign: {url}, 名稱: {parsed['campaign_name']}, 找到 {len(parsed['adset_urls'])} 個 adset URLs")
+            for index, adset in enumerate(campaign['adsets']):
+                submit('adset', adset['adset_url'], (campaign, campaign['adsets'], index))
+        elif level == 'adset':
+            campaign, siblings, index = context
+            adset = siblings[index]
+            adset.update(parsed)
+            adset['adunits'] = [{'adunit_url': adunit_url} for adunit_url in parsed['adunit_urls']]
+            for unit_index, adunit in enumerate(adset['adunits']):
+                if self.sink is not None and self.sink.is_adunit_done(adunit['adunit_url']):
+                    self.skipped['adunit'] += 1
+                    adset['adunits'][unit_index] = None
+                    continue
+                submit('adunit', adunit['adunit_url'], ((campaign, adset), adset['adunits'], unit_index))
+        else:
+            (campaign, adset), siblings, index = context
+            adunit = siblings[index]
+            adunit.update(parsed)
+            if self.sink is not None:
+                self.sink.write_row(flatten_adunit(campaign, adset, adunit))
+                siblings[index] = None
+            if self.on_adunit is not None:
+                self.on_adunit(campaign, adset, adunit)
+
+    def _child_finished(self, campaign):
+        """campaign 底下的一頁處理完成；整棵子樹都處理完且沒有失敗時記錄到檢查點"""
+        campaign['_pending'] -= 1
+        if campaign['_pending'] == 0 and self.sink is not None and self.sink.campaign_complete(campaign):
+            self.sink.mark_campaign_done(campaign['campaign_url'])
+
+
+def _campaign_of(level, context):
+    """由工作內容取得所屬的 campaign"""
+    if level == 'campaign':
+        return context
+    if level == 'adset':
+        return context[0]
+    return context[0][0]
+
+
+def flatten_adunit(campaign, adset, adunit):
+    """
+    將一個 adunit 與其上層資訊展開成一列 CSV 資料
+
+    Returns:
+        dict: 以 CSV_FIELDNAMES 為鍵的字典
+    """
+    return {
+        'campaign_name': campaign['campaign_name'],
+        'campaign_url': campaign['campaign_url'],
+        'campaign_click_rate': campaign['click_rate'],
+        'adset_url': adset['adset_url'],
+        'adset_click_rate': adset['click_rate'],
+        'adunit_url': adunit['adunit_url'],
+        'adunit_click_rate': adunit['click_rate']
+    }
+
+
+def output_path_for(start_page, end_page):
+    """
+    取得頁碼範圍的 CSV 輸出路徑
+
+    Returns:
+        str: 例如 campaign_data_page_12_to_13.csv
+    """
+    return f'campaign_data_page_{start_page}_to_{end_page}.csv'
+
+
+def checkpoint_path_for(csv_path):
+    """
+    取得 CSV 對應的檢查點路徑
+
+    Args:
+        csv_path (str): CSV 路徑，例如 campaign_data_page_12_to_13.csv
+
+    Returns:
+        str: 例如 campaign_data_page_12_to_13.checkpoint.jsonl
+    """
+    return os.path.splitext(csv_path)[0] + '.checkpoint.jsonl'
+
+
+def _truncate_partial_line(path):
+    """截掉寫到一半中斷、沒有換行符號的最後一行，避免之後附加的資料接在半行後面"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    valid_length = data.rfind(b'\n') + 1
+    if valid_length != len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(valid_length)
+
+
+class TrekCsvSink:
+    """
+    Trek 串流輸出類別
+    每個 adunit 完成時立即附加一列到 CSV；整個 campaign 底下都完成時，
+    將 campaign 網址附加到檢查點。重新開啟同一個檔案時，CSV 中已有的 adunit
+    與檢查點中的 campaign 都視為已完成
+    """
+
+    def __init__(self, path, fsync=FSYNC_EACH_ROW):
+        """
+        載入既有進度
+
+        Args:
+            path (str): CSV 輸出路徑
+            fsync (bool): 每列寫入後是否呼叫 fsync
+        """
+        self.path = path
+        self.checkpoint_path = checkpoint_path_for(path)
+        self.fsync = fsync
+        self.done_adunits = set()
+        self.done_campaigns = set()
+        self.written = 0
+
+        _truncate_partial_line(path)
+        _truncate_partial_line(self.checkpoint_path)
+        try:
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                self.done_adunits = {row['adunit_url'] for row in csv.DictReader(f) if row.get('adunit_url')}
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.done_campaigns = {json.loads(line)['campaign_url'] for line in f}
+        except FileNotFoundError:
+            pass
+
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._csv_file = open(path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._csv_file, fieldnames=CSV_FIELDNAMES)
+        if is_new:
+            self._writer.writeheader()
+            self._csv_file.flush()
+        self._checkpoint_file = open(self.checkpoint_path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def is_campaign_done(self, url):
+        """campaign 是否已完成"""
+        return url in self.done_campaigns
+
+    def is_adunit_done(self, url):
+        """adunit 是否已寫入 CSV"""
+        return url in self.done_adunits
+
+    def campaign_complete(self, campaign):
+        """
+        判斷 campaign 底下的 adset 是否都已下載，且所有 adunit 都已寫入 CSV
+
+        campaign 與 adset 都必須解析出點擊率；頁面上沒有「沒有 adset / adunit」的明確標示，
+        找不到子連結時無法和尚未載入完成區分，因此不記錄到檢查點，下次執行重新下載
+
+        Args:
+            campaign (dict): campaign 資料（失敗的 adset 為 None 或不在 adsets 中）
+
+        Returns:
+            bool: 是否完成
+        """
+        if campaign.get('failed') or 'adsets' not in campaign or not campaign.get('click_rate'):
+            return False
+        adsets = campaign['adsets']
+        if not adsets or len(adsets) != len(campaign['adset_urls']) or any(adset is None for adset in adsets):
+            return False
+        if any(not adset.get('click_rate') or not adset['adunit_urls'] for adset in adsets):
+            return False
+        return all(url in self.done_adunits for adset in adsets for url in adset['adunit_urls'])
+
+    def _flush(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def write_row(self, row):
+        """
+        附加一列 adunit 資料
+
+        Args:
+            row (dict): flatten_adunit 產生的一列資料
+        """
+        with self._lock:
+            if row['adunit_url'] in self.done_adunits:
+                return
+            self._writer.writerow(row)
+            self._flush(self._csv_file)
+            self.done_adunits.add(row['adunit_url'])
+            self.written += 1
+
+    def mark_campaign_done(self, url):
+        """
+        將完成的 campaign 記錄到檢查點
+
+        Args:
+            url (str): campaign 網址
+        """
+        with self._lock:
+            if url in self.done_campaigns:
+                return
+            self._checkpoint_file.write(json.dumps({'campaign_url': url, 'done_at': int(time.time())}) + '\n')
+            self._flush(self._checkpoint_file)
+            self.done_campaigns.add(url)
+
+    def close(self):
+        """關閉檔案"""
+        self._csv_file.close()
+        self._checkpoint_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def shard_page_ranges(start_page, end_page, shards):
+    """
+    將頁碼範圍切成連續且大小相近的分片
+
+    Args:
+        start_page (int): 起始頁
+        end_page (int): 結束頁（含）
+        shards (int): 分片數（超過頁數時以頁數為準）
+
+    Returns:
+        list: [(分片起始頁, 分片結束頁), ...]
+    """
+    pages = end_page - start_page + 1
+    shards = max(1, min(shards, pages))
+    size, extra = divmod(pages, shards)
+    ranges = []
+    first = start_page
+    for index in range(shards):
+        last = first + size - 1 + (1 if index < extra else 0)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def merge_shards(start_page, end_page, shards, output_path=None):
+    """
+    依分片順序合併各分片的 CSV，同一個 adunit 只保留一列
+
+    Args:
+        start_page (int): 起始頁
+        end_page (int): 結束頁
+        shards (int): 分片數
+        output_path (str, optional): 合併後的路徑，預設為整個範圍的 output_path_for
+
+    Returns:
+        tuple: (合併後的路徑, 列數, 缺少的分片路徑列表)
+    """
+    output_path = output_path or output_path_for(start_page, end_page)
+    shard_paths = [output_path_for(first, last) for first, last in shard_page_ranges(start_page, end_page, shards)]
+    if shard_paths == [output_path]:
+        # 只有一個分片時，分片的輸出就是合併結果
+        try:
+            with open(output_path, 'r', newline='', encoding='utf-8') as f:
+                return output_path, sum(1 for _ in csv.DictReader(f)), []
+        except FileNotFoundError:
+            return output_path, 0, [output_path]
+
+    seen = set()
+    missing = []
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
+        for shard_path in shard_paths:
+            _truncate_partial_line(shard_path)
+            try:
+                with open(shard_path, 'r', newline='', encoding='utf-8') as f:
+                    for row in csv.DictReader(f):
+                        if row['adunit_url'] in seen:
+                            continue
+                        seen.add(row['adunit_url'])
+                        writer.writerow(row)
+            except FileNotFoundError:
+                missing.append(shard_path)
+    os.replace(temp_path, output_path)
+    return output_path, len(seen), missing
+
+
+def create_fetcher(cookies, backend=BACKEND, max_workers=MAX_WORKERS, pool=None):
+    """
+    依 worker 種類建立頁面下載器
+
+    Args:
+        cookies (list): 登入後的 Cookie
+        backend (str): 'http' 或 'browser'
+        max_workers (int): 同時下載的頁面數
+        pool (BrowserPool, optional): browser 模式使用的瀏覽器工作階段池
+
+    Returns:
+        HttpPageFetcher | BrowserPageFetcher: 頁面下載器
+    """
+    if backend == 'browser':
+        return BrowserPageFetcher(cookies, pool)
+    return HttpPageFetcher(cookies, pool_size=max_workers)
+
+
+def crawl_pages(start_page, end_page, email, password, team_label=None, company_name=None,
+                backend=BACKEND, max_workers=MAX_WORKERS, output_path=None):
+    """
+    登入並爬取頁碼範圍，adunit 完成即寫入 CSV；同一範圍重新執行時從檢查點繼續
+
+    Args:
+        start_page (int): 起始頁
+        end_page (int): 結束頁（含）
+        email (str): 登入帳號
+        password (str): 登入密碼
+        team_label (str, optional): 登入後要點選的團隊名稱
+        company_name (str, optional): 要切換的公司名稱
+        backend (str): 'http' 或 'browser'
+        max_workers (int): 同時下載的頁面數
+        output_path (str, optional): CSV 輸出路徑，預設為 output_path_for(start_page, end_page)
+
+    Returns:
+        TrekTreeCrawler: 完成的爬蟲（可取得 stats 與 skipped）
+    """
+    output_path = output_path or output_path_for(start_page, end_page)
+    with TrekCsvSink(output_path) as sink:
+        if sink.done_adunits or sink.done_campaigns:
+            print(f"從 {output_path} 繼續：已完成 {len(sink.done_campaigns)} 個 campaign、{len(sink.done_adunits)} 個 adunit")
+        with moptt_metrics.stage('login', scraper='trek'):
+            cookies = login(email, password, team_label, company_name)
+
+        pool = BrowserPool(size=max_workers) if backend == 'browser' else None
+        fetcher = create_fetcher(cookies, backend, max_workers, pool)
+        try:
+            crawler = TrekTreeCrawler(fetcher, max_workers=max_workers, sink=sink)
+            crawler.crawl(range(start_page, end_page + 1))
+        finally:
+            fetcher.close()
+            if pool:
+                pool.close()
+        print(f"本次寫入 {sink.written} 個 adunit 到 {output_path}，"
+              f"略過已完成的 {crawler.skipped['campaign']} 個 campaign、{crawler.skipped['adunit']} 個 adunit")
+    return crawler
+
+
+def run_shards(args, password):
+    """
+    以子程序平行爬取各分片，全部結束後合併（密碼以環境變數傳給子程序，不出現在命令列）
+
+    Returns:
+        int: 失敗的分片數
+    """
+    env = dict(os.environ, **{PASSWORD_ENV: password})
+    processes = []
+    for first, last in shard_page_ranges(args.start_page, args.end_page, args.shards):
+        command = [sys.executable, os.path.abspath(__file__), str(first), str(last), '--email', args.email,
+                   '--backend', args.backend, '--workers', str(args.workers)]
+        if args.team:
+            command += ['--team', args.team]
+        if args.company:
+            command += ['--company', args.company]
+        print(f"啟動分片 {first}-{last}")
+        processes.append(((first, last), subprocess.Popen(command, env=env)))
+
+    failed = 0
+    for (first, last), process in processes:
+        if process.wait() != 0:
+            failed += 1
+            print(f"分片 {first}-{last} 結束代碼 {process.returncode}，可重新執行以從檢查點繼續")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Trek campaign → adset → adunit 並行爬蟲')
+    parser.add_argument('start_page', type=int, help='起始頁')
+    parser.add_argument('end_page', type=int, help='結束頁')
+    parser.add_argument('--email', help='登入帳號')
+    parser.add_argument('--password', help=f'登入密碼，未指定時讀取環境變數 {PASSWORD_ENV} 或互動輸入')
+    parser.add_argument('--team', help='登入後要點選的團隊名稱')
+    parser.add_argument('--company', help='要切換的公司名稱')
+    parser.add_argument('--backend', choices=['http', 'browser'], default=BACKEND, help='worker 種類')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='同時下載的頁面數（每個程序）')
+    parser.add_argument('--shards', type=int, default=1, help='將頁碼範圍切成幾個分片，各由一個程序爬取後合併')
+    parser.add_argument('--merge-only', action='store_true', help='不爬取，只合併既有的分片 CSV')
+    args = parser.parse_args()
+
+    if args.merge_only:
+        path, rows, missing = merge_shards(args.start_page, args.end_page, args.shards)
+        print(f"已合併 {rows} 列到 {path}" + (f"，缺少分片: {', '.join(missing)}" if missing else ""))
+        sys.exit(1 if missing else 0)
+
+    if not args.email:
+        parser.error('需要 --email')
+    password = args.password or os.environ.get(PASSWORD_ENV) or getpass.getpass('Trek 密碼：')
+    started = time.perf_counter()
+
+    if args.shards > 1:
+        failed = run_shards(args, password)
+        path, rows, missing = merge_shards(args.start_page, args.end_page, args.shards)
+        print(f"已合併 {rows} 列到 {path}，耗時 {time.perf_counter() - started:.1f} 秒")
+        sys.exit(1 if failed or missing else 0)
+
+    moptt_metrics.configure(job='trek_crawler')
+    crawler = crawl_pages(args.start_page, args.end_page, args.email, password, args.team, args.company,
+                          args.backend, args.workers)
+    print(f"\n耗時 {time.perf_counter() - started:.1f} 秒")
+    print(crawler.stats.summary_table())
+    moptt_metrics.report()
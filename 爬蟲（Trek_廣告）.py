@@ -1,20 +1,30 @@
 import time
-import csv
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from moptt_driver import create_driver
+from trek_crawler import TrekCsvSink, flatten_adunit, output_path_for
+import moptt_metrics
 
-# 設置和初始化部分保持不變
-chrome_driver_path = '/Users/aotter/chromedriver-mac-arm64/chromedriver'
-chrome_options = Options()
-chrome_options.add_argument('--headless')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument('--disable-dev-shm-usage')
-service = Service(chrome_driver_path)
-driver = webdriver.Chrome(service=service, options=chrome_options)
+# 以共用工廠建立瀏覽器（chromedriver 路徑與資源封鎖設定請見 moptt_driver.py）
+driver = create_driver()
+
+
+def load_page(url, level):
+    """載入頁面並記錄各層級的 driver.get 耗時"""
+    with moptt_metrics.stage('driver_get', scraper='trek', level=level):
+        driver.get(url)
+
+
+def wait_for(locator, level, timeout=20):
+    """等待元素出現並記錄各層級的等待耗時，逾時時另外計數"""
+    try:
+        with moptt_metrics.stage('wait', scraper='trek', level=level):
+            return WebDriverWait(driver, timeout).until(EC.presence_of_element_located(locator))
+    except TimeoutException:
+        moptt_metrics.count('wait_timeout', scraper='trek', level=level)
+        raise
 
 def login():
     # 登入函數保持不變
@@ -47,17 +57,15 @@ def login():
         exit()
 
 # 1. 爬取 campaign URLs
-def get_campaign_urls(page_count):
+def get_campaign_urls(start_page, end_page):
     campaign_urls = []
     base_url = "https://trek.aotter.net/advertiser/list/campaign?page="
     
-    for page in range(1, page_count + 1):
+    for page in range(start_page, end_page + 1):
         page_url = base_url + str(page)
-        driver.get(page_url)
+        load_page(page_url, 'campaign_list')
         try:
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "tr.active.js-clickable"))
-            )
+            wait_for((By.CSS_SELECTOR, "tr.active.js-clickable"), 'campaign_list')
             rows = driver.find_elements(By.CSS_SELECTOR, "tr.active.js-clickable")
             base_campaign_url = 'https://trek.aotter.net'
             for row in rows:
@@ -68,6 +76,7 @@ def get_campaign_urls(page_count):
             print(f"第 {page} 頁找到 {len(rows)} 個 campaign URLs")
         except Exception as e:
             print(f"爬取第 {page} 頁時發生錯誤: {e}")
+            moptt_metrics.count('page_error', scraper='trek', level='campaign_list')
     
     return campaign_urls
 
@@ -76,18 +85,14 @@ def get_campaign_data(campaign_urls):
     campaign_data = []
     for url in campaign_urls:
         try:
-            driver.get(url)
+            load_page(url, 'campaign')
             
             # 獲取 campaign 名稱
-            campaign_name_element = WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//h3"))
-            )
+            campaign_name_element = wait_for((By.XPATH, "//h3"), 'campaign')
             campaign_name = campaign_name_element.text.strip()
 
             # 獲取 campaign click rate
-            click_rate_element = WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.XPATH, "//h4[text()='期間點擊率']/following-sibling::div//h2"))
-            )
+            click_rate_element = wait_for((By.XPATH, "//h4[text()='期間點擊率']/following-sibling::div//h2"), 'campaign')
             campaign_click_rate = click_rate_element.text.strip()
             
             # 獲取 adset URLs
@@ -103,6 +108,7 @@ def get_campaign_data(campaign_urls):
             print(f"處理 campaign: {url}, 名稱: {campaign_name}, 找到 {len(adset_urls)} 個 adset URLs")
         except Exception as e:
             print(f"處理 campaign {url} 時發生錯誤: {e}")
+            moptt_metrics.count('page_error', scraper='trek', level='campaign')
     return campaign_data
 
 
@@ -112,11 +118,9 @@ def get_adset_data(campaign_data):
         campaign['adsets'] = []
         for adset_url in campaign['adset_urls']:
             try:
-                driver.get(adset_url)
+                load_page(adset_url, 'adset')
                 # 獲取 adset click rate
-                adset_click_rate_element = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.XPATH, "//h4[text()='期間點擊率']/following-sibling::div//h2"))
-                )
+                adset_click_rate_element = wait_for((By.XPATH, "//h4[text()='期間點擊率']/following-sibling::div//h2"), 'adset')
                 adset_click_rate = adset_click_rate_element.text.strip()
                 
                 # 獲取 adunit URLs
@@ -131,79 +135,74 @@ def get_adset_data(campaign_data):
                 print(f"處理 adset: {adset_url}, 找到 {len(adunit_urls)} 個 adunit URLs")
             except Exception as e:
                 print(f"處理 adset {adset_url} 時發生錯誤: {e}")
+                moptt_metrics.count('page_error', scraper='trek', level='adset')
     return campaign_data
 
-# 4. 爬取每個 adunit 的 click rate
-def get_adunit_data(campaign_data):
+# 4. 爬取每個 adunit 的 click rate，指定 sink 時每個 adunit 完成即寫入 CSV，已寫入的 adunit 略過
+def get_adunit_data(campaign_data, sink=None):
     for campaign in campaign_data:
         for adset in campaign['adsets']:
             adset['adunits'] = []
             for adunit_url in adset['adunit_urls']:
+                if sink is not None and sink.is_adunit_done(adunit_url):
+                    continue
                 try:
-                    driver.get(adunit_url)
-                    adunit_click_rate_element = WebDriverWait(driver, 20).until(
-                        EC.presence_of_element_located((By.XPATH, "//h4[text()='期間點擊率']/following-sibling::div//h2"))
-                    )
+                    load_page(adunit_url, 'adunit')
+                    adunit_click_rate_element = wait_for((By.XPATH, "//h4[text()='期間點擊率']/following-sibling::div//h2"), 'adunit')
                     adunit_click_rate = adunit_click_rate_element.text.strip()
-                    adset['adunits'].append({
+                    adunit = {
                         'adunit_url': adunit_url,
                         'click_rate': adunit_click_rate
-                    })
+                    }
+                    if sink is not None:
+                        sink.write_row(flatten_adunit(campaign, adset, adunit))
+                    else:
+                        adset['adunits'].append(adunit)
                     print(f"處理 adunit: {adunit_url}")
                 except Exception as e:
                     print(f"處理 adunit {adunit_url} 時發生錯誤: {e}")
+                    moptt_metrics.count('page_error', scraper='trek', level='adunit')
     return campaign_data
 
 # 展開數據為扁平結構，整理成 CSV 的部分
 def flatten_data(campaign_data):
-    flattened_data = []
-    for campaign in campaign_data:
-        for adset in campaign['adsets']:
-            for adunit in adset['adunits']:
-                flattened_data.append({
-                    'campaign_name': campaign['campaign_name'],
-                    'campaign_url': campaign['campaign_url'],
-                    'campaign_click_rate': campaign['click_rate'],
-                    'adset_url': adset['adset_url'],
-                    'adset_click_rate': adset['click_rate'],
-                    'adunit_url': adunit['adunit_url'],
-                    'adunit_click_rate': adunit['click_rate']
-                })
-    return flattened_data
+    return [flatten_adunit(campaign, adset, adunit)
+            for campaign in campaign_data for adset in campaign['adsets'] for adunit in adset['adunits']]
 
 
-# 主程序
+# 主程序：逐一處理 campaign，adunit 完成即寫入 CSV，完成的 campaign 記錄在檢查點，
+# 中斷後以相同頁碼範圍重新執行即從上次進度繼續
 def main(start_page, end_page):
-    login()
+    moptt_metrics.configure(job='trek')
+    with moptt_metrics.stage('login', scraper='trek'):
+        login()
     
-    # 1. 獲取指定範圍頁碼的 campaign URLs
-    campaign_urls = get_campaign_urls(end_page - start_page + 1)
-    
-    # 2. 獲取 campaign 數據和 adset URLs
-    campaign_data = get_campaign_data(campaign_urls)
-    
-    # 3. 獲取 adset 數據和 adunit URLs
-    campaign_data = get_adset_data(campaign_data)
-    
-    # 4. 獲取 adunit 數據
-    campaign_data = get_adunit_data(campaign_data)
-    
-    # 展開數據
-    flattened_data = flatten_data(campaign_data)
-    
-    # 存儲數據，文件名稱包含頁碼範圍
-    if flattened_data:
-        file_name = f'campaign_data_page_{start_page}_to_{end_page}.csv'
-        with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['campaign_url', 'campaign_name', 'campaign_click_rate', 'adset_url', 'adset_click_rate', 'adunit_url', 'adunit_click_rate']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(flattened_data)
-        print(f"數據已存儲到 {file_name} 文件")
-    else:
-        print("沒有找到任何數據。")
+    file_name = output_path_for(start_page, end_page)
+    with TrekCsvSink(file_name) as sink:
+        # 1. 獲取指定範圍頁碼的 campaign URLs，略過已完成的 campaign
+        campaign_urls = get_campaign_urls(start_page, end_page)
+        pending_urls = [url for url in campaign_urls if not sink.is_campaign_done(url)]
+        if len(pending_urls) < len(campaign_urls):
+            print(f"略過已完成的 {len(campaign_urls) - len(pending_urls)} 個 campaign")
+
+        for url in pending_urls:
+            # 2. 獲取 campaign 數據和 adset URLs
+            campaign_data = get_campaign_data([url])
+            # 3. 獲取 adset 數據和 adunit URLs
+            campaign_data = get_adset_data(campaign_data)
+            # 4. 獲取 adunit 數據並寫入 CSV
+            campaign_data = get_adunit_data(campaign_data, sink)
+            for campaign in campaign_data:
+                if sink.campaign_complete(campaign):
+                    sink.mark_campaign_done(campaign['campaign_url'])
+
+        if sink.done_adunits:
+            print(f"數據已存儲到 {file_name} 文件（本次新增 {sink.written} 列）")
+        else:
+            print("沒有找到任何數據。")
     
     driver.quit()
+    moptt_metrics.report()
 
 if __name__ == "__main__":
     # 設定起始頁和結束頁